@@ -1,11 +1,22 @@
 # api/admin.py
 
+import asyncio
 import logging
+import os
 import yaml
+from typing import Optional
 from fastapi import APIRouter, Depends, Body, HTTPException, status
+from pydantic import BaseModel
 
-from aegis_toolkit.cartographer import KNOWN_ENDPOINTS, SHADOW_ENDPOINTS
-from aegis_toolkit.security import get_api_client_factory, ApiClient
+from aegis_toolkit import waf
+from aegis_toolkit.cartographer import KNOWN_ENDPOINTS, SHADOW_ENDPOINTS, load_api_spec
+from aegis_toolkit.security import get_api_client_factory, ApiClient, TOKEN_CACHE
+from aegis_toolkit.revocation import revoke_token, revocation_status
+from aegis_toolkit import anomaly_detector
+from aegis_toolkit import threat_intel
+from aegis_toolkit import transformer
+from aegis_toolkit import prefork
+from aegis_toolkit.blocklist import blocklist_status
 from main import settings
 
 router = APIRouter(prefix="/admin", tags=["Administration"])
@@ -38,14 +49,11 @@ async def update_api_spec(
         spec = yaml.safe_load(spec_content)
         if not isinstance(spec, dict) or 'paths' not in spec:
             raise HTTPException(status_code=400, detail="Invalid OpenAPI spec format. Must be a valid JSON or YAML object with a 'paths' key.")
-        KNOWN_ENDPOINTS.clear()
         SHADOW_ENDPOINTS.clear()
-
-        for path, methods in spec.get('paths', {}).items():
-            for method in methods:
-                KNOWN_ENDPOINTS.add(f"{method.upper()} {path}")
+        validator_count = load_api_spec(spec)
         
-        message = f"Cartographer dynamically re-initialized with {len(KNOWN_ENDPOINTS)} known endpoints."
+        message = (f"Cartographer dynamically re-initialized with {len(KNOWN_ENDPOINTS)} known endpoints "
+                   f"and {validator_count} request-body validators.")
         print(f"INFO: {message}")
         audit_logger.warning(f"AUDIT - API_SPEC_UPDATED: {message}")
         
@@ -54,4 +62,113 @@ async def update_api_spec(
     except yaml.YAMLError as e:
         raise HTTPException(status_code=400, detail=f"Failed to parse YAML/JSON content: {e}")
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {e}")
+
+@router.post("/config/reload", dependencies=[Depends(is_admin_client)])
+async def reload_config():
+    """
+    Re-reads config.yaml into a new validated snapshot and swaps it in. The
+    parse and WAF recompilation run in a worker thread; if the new file is
+    invalid the current configuration stays active.
+    """
+    try:
+        snapshot = await asyncio.to_thread(settings.reload)
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=f"Configuration reload failed: {e}")
+    message = f"Configuration reloaded (version {snapshot.version})."
+    print(f"INFO: {message}")
+    audit_logger.warning(f"AUDIT - CONFIG_RELOADED: {message}")
+    return {"status": "success", "message": message, "version": snapshot.version}
+
+@router.get("/shadow-endpoints", dependencies=[Depends(is_admin_client)])
+async def get_shadow_endpoints(limit: int = 50):
+    """
+    Returns the most requested undocumented endpoints (ID-like path segments
+    collapsed) with their estimated request counts. `max_overcount` bounds how
+    far an estimate may exceed the true count.
+    """
+    top = SHADOW_ENDPOINTS.top(max(1, min(limit, SHADOW_ENDPOINTS.capacity)))
+    return {
+        "tracked": len(SHADOW_ENDPOINTS),
+        "capacity": SHADOW_ENDPOINTS.capacity,
+        "requests_seen": SHADOW_ENDPOINTS.total,
+        "endpoints": [{"endpoint": signature, "count": count, "max_overcount": error} for signature, count, error in top],
+    }
+
+@router.get("/waf/profile", dependencies=[Depends(is_admin_client)])
+async def get_waf_profile():
+    """
+    Returns per-signature match time and hit counts, most expensive first.
+    Requires `waf_engine.profile_signatures: true` in config.yaml.
+    """
+    engine = waf.SIGNATURE_ENGINE
+    if engine is None or not engine.profile:
+        raise HTTPException(status_code=409, detail="WAF signature profiling is disabled (waf_engine.profile_signatures).")
+    return {"signatures": engine.profile_report()}
+
+@router.get("/waf/offload", dependencies=[Depends(is_admin_client)])
+async def get_waf_offload_metrics():
+    """
+    Returns worker-pool scan metrics: queue wait versus scan time, in-flight and rejected scans.
+    Requires `waf_offload.enabled: true` in config.yaml.
+    """
+    offloader = waf.SCAN_OFFLOADER
+    if offloader is None:
+        raise HTTPException(status_code=409, detail="WAF scan offloading is disabled (waf_offload.enabled).")
+    return offloader.metrics.snapshot()
+
+@router.get("/pii/redaction", dependencies=[Depends(is_admin_client)])
+async def get_pii_redaction_metrics():
+    """Returns PII redaction queue depth, rejections, timeouts and latency by response body size."""
+    return {"workers": transformer.REDACTION_POOL.workers if transformer.REDACTION_POOL else 0,
+            **transformer.REDACTION_METRICS.snapshot()}
+
+@router.get("/memory", dependencies=[Depends(is_admin_client)])
+async def get_process_memory():
+    """Returns RSS, PSS and USS of the gateway processes: under pre-fork, the parent and every worker."""
+    return {"prefork": prefork.PARENT_PID is not None, **prefork.memory_report(prefork.PARENT_PID or os.getpid())}
+
+@router.get("/auth/token-cache", dependencies=[Depends(is_admin_client)])
+async def get_token_cache_metrics():
+    """Returns size, hit/miss and eviction counts of the verified-JWT cache."""
+    return TOKEN_CACHE.snapshot()
+
+class RevokeTokenRequest(BaseModel):
+    jti: str
+    expires_at: Optional[int] = None # The token's `exp`; defaults to the longest token lifetime
+
+@router.post("/tokens/revoke", dependencies=[Depends(is_admin_client)])
+async def revoke_access_token(request: RevokeTokenRequest):
+    """Revokes an access token by its `jti` across all gateway workers."""
+    if not await revoke_token(request.jti, request.expires_at):
+        raise HTTPException(status_code=400, detail="Token has already expired.")
+    return {"status": "success", "jti": request.jti}
+
+@router.get("/tokens/revocation", dependencies=[Depends(is_admin_client)])
+async def get_revocation_status():
+    """Returns Bloom filter size and check/positive/confirmation counts for token revocation."""
+    return revocation_status()
+
+@router.get("/anomaly/memory", dependencies=[Depends(is_admin_client)])
+async def get_anomaly_memory():
+    """
+    Returns tracked-client counts, evictions and approximate memory of the
+    anomaly detector, plus the Redis sync state when counts are distributed.
+    """
+    report = anomaly_detector.BEHAVIOR_TRACKER.memory_report()
+    if anomaly_detector.ANOMALY_SYNC is not None:
+        report["distributed"] = anomaly_detector.ANOMALY_SYNC.status()
+    return report
+
+@router.get("/threat-intel/ip-reputation", dependencies=[Depends(is_admin_client)])
+async def get_ip_reputation_status():
+    """Returns IP reputation cache hits, coalesced and in-flight lookups, and lookup errors."""
+    service = threat_intel.REPUTATION_SERVICE
+    if service is None:
+        return {"enabled": bool(settings.abuseipdb_api_key), "lookups": 0}
+    return {"enabled": bool(settings.abuseipdb_api_key), **service.status()}
+
+@router.get("/threat-intel/blocklist", dependencies=[Depends(is_admin_client)])
+async def get_blocklist_status():
+    """Returns the loaded offline blocklist's source, range count and size."""
+    return blocklist_status()
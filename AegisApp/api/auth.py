@@ -1,5 +1,6 @@
 import httpx
 import logging
+import uuid
 from fastapi import APIRouter, Depends, HTTPException, status
 from pydantic import BaseModel
 from jose import jwt
@@ -8,6 +9,7 @@ from datetime import datetime, timedelta, timezone
 from main import settings
 
 from aegis_toolkit.security import get_api_client_factory, get_current_user_factory, ApiClient
+from aegis_toolkit.revocation import revoke_token
 
 get_api_client = get_api_client_factory(settings)
 get_current_user = get_current_user_factory(settings)
@@ -20,10 +22,10 @@ class LoginRequest(BaseModel):
     password: str
 
 def create_access_token(data: dict):
-    """Creates a JWT access token for a user."""
+    """Creates a JWT access token for a user. The `jti` lets the token be revoked before it expires."""
     to_encode = data.copy()
     expire = datetime.now(timezone.utc) + timedelta(minutes=30)
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "jti": uuid.uuid4().hex})
     encoded_jwt = jwt.encode(to_encode, settings.jwt_secret_key, algorithm="HS256")
     return encoded_jwt
 
@@ -87,4 +89,19 @@ async def refresh_token(
     })
     
     audit_logger.info(f"Token refreshed for user_id: {current_user['user_id']}")
-    return {"access_token": new_access_token, "token_type": "bearer"}
\ No newline at end of file
+    return {"access_token": new_access_token, "token_type": "bearer"}
+
+@router.post("/logout")
+async def logout(
+    client_app: ApiClient = Depends(get_api_client),
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Revokes the presented access token so it is rejected for the rest of its lifetime.
+    """
+    if not current_user.get("jti"):
+        raise HTTPException(status_code=401, detail="Invalid or expired token provided.")
+
+    await revoke_token(current_user["jti"], current_user.get("exp"))
+    audit_logger.info(f"Token revoked on logout for user_id: {current_user.get('user_id')}")
+    return {"status": "success"}
@@ -3,17 +3,24 @@ import uvicorn
 import logging
 import sys
 import json
+import asyncio
 from fastapi import FastAPI
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
 
 from api import bff_endpoints, auth, health, admin
-from aegis_toolkit.config import Settings
+from aegis_toolkit.config import Settings, watch_config
 from aegis_toolkit.cartographer import initialize_api_spec
 from aegis_toolkit.cache import initialize_cache, redis_client
 from aegis_toolkit.toolkit import create_security_shield
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.util import get_remote_address
-from slowapi.errors import RateLimitExceeded
+from aegis_toolkit.waf import initialize_waf_offloader, shutdown_waf
+from aegis_toolkit.threat_intel import shutdown_threat_intel
+from aegis_toolkit.transformer import initialize_pii_redaction, shutdown_pii_redaction
+from aegis_toolkit.blocklist import initialize_blocklist, run_blocklist_refresh
+from aegis_toolkit.revocation import initialize_revocation, run_revocation_sync
+from aegis_toolkit.anomaly_detector import start_anomaly_sync
+from aegis_toolkit import rate_limiter
+from aegis_toolkit.rate_limiter import initialize_rate_limiter
 
 class JsonFormatter(logging.Formatter):
     def format(self, record):
@@ -31,8 +38,29 @@ async def lifespan(app: FastAPI):
     logging.info("--- Aegis Gateway Starting Up ---")
     initialize_cache(settings)
     await initialize_api_spec(settings)
+    initialize_revocation(settings)
+    settings.add_reload_listener(initialize_revocation)
+    initialize_blocklist(settings)
+    settings.add_reload_listener(initialize_blocklist)
+    # Started here rather than at import: spawned workers re-import this module.
+    initialize_waf_offloader(settings)
+    settings.add_reload_listener(initialize_waf_offloader)
+    initialize_pii_redaction(settings)
+    settings.add_reload_listener(initialize_pii_redaction)
+    config_watcher = asyncio.create_task(watch_config(settings))
+    revocation_sync = asyncio.create_task(run_revocation_sync())
+    anomaly_sync = start_anomaly_sync(settings)
+    blocklist_refresh = asyncio.create_task(run_blocklist_refresh())
     yield
     logging.info("--- Aegis Gateway Shutting Down ---")
+    config_watcher.cancel()
+    revocation_sync.cancel()
+    blocklist_refresh.cancel()
+    if anomaly_sync:
+        anomaly_sync.cancel()
+    shutdown_waf()
+    shutdown_pii_redaction()
+    await shutdown_threat_intel()
     if redis_client:
         await redis_client.close()
         logging.info("Redis connection closed.")
@@ -47,7 +75,8 @@ logger.addHandler(handler)
 logging.info("Logging configured for JSON output.")
 
 settings = Settings(_env_file=".env")
-limiter = Limiter(key_func=get_remote_address)
+initialize_rate_limiter(settings)
+settings.add_reload_listener(initialize_rate_limiter)
 
 
 app = FastAPI(
@@ -57,19 +86,24 @@ app = FastAPI(
     lifespan=lifespan
 )
 
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
-
 
 @app.middleware("http")
 async def rate_limit_middleware(request, call_next):
-    if "/admin" in request.url.path or "/health" in request.url.path:
+    if not settings.rate_limiting.enabled:
+        return await call_next(request)
+    decision = await rate_limiter.RATE_LIMITER.check_request(request)
+    if decision is None:
         return await call_next(request)
-    try:
-        await limiter.check(request)
-    except RateLimitExceeded as e:
-        return _rate_limit_exceeded_handler(request, e)
-    return await call_next(request)
+    if not decision.allowed:
+        quota = decision.quota
+        return JSONResponse(
+            status_code=429,
+            content={"error": f"Rate limit exceeded: {quota.limit} per {int(quota.period)} seconds"},
+            headers=decision.headers(),
+        )
+    response = await call_next(request)
+    response.headers.update(decision.headers())
+    return response
 
 
 app.include_router(auth.router)
@@ -0,0 +1,22 @@
+# AegisApp/prefork_server.py
+"""
+Runs the gateway in pre-fork mode (see `prefork` in config.yaml):
+
+    cd AegisApp && python prefork_server.py
+
+The app is only imported under the __main__ guard. Worker pools started with
+spawn import this script again in every pool process; they must not build a
+second gateway, which importing main.py would do.
+"""
+
+if __name__ == "__main__":
+    import uvicorn
+
+    import main
+    from aegis_toolkit.prefork import serve
+
+    if main.settings.prefork.enabled:
+        serve(main.app, main.settings)
+    else:
+        print("WARNING: prefork.enabled is false in config.yaml; serving from a single process.")
+        uvicorn.run(main.app, host=main.settings.prefork.host, port=main.settings.prefork.port)
@@ -1,37 +1,210 @@
 # core/anomaly_detector.py
+import asyncio
+import re
+import sys
 import time
-from collections import defaultdict
-from fastapi import Request, HTTPException
+from array import array
+from collections import OrderedDict
+from typing import Dict
+from urllib.parse import unquote
+from fastapi import HTTPException
+from .anomaly_sync import AnomalyCountSync
+from .cartographer import normalize_shadow_path
+from .hyperloglog import WindowedHyperLogLog
+from .config import Settings
+from .context import RequestContext
 
-BEHAVIOR_LOG = defaultdict(lambda: {"error_count": [], "path_requests": []})
 ERROR_THRESHOLD = 10
-PATH_ENUMERATION_THRESHOLD = 20
+PATH_ENUMERATION_THRESHOLD = 20 # Distinct paths per window, not raw requests
+WINDOW_SECONDS = 60
+PATH_SLOT_SECONDS = 15 # Distinct paths are sketched in WINDOW_SECONDS / PATH_SLOT_SECONDS slots
+PATH_SKETCH_PRECISION = 7 # 128 one-byte registers per slot, ~9% standard error
+_REPEATED_SLASHES = re.compile(r"/{2,}")
 
-def track_request(client_id: str, request: Request, is_error: bool = False):
+def normalize_path(path: str) -> str:
+    """
+    Decodes, lowercases and collapses slashes so trivially different spellings
+    of a path count once, and collapses ID-like segments the way the shadow API
+    tracker does, so browsing /orders/1, /orders/2, ... is one endpoint.
+    """
+    path = _REPEATED_SLASHES.sub("/", unquote(path).lower())
+    return normalize_shadow_path(path.rstrip("/") or "/")
+
+class WindowCounter:
+    """
+    Count of events over the last WINDOW_SECONDS, kept in one-second buckets of
+    a fixed ring. Moving the window zeroes only the buckets that fell out of it,
+    so an update is O(1) amortized and memory is constant per counter.
+    """
+    __slots__ = ("buckets", "total", "head")
+
+    def __init__(self):
+        self.buckets = array("I", bytes(4 * WINDOW_SECONDS))
+        self.total = 0
+        self.head = 0  # the second the newest bucket belongs to
+
+    def _advance(self, second: int):
+        elapsed = second - self.head
+        if elapsed <= 0:
+            return
+        if elapsed >= WINDOW_SECONDS:
+            self.buckets = array("I", bytes(4 * WINDOW_SECONDS))
+            self.total = 0
+        else:
+            buckets = self.buckets
+            for s in range(self.head + 1, second + 1):
+                index = s % WINDOW_SECONDS
+                self.total -= buckets[index]
+                buckets[index] = 0
+        self.head = second
+
+    def add(self, second: int, amount: int = 1) -> int:
+        self._advance(second)
+        self.buckets[second % WINDOW_SECONDS] += amount
+        self.total += amount
+        return self.total
+
+    def count(self, second: int) -> int:
+        self._advance(second)
+        return self.total
+
+class ClientBehavior:
+    __slots__ = ("errors", "paths", "last_seen")
+
+    def __init__(self):
+        self.errors = WindowCounter()
+        self.paths = WindowedHyperLogLog(WINDOW_SECONDS // PATH_SLOT_SECONDS, PATH_SLOT_SECONDS, PATH_SKETCH_PRECISION)
+        self.last_seen = 0.0
+
+class BehaviorTracker:
+    """
+    Per-client window counters, in least-recently-seen order. Clients idle for
+    longer than `idle_seconds` are dropped as new ones arrive, and the least
+    recently seen client is evicted once `max_clients` are tracked.
+    """
+
+    def __init__(self, max_clients: int = 100_000, idle_seconds: float = 300.0):
+        self.clients: "OrderedDict[str, ClientBehavior]" = OrderedDict()
+        self.max_clients = max_clients
+        self.idle_seconds = idle_seconds
+        self.evicted_idle = 0
+        self.evicted_lru = 0
+
+    def configure(self, max_clients: int, idle_seconds: float):
+        self.max_clients = max_clients
+        self.idle_seconds = idle_seconds
+
+    def get(self, client_id: str, now: float) -> ClientBehavior:
+        behavior = self.clients.get(client_id)
+        if behavior is None:
+            self._evict(now)
+            behavior = self.clients[client_id] = ClientBehavior()
+        else:
+            self.clients.move_to_end(client_id)
+        behavior.last_seen = now
+        return behavior
+
+    def _evict(self, now: float):
+        clients = self.clients
+        idle_before = now - self.idle_seconds
+        while clients:
+            oldest = next(iter(clients.values()))
+            if oldest.last_seen >= idle_before:
+                break
+            clients.popitem(last=False)
+            self.evicted_idle += 1
+        while len(clients) >= self.max_clients:
+            clients.popitem(last=False)
+            self.evicted_lru += 1
+
+    def memory_report(self) -> Dict[str, int]:
+        """Approximate bytes held by the tracker, extrapolated from one client's footprint."""
+        sample = ClientBehavior()
+        per_client = (
+            sys.getsizeof(sample)
+            + sys.getsizeof(sample.errors) + sys.getsizeof(sample.errors.buckets)
+            + sys.getsizeof(sample.paths) + sys.getsizeof(sample.paths.registers) + sys.getsizeof(sample.paths.epochs)
+            + 100  # OrderedDict entry, linked-list node and a short client_id string
+        )
+        return {
+            "tracked_clients": len(self.clients),
+            "max_clients": self.max_clients,
+            "evicted_idle": self.evicted_idle,
+            "evicted_lru": self.evicted_lru,
+            "bytes_per_client": per_client,
+            "approx_bytes": sys.getsizeof(self.clients) + per_client * len(self.clients),
+        }
+
+BEHAVIOR_TRACKER = BehaviorTracker()
+ANOMALY_SYNC = None
+
+def initialize_anomaly_detector(settings: Settings):
+    """Applies thresholds and tracked-client limits from config; existing counters are kept."""
+    global ERROR_THRESHOLD, PATH_ENUMERATION_THRESHOLD
+    config = settings.anomaly_detection
+    ERROR_THRESHOLD = config.error_threshold
+    PATH_ENUMERATION_THRESHOLD = config.path_enumeration_threshold
+    BEHAVIOR_TRACKER.configure(config.max_tracked_clients, config.idle_eviction_seconds)
+
+def start_anomaly_sync(settings: Settings):
+    """
+    Starts the background Redis flush when `anomaly_detection.distributed` is
+    set, so thresholds apply to a client's traffic across all workers and nodes.
+    Returns the task, or None when counting stays local.
+    """
+    global ANOMALY_SYNC
+    config = settings.anomaly_detection
+    if not config.distributed:
+        return None
+    if not settings.redis_url:
+        print("WARNING: anomaly_detection.distributed is set but no Redis is configured; counting locally.")
+        return None
+    ANOMALY_SYNC = AnomalyCountSync(
+        WINDOW_SECONDS,
+        flush_interval=config.flush_interval_ms / 1000,
+        timeout=config.redis_timeout_ms / 1000,
+        backoff=config.degraded_backoff_seconds,
+        path_slot_seconds=PATH_SLOT_SECONDS,
+        path_slots=WINDOW_SECONDS // PATH_SLOT_SECONDS,
+    )
+    print(f"Anomaly detector sharing counts through Redis every {config.flush_interval_ms:g}ms.")
+    return asyncio.create_task(ANOMALY_SYNC.run())
+
+def _count(behavior_counter: WindowCounter, client_id: str, name: str, second: int) -> int:
+    """Adds one event and returns the larger of the local and the merged cluster-wide count."""
+    local = behavior_counter.add(second)
+    if ANOMALY_SYNC is None:
+        return local
+    ANOMALY_SYNC.record(client_id, name, second)
+    return max(local, ANOMALY_SYNC.cluster_count(client_id, name, second))
+
+def track_request(client_id: str, ctx: RequestContext, is_error: bool = False):
     """
     Tracks client behavior to detect anomalies like rapid errors or path scanning.
     This is now integrated into the main security pipeline.
     """
     now = time.time()
-    log = BEHAVIOR_LOG[client_id]
-
-    # Expire old entries (older than 60 seconds)
-    log["error_count"] = [t for t in log["error_count"] if now - t < 60]
-    log["path_requests"] = [t for t in log["path_requests"] if now - t < 60]
+    second = int(now)
+    behavior = BEHAVIOR_TRACKER.get(client_id, now)
 
     # Track errors
     if is_error:
-        log["error_count"].append(now)
-        if len(log["error_count"]) > ERROR_THRESHOLD:
+        if _count(behavior.errors, client_id, "errors", second) > ERROR_THRESHOLD:
             raise HTTPException(
-                status_code=429, 
+                status_code=429,
                 detail="Too many errors. Your access has been temporarily restricted due to anomalous behavior."
             )
 
-    # Track overall request velocity
-    log["path_requests"].append(now)
-    if len(log["path_requests"]) > PATH_ENUMERATION_THRESHOLD:
+    # Track distinct paths probed (enumeration), not raw velocity: the rate limiter covers volume
+    # The spec's path template when the request maps to a documented operation, so non-numeric IDs collapse too.
+    endpoint = ctx.endpoint
+    path = endpoint.template if endpoint is not None else normalize_path(ctx.path)
+    distinct_paths = round(behavior.paths.add(path, second))
+    if ANOMALY_SYNC is not None:
+        ANOMALY_SYNC.record_path(client_id, path, second)
+        distinct_paths = max(distinct_paths, ANOMALY_SYNC.cluster_distinct_paths(client_id, second))
+    if distinct_paths > PATH_ENUMERATION_THRESHOLD:
         raise HTTPException(
-            status_code=429, 
-            detail="Request velocity too high. Your access has been temporarily restricted due to anomalous behavior."
-        )
\ No newline at end of file
+            status_code=429,
+            detail="Too many distinct endpoints requested. Your access has been temporarily restricted due to anomalous behavior."
+        )
@@ -0,0 +1,185 @@
+# aegis_toolkit/anomaly_sync.py
+import asyncio
+import time
+from collections import defaultdict
+from typing import Dict, List, Set, Tuple
+
+from . import cache
+
+# Adds a batch of per-second increments to a client's hash, drops seconds that
+# left the window and returns the cluster-wide total for the window.
+# KEYS[1] = hash; ARGV[1] = oldest second kept; ARGV[2] = TTL; ARGV[3..] = second, amount pairs.
+_FLUSH_SCRIPT = """
+for i = 3, #ARGV, 2 do
+  redis.call('HINCRBY', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+local oldest = tonumber(ARGV[1])
+local fields = redis.call('HGETALL', KEYS[1])
+local total = 0
+for i = 1, #fields, 2 do
+  if tonumber(fields[i]) < oldest then
+    redis.call('HDEL', KEYS[1], fields[i])
+  else
+    total = total + tonumber(fields[i + 1])
+  end
+end
+return total
+"""
+
+CounterKey = Tuple[str, str]  # (client_id, counter name)
+# Paths queued per client between flushes; beyond this the client is far past any sane threshold anyway.
+_MAX_PENDING_PATHS = 1024
+
+
+class AnomalyCountSync:
+    """
+    Shares the anomaly detector's window counts and distinct-path sketches
+    across workers and nodes.
+
+    Increments are batched in memory and flushed every `flush_interval` seconds
+    in one pipelined round trip (one script call per touched counter); each
+    call returns the merged cluster total, which is cached locally. A request
+    then sees `cluster total at last flush + increments since`, so no request
+    waits on Redis. If a flush fails or takes longer than `timeout`, the sync
+    goes quiet for `backoff` seconds and the detector falls back to its local
+    counts alone.
+    """
+
+    def __init__(self, window_seconds: int, flush_interval: float, timeout: float, backoff: float,
+                 path_slot_seconds: int = 15, path_slots: int = 4):
+        self.window_seconds = window_seconds
+        self.path_slot_seconds = path_slot_seconds
+        self.path_slots = path_slots
+        self._pending_paths: Dict[Tuple[str, int], Set[str]] = defaultdict(set)  # (client_id, slot epoch) -> paths
+        self._remote_paths: Dict[str, Tuple[int, int]] = {}  # client_id -> (distinct paths, second it was read)
+        self.flush_interval = flush_interval
+        self.timeout = timeout
+        self.backoff = backoff
+        self._pending: Dict[CounterKey, Dict[int, int]] = defaultdict(lambda: defaultdict(int))
+        self._pending_totals: Dict[CounterKey, int] = defaultdict(int)
+        self._inflight_totals: Dict[CounterKey, int] = {}  # batch currently being flushed
+        self._remote: Dict[CounterKey, Tuple[int, int]] = {}  # -> (cluster total, second it was read)
+        self._script = None
+        self._script_client = None
+        self.degraded_until = 0.0
+        self.flushes = 0
+        self.failures = 0
+        self.last_flush_ms = 0.0
+
+    @property
+    def degraded(self) -> bool:
+        return time.monotonic() < self.degraded_until
+
+    def record(self, client_id: str, name: str, second: int, amount: int = 1):
+        if self.degraded:
+            return
+        key = (client_id, name)
+        self._pending[key][second] += amount
+        self._pending_totals[key] += amount
+
+    def record_path(self, client_id: str, path: str, second: int):
+        if self.degraded:
+            return
+        pending = self._pending_paths[(client_id, second // self.path_slot_seconds)]
+        if len(pending) < _MAX_PENDING_PATHS:
+            pending.add(path)
+
+    def cluster_distinct_paths(self, client_id: str, second: int) -> int:
+        """Cluster-wide distinct-path estimate from the last flush (Redis PFCOUNT), or 0."""
+        if self.degraded:
+            return 0
+        remote = self._remote_paths.get(client_id)
+        if remote is None or second - remote[1] >= self.window_seconds:
+            return 0
+        return remote[0]
+
+    def cluster_count(self, client_id: str, name: str, second: int) -> int:
+        """Merged count for the window, or 0 when there is no fresh cluster view."""
+        if self.degraded:
+            return 0
+        key = (client_id, name)
+        unflushed = self._pending_totals.get(key, 0) + self._inflight_totals.get(key, 0)
+        remote = self._remote.get(key)
+        if remote is None or second - remote[1] >= self.window_seconds:
+            return unflushed
+        return remote[0] + unflushed
+
+    def _path_key(self, client_id: str, epoch: int) -> str:
+        return f"aegis:anomaly:paths:{client_id}:{epoch}"
+
+    async def flush(self):
+        if not self._pending and not self._pending_paths:
+            return
+        batch, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+        self._inflight_totals, self._pending_totals = self._pending_totals, defaultdict(int)
+        paths, self._pending_paths = self._pending_paths, defaultdict(set)
+        try:
+            await self._flush_batch(batch, paths)
+        finally:
+            self._inflight_totals = {}
+
+    async def _flush_batch(self, batch: Dict[CounterKey, Dict[int, int]], paths: Dict[Tuple[str, int], Set[str]]):
+        redis_client = cache.redis_client
+        if redis_client is None:
+            return
+        if self._script_client is not redis_client:
+            self._script = redis_client.register_script(_FLUSH_SCRIPT)
+            self._script_client = redis_client
+
+        now_second = int(time.time())
+        oldest = now_second - self.window_seconds + 1
+        keys = list(batch)
+        started = time.perf_counter()
+        try:
+            pipe = redis_client.pipeline(transaction=False)
+            for client_id, name in keys:
+                args = [oldest, self.window_seconds * 2]
+                for second, amount in batch[(client_id, name)].items():
+                    args.extend((second, amount))
+                await self._script(keys=[f"aegis:anomaly:{name}:{client_id}"], args=args, client=pipe)
+            # Distinct paths: PFADD into per-slot HyperLogLogs, then PFCOUNT merges the slots in the window.
+            ttl = self.path_slot_seconds * (self.path_slots + 1)
+            for (client_id, epoch), slot_paths in paths.items():
+                pipe.pfadd(self._path_key(client_id, epoch), *slot_paths)
+                pipe.expire(self._path_key(client_id, epoch), ttl)
+            path_clients: List[str] = list(dict.fromkeys(client_id for client_id, _ in paths))
+            current_epoch = now_second // self.path_slot_seconds
+            for client_id in path_clients:
+                pipe.pfcount(*(self._path_key(client_id, current_epoch - i) for i in range(self.path_slots)))
+            results = await asyncio.wait_for(pipe.execute(), timeout=self.timeout)
+        except Exception as e:
+            self.failures += 1
+            self.degraded_until = time.monotonic() + self.backoff
+            self._remote.clear()
+            self._remote_paths.clear()
+            print(f"WARNING: Anomaly count sync to Redis failed ({type(e).__name__}: {e}); "
+                  f"counting locally for {self.backoff:g}s.")
+            return
+        self.flushes += 1
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+        for key, total in zip(keys, results):
+            self._remote[key] = (int(total), now_second)
+        for client_id, distinct in zip(path_clients, results[len(keys) + 2 * len(paths):]):
+            self._remote_paths[client_id] = (int(distinct), now_second)
+        if len(self._remote) > 2 * len(keys) + 1024:
+            self._remote = {k: v for k, v in self._remote.items() if now_second - v[1] < self.window_seconds}
+        if len(self._remote_paths) > 2 * len(path_clients) + 1024:
+            self._remote_paths = {k: v for k, v in self._remote_paths.items() if now_second - v[1] < self.window_seconds}
+
+    async def run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            if not self.degraded:
+                await self.flush()
+
+    def status(self) -> Dict[str, object]:
+        return {
+            "degraded": self.degraded,
+            "flushes": self.flushes,
+            "failures": self.failures,
+            "last_flush_ms": round(self.last_flush_ms, 3),
+            "pending_counters": len(self._pending),
+            "cluster_views": len(self._remote),
+            "cluster_path_views": len(self._remote_paths),
+        }
@@ -0,0 +1,274 @@
+# aegis_toolkit/blocklist.py
+import asyncio
+import mmap
+import os
+import socket
+import struct
+import sys
+import time
+from array import array
+from bisect import bisect_right
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .config import Settings, IPBlocklistConfig
+from .ip_ranges import _merge
+
+# Compiled layout: header, IPv4 starts and ends as native uint32 arrays, then
+# IPv6 starts and ends as 16-byte big-endian records. Ranges are merged and
+# sorted, so a lookup is a binary search over the starts of one family.
+_MAGIC = b"AEGISBL1"
+_HEADER = struct.Struct("<8s8sQQ")  # magic, byte order of the uint32 arrays, IPv4 count, IPv6 count
+_V6_WIDTH = 16
+_IPV4_MAPPED = 0xFFFF << 32
+assert array("I").itemsize == 4
+
+
+class _FixedWidthKeys:
+    """Read-only sequence of fixed-width big-endian keys over a buffer; bytes compare like the numbers they encode."""
+
+    __slots__ = ("view", "width")
+
+    def __init__(self, view: memoryview, width: int):
+        self.view = view
+        self.width = width
+
+    def __len__(self) -> int:
+        return len(self.view) // self.width
+
+    def __getitem__(self, index: int) -> bytes:
+        offset = index * self.width
+        return self.view[offset:offset + self.width].tobytes()
+
+
+def _parse_address(text: str) -> Optional[Tuple[int, int]]:
+    """(version, integer) for a bare address; inet_pton is much faster than ipaddress for bulk feeds."""
+    try:
+        return 4, int.from_bytes(socket.inet_pton(socket.AF_INET, text), "big")
+    except OSError:
+        pass
+    try:
+        return 6, int.from_bytes(socket.inet_pton(socket.AF_INET6, text), "big")
+    except OSError:
+        return None
+
+
+def parse_feed_entry(token: str) -> Optional[Tuple[int, int, int]]:
+    """Parses an address, CIDR or `first-last` range into (version, start, end), or None."""
+    if "-" in token:
+        first, _, last = token.partition("-")
+        start, end = _parse_address(first.strip()), _parse_address(last.strip())
+        if start is None or end is None or start[0] != end[0] or start[1] > end[1]:
+            return None
+        version, start, end = start[0], start[1], end[1]
+    else:
+        address, _, prefix = token.partition("/")
+        parsed = _parse_address(address)
+        if parsed is None:
+            return None
+        version, number = parsed
+        bits = 32 if version == 4 else 128
+        if prefix:
+            if not prefix.isdigit() or int(prefix) > bits:
+                return None
+            host_bits = bits - int(prefix)
+            start = number >> host_bits << host_bits
+            end = start | ((1 << host_bits) - 1)
+        else:
+            start = end = number
+    if version == 6 and start >> 32 == 0xFFFF and end >> 32 == 0xFFFF:
+        return 4, start - _IPV4_MAPPED, end - _IPV4_MAPPED
+    return version, start, end
+
+
+def read_feeds(paths: Iterable[str]) -> Tuple[List[Tuple[int, int]], List[Tuple[int, int]], int]:
+    """
+    Reads plain-text feeds: one address, CIDR or range per line; anything after
+    whitespace, `#` or `;` is ignored. Returns (IPv4 ranges, IPv6 ranges, number
+    of unparseable lines).
+    """
+    v4: List[Tuple[int, int]] = []
+    v6: List[Tuple[int, int]] = []
+    invalid = 0
+    for path in paths:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                line = line.split("#", 1)[0].split(";", 1)[0].strip()
+                if not line:
+                    continue
+                entry = parse_feed_entry(line.split(None, 1)[0])
+                if entry is None:
+                    invalid += 1
+                elif entry[0] == 4:
+                    v4.append(entry[1:])
+                else:
+                    v6.append(entry[1:])
+    return v4, v6, invalid
+
+
+def compile_ranges(v4: List[Tuple[int, int]], v6: List[Tuple[int, int]]) -> bytes:
+    """Merges the ranges and serializes them in the compiled blocklist layout."""
+    v4_starts, v4_ends = _merge(v4)
+    v6_starts, v6_ends = _merge(v6)
+    return b"".join((
+        _HEADER.pack(_MAGIC, sys.byteorder.encode().ljust(8, b"\0"), len(v4_starts), len(v6_starts)),
+        array("I", v4_starts).tobytes(),
+        array("I", v4_ends).tobytes(),
+        b"".join(n.to_bytes(_V6_WIDTH, "big") for n in v6_starts),
+        b"".join(n.to_bytes(_V6_WIDTH, "big") for n in v6_ends),
+    ))
+
+
+class IPBlocklist:
+    """
+    Blocked IPv4/IPv6 ranges as compact sorted arrays, searched with one binary
+    search per lookup. Same merging as ip_ranges.IPRangeSet, but stored as
+    packed arrays (8 bytes per IPv4 range instead of two Python ints) so feeds
+    with millions of entries stay small, and the arrays can be memory-mapped
+    from a compiled file so every worker on a host shares one copy.
+    """
+
+    def __init__(self, buffer, source: str = ""):
+        view = memoryview(buffer)
+        magic, byteorder, v4_count, v6_count = _HEADER.unpack_from(view)
+        if magic != _MAGIC:
+            raise ValueError(f"{source or 'buffer'} is not a compiled Aegis blocklist")
+        byteorder = byteorder.rstrip(b"\0").decode()
+        if byteorder != sys.byteorder:
+            raise ValueError(f"{source or 'buffer'} was compiled on a {byteorder}-endian host")
+        offset = _HEADER.size
+        v4_size, v6_size = v4_count * 4, v6_count * _V6_WIDTH
+        if len(view) != offset + 2 * v4_size + 2 * v6_size:
+            raise ValueError(f"{source or 'buffer'} is truncated")
+        self._buffer = buffer
+        self._v4_starts = view[offset:offset + v4_size].cast("I")
+        self._v4_ends = view[offset + v4_size:offset + 2 * v4_size].cast("I")
+        offset += 2 * v4_size
+        self._v6_starts = _FixedWidthKeys(view[offset:offset + v6_size], _V6_WIDTH)
+        self._v6_ends = _FixedWidthKeys(view[offset + v6_size:offset + 2 * v6_size], _V6_WIDTH)
+        self.source = source
+        self.nbytes = len(view)
+        self.mapped = isinstance(buffer, mmap.mmap)
+
+    @classmethod
+    def from_feeds(cls, paths: List[str]) -> Tuple["IPBlocklist", int]:
+        """Builds an in-memory blocklist from feed files; returns it with the count of unparseable lines."""
+        v4, v6, invalid = read_feeds(paths)
+        return cls(compile_ranges(v4, v6), source=", ".join(paths)), invalid
+
+    @classmethod
+    def open(cls, path: str) -> "IPBlocklist":
+        """Memory-maps a compiled blocklist; the OS page cache shares it between processes."""
+        with open(path, "rb") as f:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(mapped, source=path)
+
+    def __len__(self) -> int:
+        return len(self._v4_starts) + len(self._v6_starts)
+
+    def contains(self, value: str) -> bool:
+        parsed = _parse_address(value)
+        if parsed is None:
+            return False
+        version, number = parsed
+        if version == 6 and number >> 32 == 0xFFFF:
+            version, number = 4, number - _IPV4_MAPPED
+        if version == 4:
+            index = bisect_right(self._v4_starts, number) - 1
+            return index >= 0 and number <= self._v4_ends[index]
+        packed = number.to_bytes(_V6_WIDTH, "big")
+        index = bisect_right(self._v6_starts, packed) - 1
+        return index >= 0 and packed <= self._v6_ends[index]
+
+    __contains__ = contains
+
+
+def write_compiled(path: str, data: bytes):
+    """Writes a compiled blocklist next to `path` and renames it into place, so readers never see a partial file."""
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+BLOCKLIST_CONFIG = IPBlocklistConfig()
+BLOCKLIST: Optional[IPBlocklist] = None
+_loaded_mtimes: Dict[str, float] = {}
+_last_loaded = 0.0
+
+def _source_mtimes(config: IPBlocklistConfig) -> Dict[str, float]:
+    paths = [config.compiled_path] if config.compiled_path else config.feeds
+    return {path: os.stat(path).st_mtime for path in paths}
+
+def _load(config: IPBlocklistConfig) -> IPBlocklist:
+    if config.compiled_path:
+        return IPBlocklist.open(config.compiled_path)
+    blocklist, invalid = IPBlocklist.from_feeds(config.feeds)
+    if invalid:
+        print(f"WARNING: Skipped {invalid} unparseable blocklist feed lines.")
+    return blocklist
+
+def refresh_blocklist(force: bool = False) -> bool:
+    """
+    Reloads the blocklist when its source files changed (or `force`), building
+    the new index before swapping it in with a single assignment; lookups keep
+    using the old one until then. Returns True if a new blocklist was loaded.
+    """
+    global BLOCKLIST, _loaded_mtimes, _last_loaded
+    config = BLOCKLIST_CONFIG
+    if not config.enabled:
+        BLOCKLIST, _loaded_mtimes = None, {}
+        return False
+    mtimes = _source_mtimes(config)
+    if not force and BLOCKLIST is not None and mtimes == _loaded_mtimes:
+        return False
+    started = time.perf_counter()
+    BLOCKLIST = _load(config)
+    _loaded_mtimes, _last_loaded = mtimes, time.time()
+    print(f"INFO: IP blocklist loaded from {BLOCKLIST.source}: {len(BLOCKLIST)} ranges, "
+          f"{BLOCKLIST.nbytes} bytes{' (mmap)' if BLOCKLIST.mapped else ''} in {time.perf_counter() - started:.2f}s.")
+    return True
+
+def initialize_blocklist(settings: Settings):
+    """Applies the ip_blocklist config and loads the index; a missing or invalid source keeps the previous one."""
+    global BLOCKLIST_CONFIG
+    BLOCKLIST_CONFIG = settings.ip_blocklist
+    try:
+        refresh_blocklist(force=True)
+    except (OSError, ValueError) as e:
+        print(f"WARNING: Could not load IP blocklist: {e}")
+
+async def run_blocklist_refresh():
+    """Background task reloading the blocklist when its feeds or compiled file change."""
+    while True:
+        await asyncio.sleep(BLOCKLIST_CONFIG.refresh_interval_seconds)
+        try:
+            await asyncio.to_thread(refresh_blocklist)
+        except (OSError, ValueError) as e:
+            print(f"WARNING: IP blocklist refresh failed, keeping the current one: {e}")
+
+def is_blocklisted(ip: str) -> bool:
+    blocklist = BLOCKLIST
+    return blocklist is not None and blocklist.contains(ip)
+
+def blocklist_status() -> Dict[str, object]:
+    blocklist = BLOCKLIST
+    return {
+        "enabled": BLOCKLIST_CONFIG.enabled,
+        "source": blocklist.source if blocklist else None,
+        "ranges": len(blocklist) if blocklist else 0,
+        "bytes": blocklist.nbytes if blocklist else 0,
+        "memory_mapped": blocklist.mapped if blocklist else False,
+        "loaded_at": _last_loaded,
+    }
+
+
+if __name__ == "__main__":
+    # python -m aegis_toolkit.blocklist OUTPUT FEED [FEED ...]
+    if len(sys.argv) < 3:
+        print("usage: python -m aegis_toolkit.blocklist OUTPUT FEED [FEED ...]")
+        sys.exit(2)
+    v4_ranges, v6_ranges, skipped = read_feeds(sys.argv[2:])
+    write_compiled(sys.argv[1], compile_ranges(v4_ranges, v6_ranges))
+    print(f"Compiled {len(v4_ranges) + len(v6_ranges)} entries ({skipped} skipped) into {sys.argv[1]}.")
@@ -1,13 +1,78 @@
 # core/cartographer.py
 import httpx
 import logging
+import re
+import time
+from typing import Optional
 from fastapi import HTTPException
 from .config import Settings
+from .endpoint_router import EndpointMatch
+from .heavy_hitters import SpaceSaving
+from .spec_validation import SpecValidatorRegistry
 
 KNOWN_ENDPOINTS = set()
-SHADOW_ENDPOINTS = set()
+SHADOW_ENDPOINTS = SpaceSaving(1000) # Top undocumented "METHOD /normalized/path" signatures by request count
+SPEC_VALIDATORS = SpecValidatorRegistry()
 audit_logger = logging.getLogger("audit")
 
+_NUMERIC_SEGMENT = re.compile(r"^\d+$")
+_UUID_SEGMENT = re.compile(r"^[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}$")
+_HEX_SEGMENT = re.compile(r"^(?=.*\d)[0-9a-fA-F]{8,}$")
+_shadow_audit_allowance = float("inf") # the bucket starts full
+_shadow_audit_updated = 0.0
+_shadow_audit_suppressed = 0
+
+def load_api_spec(spec: dict) -> int:
+    """
+    Rebuilds the known-endpoint map, the endpoint router and the request-body
+    validators from an OpenAPI document. The router and validators are swapped
+    in together once the whole spec compiled. Returns the number of body
+    validators compiled.
+    """
+    KNOWN_ENDPOINTS.clear()
+    for path, methods in spec.get('paths', {}).items():
+        for method in methods:
+            KNOWN_ENDPOINTS.add(f"{method.upper()} {path}")
+
+    errors = SPEC_VALIDATORS.load(spec)
+    for error in errors:
+        print(f"WARNING: Could not compile request-body validator for {error}")
+    return len(SPEC_VALIDATORS.validators)
+
+def normalize_shadow_path(path: str) -> str:
+    """Collapses ID-like segments (numbers, UUIDs, hex digests) so /items/1 and /items/2 count as one endpoint."""
+    segments = path.split("/")
+    for i, segment in enumerate(segments):
+        if _NUMERIC_SEGMENT.match(segment):
+            segments[i] = "{int}"
+        elif _UUID_SEGMENT.match(segment):
+            segments[i] = "{uuid}"
+        elif _HEX_SEGMENT.match(segment):
+            segments[i] = "{hex}"
+    return "/".join(segments)
+
+def initialize_shadow_tracking(settings: Settings):
+    """Resizes the shadow-endpoint counter when `api_discovery.shadow_tracking_capacity` changes."""
+    capacity = settings.api_discovery.shadow_tracking_capacity
+    if capacity != SHADOW_ENDPOINTS.capacity:
+        SHADOW_ENDPOINTS.capacity = capacity
+        SHADOW_ENDPOINTS.clear()
+
+def _allow_shadow_audit(per_minute: int) -> bool:
+    """Token bucket over SHADOW_API_DISCOVERED audit events, so scanner traffic cannot flood the audit log."""
+    global _shadow_audit_allowance, _shadow_audit_updated
+    now = time.monotonic()
+    _shadow_audit_allowance = min(float(per_minute), _shadow_audit_allowance + (now - _shadow_audit_updated) * per_minute / 60)
+    _shadow_audit_updated = now
+    if _shadow_audit_allowance < 1.0:
+        return False
+    _shadow_audit_allowance -= 1.0
+    return True
+
+def match_endpoint(method: str, path: str) -> Optional[EndpointMatch]:
+    """Maps a concrete request path to its spec operation and path parameters."""
+    return SPEC_VALIDATORS.router.match(method, path)
+
 async def initialize_api_spec(settings: Settings):
     """On startup, load the official OpenAPI spec to build a map of known endpoints."""
     spec_url = settings.api_discovery.openapi_spec_url
@@ -19,32 +84,36 @@ async def initialize_api_spec(settings: Settings):
         async with httpx.AsyncClient() as client:
             response = await client.get(spec_url)
             response.raise_for_status()
-            spec = response.json()
-            for path, methods in spec.get('paths', {}).items():
-                for method in methods:
-                    KNOWN_ENDPOINTS.add(f"{method.upper()} {path}")
-        print(f"Cartographer initialized with {len(KNOWN_ENDPOINTS)} known endpoints from spec.")
+            validator_count = load_api_spec(response.json())
+        print(f"Cartographer initialized with {len(KNOWN_ENDPOINTS)} known endpoints and "
+              f"{validator_count} request-body validators from spec.")
     except Exception as e:
         print(f"ERROR: Cartographer failed to initialize from spec URL '{spec_url}': {e}")
 
 
-def check_for_shadow_api(method: str, path_template: str, settings: Settings):
+def check_for_shadow_api(method: str, path: str, endpoint: Optional[EndpointMatch], settings: Settings):
     """
     Check if a requested endpoint is in the official spec.
     If not, it's a "shadow API" and should be flagged or blocked.
+    `endpoint` is the request's match from `match_endpoint`.
     """
-    endpoint_signature = f"{method.upper()} {path_template}"
-    
-    if endpoint_signature in KNOWN_ENDPOINTS or endpoint_signature in SHADOW_ENDPOINTS:
+    if endpoint is not None:
         return
-        
-    SHADOW_ENDPOINTS.add(endpoint_signature)
-    
-    log_message = f"SHADOW_API_DISCOVERED: Undocumented endpoint was accessed: '{endpoint_signature}'"
-    audit_logger.critical(f"AUDIT - {log_message}")
+
+    global _shadow_audit_suppressed
+    endpoint_signature = f"{method.upper()} {normalize_shadow_path(path)}"
+    _, first_seen = SHADOW_ENDPOINTS.add(endpoint_signature)
+    if first_seen:
+        if _allow_shadow_audit(settings.api_discovery.shadow_audit_events_per_minute):
+            suppressed = f" ({_shadow_audit_suppressed} more suppressed)" if _shadow_audit_suppressed else ""
+            _shadow_audit_suppressed = 0
+            log_message = f"SHADOW_API_DISCOVERED: Undocumented endpoint was accessed: '{endpoint_signature}'{suppressed}"
+            audit_logger.critical(f"AUDIT - {log_message}")
+        else:
+            _shadow_audit_suppressed += 1
 
     if settings.api_discovery.on_shadow_api_discovered == 'block':        
         raise HTTPException(
             status_code=501, 
             detail="This API endpoint is not implemented or has been deprecated."
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,45 @@
+# aegis_toolkit/client_registry.py
+import hashlib
+from typing import Dict, Iterable, NamedTuple, Optional
+
+from .config import ApiClient
+from .ip_ranges import IPRangeSet
+
+
+def hash_api_key(api_key: str) -> str:
+    return hashlib.sha256(api_key.encode()).hexdigest()
+
+
+class RegisteredClient(NamedTuple):
+    client: ApiClient
+    allowed_ips: Optional[IPRangeSet]  # None: no IP restriction
+
+    def ip_allowed(self, host: str) -> bool:
+        return self.allowed_ips is None or (bool(host) and self.allowed_ips.contains(host))
+
+
+class ClientRegistry:
+    """
+    API clients keyed by the SHA-256 of their key. Plaintext keys are not kept:
+    the stored ApiClient's `api_key` holds the digest. Each client's
+    `allowed_ips` (addresses or CIDR ranges, IPv4 and IPv6) is compiled into an
+    IPRangeSet. A client whose allowlist has no valid entry allows no address.
+    """
+
+    def __init__(self, clients: Iterable[ApiClient]):
+        self._by_digest: Dict[str, RegisteredClient] = {}
+        for client in clients:
+            digest = hash_api_key(client.api_key)
+            allowed = None
+            if client.allowed_ips:
+                allowed, invalid = IPRangeSet.from_strings(client.allowed_ips)
+                for entry in invalid:
+                    print(f"WARNING: Ignoring invalid allowed_ips entry '{entry}' for client '{client.client_id}'.")
+            stored = client.model_copy(update={"api_key": digest})
+            self._by_digest[digest] = RegisteredClient(stored, allowed)
+
+    def __len__(self) -> int:
+        return len(self._by_digest)
+
+    def lookup(self, api_key: str) -> Optional[RegisteredClient]:
+        return self._by_digest.get(hash_api_key(api_key))
@@ -1,72 +1,157 @@
 # core/config.py
+import asyncio
+import os
 import yaml
 import json
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr
 from pydantic_settings import BaseSettings
-from typing import List, Dict, Optional, Any
+from typing import List, Dict, Optional, Any, Callable, Literal, Tuple
 
 from .schemas import ApiClient, ErrorDetail, ErrorResponse
 
-class AccessRule(BaseModel):
+class _FrozenConfig(BaseModel):
+    """Config sections are immutable like the snapshot holding them; a reload builds new ones."""
+    model_config = ConfigDict(frozen=True)
+
+class AccessRule(_FrozenConfig):
     path_pattern: str
-    methods: List[str] = ["*"]
+    methods: Tuple[str, ...] = ("*",)
     enforce_owner: Optional[str] = None  # The claim in the JWT to check (e.g., "user_id")
     owner_path_param: Optional[str] = None # The name of the path parameter (e.g., "user_id" in /users/{user_id})
 
-class SecureEnclaveConfig(BaseModel):
+class SecureEnclaveConfig(_FrozenConfig):
     provider: str
     require_attestation: bool
 
-class SelfLearningConfig(BaseModel):
+class SelfLearningConfig(_FrozenConfig):
     enabled: bool
     feedback_sink: str
 
-class DynamicAccessTier(BaseModel):
+class DynamicAccessTier(_FrozenConfig):
     risk_threshold: float
     action: str
     throttle_limit: Optional[str] = None
     captcha_provider_url: Optional[str] = None
 
-class ApiDiscoveryConfig(BaseModel):
+class ApiDiscoveryConfig(_FrozenConfig):
     openapi_spec_url: str
     on_shadow_api_discovered: str
+    validate_request_bodies: bool = False # Enforce the spec's JSON requestBody schemas (422 on mismatch)
+    shadow_tracking_capacity: int = 1000 # Undocumented endpoints counted at once (Space-Saving top-k)
+    shadow_audit_events_per_minute: int = 60 # SHADOW_API_DISCOVERED audit lines beyond this are counted, not logged
 
-class LogShippingConfig(BaseModel):
+class LogShippingConfig(_FrozenConfig):
     enabled: bool
     endpoint: str
     auth_token: str
 
-class AuthPolicy(BaseModel):
+class AuthPolicy(_FrozenConfig):
     name: str
     match: Dict[str, Any]
-    rules: List[AccessRule]
+    rules: Tuple[AccessRule, ...]
 
-class BehavioralAnalysisConfig(BaseModel):
+class BehavioralAnalysisConfig(_FrozenConfig):
+    # Off by default: profiles are keyed by API client, which many end users share.
+    enforce: bool = False # Profile clients in Redis and block on the checks below
     enforce_header_consistency: bool
     max_path_entropy: float
 
-class AIModelConfig(BaseModel):
+class AIModelConfig(_FrozenConfig):
     path: str
     high_risk_threshold: float
 
-class WAFRule(BaseModel):
+class WAFRule(_FrozenConfig):
     name: str
+    type: Optional[str] = None # e.g. "graphql_depth_check" / "graphql_cost_check"
     description: Optional[str] = None
     path_pattern: str  # Add path pattern to apply rule to specific endpoints
-    methods: List[str] = ["*"] # Add methods to scope the rule
+    methods: Tuple[str, ...] = ("*",) # Add methods to scope the rule
     body_schema: Optional[str] = None # The name of the Pydantic schema to enforce
     pattern: Optional[str] = None
     max_depth: Optional[int] = None
     max_cost: Optional[int] = None # Added for GraphQL cost analysis
-    inspect_locations: List[str] = []
+    inspect_locations: Tuple[str, ...] = ()
     action: str
     enforce_owner: Optional[str] = None
 
-class PIIScanPolicy(BaseModel):
+class WAFStreamingConfig(_FrozenConfig):
+    enabled: bool = False
+    max_body_size: int = 10 * 1024 * 1024 # Requests above this are rejected with 413 before buffering
+    chunk_overlap: int = 1024 # Characters carried between chunks so split signatures still match
+    forward_while_scanning: bool = False # Stream scanned chunks to the backend instead of spooling them
+    spool_max_memory: int = 1024 * 1024 # Spooled bodies above this move from memory to a temporary file
+
+class WAFEngineConfig(_FrozenConfig):
+    profile_signatures: bool = False # Record per-signature match time and hit counts
+    scan_time_budget_ms: Optional[float] = None # Per-location scan budget; None disables the check
+    signature_budget_action: str = "block" # Built-in signatures over budget: "block" fails closed, "log" fails open
+    redos_policy: str = "reject" # Backtracking-prone rule patterns at load: "reject" or "warn"
+
+class WAFOffloadConfig(_FrozenConfig):
+    enabled: bool = False
+    size_threshold: int = 256 * 1024 # Bodies at least this large are scanned in the worker pool
+    workers: int = 2
+    max_queue: int = 32 # Scans queued or running at once; further large requests get a 503
+
+class AnomalyDetectionConfig(_FrozenConfig):
+    error_threshold: int = 10 # Blocked errors per client per 60s window
+    path_enumeration_threshold: int = 20 # Distinct normalized paths per client per 60s window
+    max_tracked_clients: int = 100_000 # Least recently seen clients are evicted beyond this
+    idle_eviction_seconds: float = 300.0 # Clients silent for this long are dropped
+    distributed: bool = False # Merge counts across workers/nodes through Redis
+    flush_interval_ms: float = 20.0 # How often batched increments are flushed to Redis
+    redis_timeout_ms: float = 50.0 # A flush slower than this switches to local-only counting
+    degraded_backoff_seconds: float = 5.0 # How long to stay local-only after a slow or failed flush
+
+class RateLimitingConfig(_FrozenConfig):
+    enabled: bool = True
+    key_by_user: bool = False # Separate buckets per JWT user within each API client
+    roles: Dict[str, str] = {} # role -> "N/period"; the top-level `rate_limit` is the default
+    clients: Dict[str, str] = {} # client_id -> "N/period", overrides the role quota
+    exempt_path_prefixes: Tuple[str, ...] = ("/admin", "/health")
+    degraded_backoff_seconds: float = 5.0 # After a Redis error, use in-process buckets this long before retrying Redis
+
+class TokenRevocationConfig(_FrozenConfig):
+    enabled: bool = True
+    refresh_interval_seconds: float = 5.0 # How often workers pull new revocations from Redis
+    full_rebuild_seconds: float = 3600.0 # Rebuild the filter from scratch to shed expired entries
+    expected_revocations: int = 100_000 # Bloom filter sizing
+    false_positive_rate: float = 0.001
+    max_token_lifetime_seconds: int = 86_400 # Revocation log entries older than this are trimmed
+    fail_closed: bool = True # Treat a filter positive as revoked when Redis cannot confirm it
+
+class IPReputationConfig(_FrozenConfig):
+    api_url: str = "https://api.abuseipdb.com/api/v2/check"
+    clean_ttl_seconds: float = 3600.0 # How long a below-threshold score is trusted
+    malicious_ttl_seconds: float = 86_400.0 # How long a blocked IP stays blocked without a new lookup
+    error_ttl_seconds: float = 30.0 # Failed lookups are not retried for this long (the IP is allowed)
+    max_cached_ips: int = 100_000
+    timeout_seconds: float = 2.0
+    max_connections: int = 20 # Pooled connections to AbuseIPDB per worker
+    background_lookup: bool = False # Allow uncached IPs while their lookup runs instead of waiting for it
+
+class IPBlocklistConfig(_FrozenConfig):
+    enabled: bool = False
+    feeds: Tuple[str, ...] = () # Plain-text IP/CIDR/range lists, loaded into each worker
+    compiled_path: Optional[str] = None # Prebuilt file (python -m aegis_toolkit.blocklist), memory-mapped and shared by all workers; takes precedence over feeds
+    refresh_interval_seconds: float = 60.0 # How often sources are checked for changes
+
+class PIIRedactionConfig(_FrozenConfig):
+    workers: int = 2 # Processes running the PII analyzer; 0 redacts inline on the event loop
+    max_queue: int = 64 # Redactions queued or running at once; beyond this `on_failure` applies
+    timeout_ms: float = 2000.0 # Per-response redaction deadline
+    on_failure: Literal["open", "closed"] = "open" # Full queue, timeout or worker error: "open" returns the body unredacted, "closed" returns 503
+    json_aware: bool = True # Scan only the string values of JSON responses instead of the raw text
+    inline_pattern_max_bytes: int = 32768 # Bodies up to this size needing only pattern recognizers skip the worker pool
+
+class PIIScanPolicy(_FrozenConfig):
     role: str
-    redact_entities: List[str]
+    redact_entities: Tuple[str, ...]
+    # JSON field paths, dot-separated; "*" matches any key or array index and a path covers everything below it.
+    scan_fields: Tuple[str, ...] = () # Only these fields are scanned; empty scans every string value
+    skip_fields: Tuple[str, ...] = () # Known-safe fields that are never scanned
 
-class Query(BaseModel):
+class Query(_FrozenConfig):
     name: str
     http_method: str
     backend_url: str
@@ -74,93 +159,255 @@ class Query(BaseModel):
     body: Optional[Dict[str, Any]] = None
     params: Optional[Dict[str, Any]] = None
 
-class Aggregation(BaseModel):
+class Aggregation(_FrozenConfig):
     public_path: str
     required_role: str
-    queries: List[Query]
+    queries: Tuple[Query, ...]
 
-class ApiClient(BaseModel):
+class ApiClient(_FrozenConfig):
     client_id: str
     api_key: str
     role: str
-    allowed_ips: List[str] = []
+    allowed_ips: Tuple[str, ...] = ()
+
+
+class PreforkConfig(_FrozenConfig):
+    enabled: bool = False # `python prefork_server.py` preloads shared state once and forks the gateway workers
+    workers: int = 0 # Gateway processes; 0 = one per CPU
+    host: str = "127.0.0.1"
+    port: int = 8000
+    restart_delay_seconds: float = 1.0 # Wait before re-forking a dead worker; doubles while workers keep dying soon after start
+    restart_max_delay_seconds: float = 30.0
+    memory_report_delay_seconds: float = 30.0 # Log per-process RSS/PSS/USS this long after start-up; 0 disables
+
+class ConfigReloadConfig(_FrozenConfig):
+    watch: bool = True # Poll config.yaml and reload when it changes
+    interval_seconds: float = 2.0
+
+class ConfigSnapshot(_FrozenConfig):
+    """
+    Immutable, fully validated view of config.yaml plus the API client list.
+    Built once per (re)load; request handlers only ever read its attributes.
+    """
+    version: int
+    source_mtime: float
+    backend_target_url: str = ''
+    rate_limit: Optional[str] = None
+    egress_allowlist: Tuple[str, ...] = ()
+    abuseipdb_api_key: str = ''
+    abuseipdb_confidence_minimum: int = 95
+    ip_reputation: IPReputationConfig = IPReputationConfig()
+    ip_blocklist: IPBlocklistConfig = IPBlocklistConfig()
+    audit_log_signing_key: str = ''
+    api_discovery: ApiDiscoveryConfig
+    behavioral_analysis: BehavioralAnalysisConfig
+    adaptive_security_model: AIModelConfig
+    log_shipping: LogShippingConfig
+    authorization_policies: Tuple[AuthPolicy, ...] = ()
+    waf_rules: Tuple[WAFRule, ...] = ()
+    waf_engine: WAFEngineConfig = WAFEngineConfig()
+    waf_offload: WAFOffloadConfig = WAFOffloadConfig()
+    waf_streaming: WAFStreamingConfig = WAFStreamingConfig()
+    pii_scan_policy: Tuple[PIIScanPolicy, ...] = ()
+    pii_redaction: PIIRedactionConfig = PIIRedactionConfig()
+    aggregations: Tuple[Aggregation, ...] = ()
+    config_reload: ConfigReloadConfig = ConfigReloadConfig()
+    prefork: PreforkConfig = PreforkConfig()
+    token_revocation: TokenRevocationConfig = TokenRevocationConfig()
+    rate_limiting: RateLimitingConfig = RateLimitingConfig()
+    anomaly_detection: AnomalyDetectionConfig = AnomalyDetectionConfig()
+    api_clients: Tuple[ApiClient, ...] = ()
 
 
 class Settings(BaseSettings):
     jwt_secret_key: str = Field(alias='JWT_SECRET_KEY')
     api_clients_json: str = Field(alias='API_CLIENTS_JSON')
     redis_url: Optional[str] = Field(None, alias='REDIS_URL')
+    config_path: str = Field("config.yaml", alias='AEGIS_CONFIG_PATH')
+
+    _snapshot: Optional[ConfigSnapshot] = PrivateAttr(None)
+    _reload_listeners: List[Callable[["Settings"], None]] = PrivateAttr(default_factory=list)
+
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        """The active configuration snapshot, built from config.yaml on first access."""
+        if self._snapshot is None:
+            try:
+                self._snapshot = self._build_snapshot()
+            except FileNotFoundError:
+                print(f"ERROR: Configuration file '{self.config_path}' not found. Please ensure it exists.")
+                exit(1)
+            except (yaml.YAMLError, ValueError) as e:
+                print(f"ERROR: Configuration file '{self.config_path}' is invalid: {e}")
+                exit(1)
+        return self._snapshot
+
+    def _build_snapshot(self) -> ConfigSnapshot:
+        print(f"Loading and parsing {self.config_path}...")
+        with open(self.config_path, "r") as f:
+            source_mtime = os.fstat(f.fileno()).st_mtime
+            raw = yaml.safe_load(f) or {}
+        if not isinstance(raw, dict):
+            raise ValueError("top level must be a mapping")
+        version = self._snapshot.version + 1 if self._snapshot is not None else 1
+        return ConfigSnapshot.model_validate({
+            **raw,
+            "version": version,
+            "source_mtime": source_mtime,
+            "api_clients": json.loads(self.api_clients_json),
+        })
+
+    def add_reload_listener(self, listener: Callable[["Settings"], None]):
+        """Registers a callback run after each successful reload, e.g. to recompile derived state."""
+        self._reload_listeners.append(listener)
+
+    def reload(self) -> ConfigSnapshot:
+        """
+        Builds and validates a new snapshot, swaps it in with a single assignment,
+        then runs the reload listeners. Raises (and keeps the current snapshot)
+        if the file is missing or invalid, or if a listener rejects the new
+        config; the listeners that already ran (and the one that failed) are
+        then run again on the previous snapshot, so the state they derived
+        matches it. Meant to run off the event loop.
+        """
+        snapshot = self._build_snapshot()
+        previous, self._snapshot = self._snapshot, snapshot
+        applied = 0
+        try:
+            for listener in self._reload_listeners:
+                applied += 1
+                listener(self)
+        except Exception:
+            self._snapshot = previous
+            for listener in self._reload_listeners[:applied]:
+                try:
+                    listener(self)
+                except Exception as e:
+                    print(f"WARNING: Restoring version {previous.version} in {getattr(listener, '__name__', listener)} failed: {e}")
+            raise
+        return snapshot
 
     @property
-    def api_clients(self) -> List[ApiClient]:
-        """Parses the API_CLIENTS_JSON string into a list of ApiClient objects."""
-        return [ApiClient(**c) for c in json.loads(self.api_clients_json)]
+    def api_clients(self) -> Tuple[ApiClient, ...]:
+        return self.snapshot.api_clients
  
     @property
     def abuseipdb_api_key(self) -> str:
-        return self._load_yaml().get('abuseipdb_api_key', '')
+        return self.snapshot.abuseipdb_api_key
         
     @property
     def abuseipdb_confidence_minimum(self) -> int:
-        return self._load_yaml().get('abuseipdb_confidence_minimum', 95)
+        return self.snapshot.abuseipdb_confidence_minimum
         
+    @property
+    def ip_reputation(self) -> IPReputationConfig:
+        return self.snapshot.ip_reputation
+
+    @property
+    def ip_blocklist(self) -> IPBlocklistConfig:
+        return self.snapshot.ip_blocklist
+
     @property
     def audit_log_signing_key(self) -> str:
-        return self._load_yaml().get('audit_log_signing_key', '')
+        return self.snapshot.audit_log_signing_key
 
     @property
     def api_discovery(self) -> ApiDiscoveryConfig:
-        return ApiDiscoveryConfig(**self._load_yaml().get('api_discovery', {}))
+        return self.snapshot.api_discovery
 
     @property
     def log_shipping(self) -> LogShippingConfig:
-        return LogShippingConfig(**self._load_yaml().get('log_shipping', {}))
+        return self.snapshot.log_shipping
 
     @property
     def backend_target_url(self) -> str:
-        return self._load_yaml().get('backend_target_url', '')
+        return self.snapshot.backend_target_url
 
     @property
-    def authorization_policies(self) -> List[AuthPolicy]:
-        return [AuthPolicy(**p) for p in self._load_yaml().get('authorization_policies', [])]
+    def authorization_policies(self) -> Tuple[AuthPolicy, ...]:
+        return self.snapshot.authorization_policies
 
     @property
     def behavioral_analysis(self) -> BehavioralAnalysisConfig:
-        return BehavioralAnalysisConfig(**self._load_yaml().get('behavioral_analysis', {}))
+        return self.snapshot.behavioral_analysis
 
     @property
     def adaptive_security_model(self) -> AIModelConfig:
-        return AIModelConfig(**self._load_yaml().get('adaptive_security_model', {}))
+        return self.snapshot.adaptive_security_model
 
     @property
-    def waf_rules(self) -> List[WAFRule]: # Renamed from sentry_rules
-        """Loads and validates the 'waf_rules' section from config.yaml."""
-        config = self._load_yaml()
-        rules_data = config.get('waf_rules', [])
-        return [WAFRule(**r) for r in rules_data]
+    def waf_rules(self) -> Tuple[WAFRule, ...]:
+        return self.snapshot.waf_rules
 
     @property
-    def pii_scan_policy(self) -> List[PIIScanPolicy]:
-        return [PIIScanPolicy(**p) for p in self._load_yaml().get('pii_scan_policy', [])]
+    def waf_engine(self) -> WAFEngineConfig:
+        return self.snapshot.waf_engine
 
     @property
-    def egress_allowlist(self) -> List[str]:
-        return self._load_yaml().get('egress_allowlist', [])
-        
+    def waf_offload(self) -> WAFOffloadConfig:
+        return self.snapshot.waf_offload
+
     @property
-    def aggregations(self) -> List[Aggregation]:
-        return [Aggregation(**a) for a in self._load_yaml().get('aggregations', [])]
+    def waf_streaming(self) -> WAFStreamingConfig:
+        return self.snapshot.waf_streaming
 
-    def _load_yaml(self, path: str = "config.yaml") -> Dict:
-        if not hasattr(self, '_yaml_config'):
-            print(f"Loading and parsing {path}...")
-            try:
-                with open(path, "r") as f:
-                    self._yaml_config = yaml.safe_load(f)
-            except FileNotFoundError:
-                print(f"ERROR: Configuration file '{path}' not found. Please ensure it exists.")
-                exit(1)
-        return self._yaml_config
+    @property
+    def anomaly_detection(self) -> AnomalyDetectionConfig:
+        return self.snapshot.anomaly_detection
+
+    @property
+    def rate_limiting(self) -> RateLimitingConfig:
+        return self.snapshot.rate_limiting
+
+    @property
+    def token_revocation(self) -> TokenRevocationConfig:
+        return self.snapshot.token_revocation
+
+    @property
+    def pii_scan_policy(self) -> Tuple[PIIScanPolicy, ...]:
+        return self.snapshot.pii_scan_policy
+
+    @property
+    def pii_redaction(self) -> PIIRedactionConfig:
+        return self.snapshot.pii_redaction
+
+    @property
+    def prefork(self) -> PreforkConfig:
+        return self.snapshot.prefork
+
+    @property
+    def egress_allowlist(self) -> Tuple[str, ...]:
+        return self.snapshot.egress_allowlist
+        
+    @property
+    def aggregations(self) -> Tuple[Aggregation, ...]:
+        return self.snapshot.aggregations
 
     class Config:
-        env_file_encoding = 'utf-8'
\ No newline at end of file
+        env_file_encoding = 'utf-8'
+
+
+async def watch_config(settings: Settings):
+    """
+    Polls the config file's mtime and reloads the snapshot when it changes. The
+    reload (YAML parse, validation, recompiling the WAF) runs in a worker thread,
+    so requests keep being served from the old snapshot until the swap.
+    """
+    failed_mtime = None
+    while True:
+        await asyncio.sleep(settings.snapshot.config_reload.interval_seconds)
+        if not settings.snapshot.config_reload.watch:
+            continue
+        try:
+            mtime = os.stat(settings.config_path).st_mtime
+        except OSError:
+            continue
+        if mtime == settings.snapshot.source_mtime or mtime == failed_mtime:
+            continue
+        try:
+            snapshot = await asyncio.to_thread(settings.reload)
+            failed_mtime = None
+            print(f"INFO: Configuration reloaded from '{settings.config_path}' (version {snapshot.version}).")
+        except Exception as e:
+            failed_mtime = mtime
+            print(f"WARNING: Configuration reload failed, keeping version {settings.snapshot.version}: {e}")
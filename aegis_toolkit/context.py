@@ -0,0 +1,105 @@
+# aegis_toolkit/context.py
+import html
+import json
+import logging
+from functools import cached_property
+from typing import Any, Dict, Optional
+from urllib.parse import unquote
+
+from fastapi import Request
+
+from . import cartographer
+from .endpoint_router import EndpointMatch
+
+audit_logger = logging.getLogger("audit")
+_UNPARSED = object()
+
+def canonicalize_input(data: str) -> str:
+    """
+    Normalizes input by decoding, converting to lowercase, and removing null bytes
+    to defeat common WAF evasion techniques.
+    """
+    if not data:
+        return ""
+
+    decoded_data = data
+    try:
+        for _ in range(3):
+            new_decoded_data = unquote(decoded_data)
+            if new_decoded_data == decoded_data:
+                break
+            decoded_data = new_decoded_data
+
+        decoded_data = html.unescape(decoded_data)
+
+        decoded_data = decoded_data.replace('\x00', '')
+
+        decoded_data = decoded_data.lower()
+
+    except Exception as e:
+        audit_logger.warning(f"WAF: Input canonicalization failed for data snippet '{data[:50]}...': {e}")
+        pass
+
+    return decoded_data
+
+class RequestContext:
+    """
+    Per-request view of an inbound request, built once in the gateway and handed
+    to every security stage. Derived forms (decoded text, canonical forms, parsed
+    JSON, query and path params) are computed on first access and then reused, so
+    each piece of parsing happens at most once per request.
+    """
+
+    def __init__(self, request: Request, body: bytes = b""):
+        self.request = request
+        self.body = body
+        self.method = request.method
+        self.path = request.url.path
+        self.headers = request.headers
+        self.client_host = request.client.host if request.client else ""
+        self._json = _UNPARSED
+        self._json_error = None
+
+    @cached_property
+    def body_text(self) -> str:
+        return self.body.decode('utf-8', 'ignore')
+
+    @cached_property
+    def canonical_body(self) -> str:
+        return canonicalize_input(self.body_text)
+
+    @cached_property
+    def query_string(self) -> str:
+        return self.request.url.query
+
+    @cached_property
+    def canonical_query(self) -> str:
+        return canonicalize_input(self.query_string)
+
+    @cached_property
+    def query_params(self) -> Dict[str, str]:
+        return dict(self.request.query_params)
+
+    @cached_property
+    def endpoint(self) -> Optional[EndpointMatch]:
+        """The API spec operation this request maps to, if any."""
+        return cartographer.match_endpoint(self.method, self.path)
+
+    @cached_property
+    def path_params(self) -> Dict[str, Any]:
+        """Parameters extracted against the spec's path template, else the route's own."""
+        if self.endpoint is not None:
+            return self.endpoint.params
+        return dict(self.request.path_params)
+
+    def json(self) -> Any:
+        """Parses the body as JSON once; a decode error is cached and re-raised on every call."""
+        if self._json is _UNPARSED:
+            try:
+                self._json = json.loads(self.body_text)
+            except json.JSONDecodeError as e:
+                self._json = None
+                self._json_error = e
+        if self._json_error is not None:
+            raise self._json_error
+        return self._json
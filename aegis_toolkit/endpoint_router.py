@@ -0,0 +1,107 @@
+# aegis_toolkit/endpoint_router.py
+import re
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+_PARAM = re.compile(r"\{([^{}/]+)\}")
+
+
+class EndpointMatch(NamedTuple):
+    method: str
+    template: str  # the spec path, e.g. "/users/{user_id}"
+    params: Dict[str, str]
+
+    @property
+    def signature(self) -> str:
+        return f"{self.method} {self.template}"
+
+
+class _Node:
+    __slots__ = ("literals", "patterns", "param", "operations")
+
+    def __init__(self):
+        self.literals: Dict[str, "_Node"] = {}
+        self.patterns: List[Tuple["re.Pattern", "_Node"]] = []  # segments mixing text and {params}, e.g. "{name}.json"
+        self.param: Optional["_Node"] = None  # a whole-segment {param}
+        self.operations: Dict[str, Tuple[str, Tuple[str, ...]]] = {}  # method -> (template, param names)
+
+
+class EndpointRouter:
+    """
+    Segment trie over the spec's path templates. Matching walks one node per
+    path segment, trying a literal child before a partially templated one
+    before a `{param}` child (and backtracking if that branch dead-ends), so
+    `/users/me` wins over `/users/{id}` and a lookup costs O(segments)
+    regardless of how many operations the spec has.
+    """
+
+    def __init__(self, operations: Iterable[Tuple[str, str]] = ()):
+        self._root = _Node()
+        self._count = 0
+        for method, template in operations:
+            self.add(method, template)
+
+    def add(self, method: str, template: str):
+        node = self._root
+        names: List[str] = []
+        for segment in template.split("/")[1:]:
+            segment_names = _PARAM.findall(segment)
+            if not segment_names:
+                node = node.literals.setdefault(segment, _Node())
+            elif segment == f"{{{segment_names[0]}}}":
+                if node.param is None:
+                    node.param = _Node()
+                node = node.param
+            else:
+                regex = re.compile("".join(
+                    "([^/]+?)" if i % 2 else re.escape(part) for i, part in enumerate(_PARAM.split(segment))
+                ))
+                child = next((c for r, c in node.patterns if r.pattern == regex.pattern), None)
+                if child is None:
+                    child = _Node()
+                    node.patterns.append((regex, child))
+                node = child
+            names.extend(segment_names)
+        if method.upper() not in node.operations:
+            self._count += 1
+        node.operations[method.upper()] = (template, tuple(names))
+
+    def __len__(self) -> int:
+        return self._count
+
+    def match(self, method: str, path: str) -> Optional[EndpointMatch]:
+        """The spec operation serving `method path`, with its path parameters, or None."""
+        segments = path.split("/")[1:]
+        values: List[str] = []
+        operation = self._walk(self._root, segments, 0, method.upper(), values)
+        if operation is None:
+            return None
+        template, names = operation
+        return EndpointMatch(method.upper(), template, dict(zip(names, values)))
+
+    def _walk(self, node: _Node, segments: List[str], index: int, method: str, values: List[str]):
+        if index == len(segments):
+            return node.operations.get(method)
+        segment = segments[index]
+        child = node.literals.get(segment)
+        if child is not None:
+            found = self._walk(child, segments, index + 1, method, values)
+            if found is not None:
+                return found
+        if not segment:
+            return None
+        for regex, child in node.patterns:
+            matched = regex.fullmatch(segment)
+            if matched is None:
+                continue
+            values.extend(matched.groups())
+            found = self._walk(child, segments, index + 1, method, values)
+            if found is not None:
+                return found
+            del values[len(values) - len(matched.groups()):]
+        if node.param is not None:
+            values.append(segment)
+            found = self._walk(node.param, segments, index + 1, method, values)
+            if found is not None:
+                return found
+            values.pop()
+        return None
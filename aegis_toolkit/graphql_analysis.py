@@ -0,0 +1,373 @@
+# aegis_toolkit/graphql_analysis.py
+import hashlib
+import math
+import re
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+# Arguments whose integer value multiplies the cost of the field's children (list pagination).
+PAGINATION_ARGUMENTS = ("first", "last", "limit")
+MAX_NESTING = 128
+MAX_MULTIPLIER = 1_000_000_000  # far above any sane max_cost; keeps costs of absurd page sizes small integers
+CACHE_SIZE = 2048
+
+_TOKEN_RE = re.compile(r'''
+     (?P<ignored>[\s,\ufeff]+|\#[^\n\r]*)
+    |(?P<block_string>"""(?:\\"""|[^"]|"(?!""))*""")
+    |(?P<string>"(?:\\.|[^"\\\n\r])*")
+    |(?P<spread>\.\.\.)
+    |(?P<punct>[!$&():=@\[\]{|}])
+    |(?P<number>-?(?:0|[1-9][0-9]*)(?:\.[0-9]+)?(?:[eE][+-]?[0-9]+)?)
+    |(?P<name>[_A-Za-z][_0-9A-Za-z]*)
+''', re.VERBOSE)
+
+
+class GraphQLSyntaxError(ValueError):
+    pass
+
+
+class PersistedQueryNotFound(Exception):
+    """A hash-only APQ request for a query this gateway has not analyzed; the client must send the full query."""
+
+
+class GraphQLAnalysis(NamedTuple):
+    depth: int
+    field_count: int
+    cost: int
+
+
+class _Variable(NamedTuple):
+    name: str
+
+
+class _Field(NamedTuple):
+    multiplier: Any  # int, or _Variable resolved against the request variables
+    selections: tuple
+
+
+class _Spread(NamedTuple):
+    fragment: str
+
+
+def _tokenize(text: str) -> List[Tuple[str, str]]:
+    tokens = []
+    pos, end = 0, len(text)
+    while pos < end:
+        match = _TOKEN_RE.match(text, pos)
+        if match is None:
+            raise GraphQLSyntaxError(f"Unexpected character {text[pos]!r} at position {pos}")
+        kind = match.lastgroup
+        if kind != "ignored":
+            tokens.append((kind, match.group()))
+        pos = match.end()
+    tokens.append(("eof", ""))
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive-descent parser for executable GraphQL documents. It keeps only what
+    the analysis needs: the selection tree of each operation, fragment definitions,
+    and the value of pagination arguments.
+    """
+
+    def __init__(self, text: str):
+        self.tokens = _tokenize(text)
+        self.index = 0
+        self.nesting = 0
+        self.variable_defaults: Dict[str, Any] = {}
+
+    def _peek(self, value: Optional[str] = None, kind: Optional[str] = None) -> bool:
+        token_kind, token_value = self.tokens[self.index]
+        return (kind is None or token_kind == kind) and (value is None or token_value == value)
+
+    def _next(self) -> Tuple[str, str]:
+        token = self.tokens[self.index]
+        if token[0] != "eof":
+            self.index += 1
+        return token
+
+    def _expect(self, value: Optional[str] = None, kind: Optional[str] = None) -> str:
+        token_kind, token_value = self._next()
+        if (kind and token_kind != kind) or (value and token_value != value):
+            raise GraphQLSyntaxError(f"Expected {value or kind}, found {token_value or token_kind!r}")
+        return token_value
+
+    def parse_document(self) -> Tuple[List[tuple], Dict[str, tuple]]:
+        operations, fragments = [], {}
+        while not self._peek(kind="eof"):
+            if self._peek("{"):
+                operations.append(self._selection_set())
+            elif self._peek("fragment"):
+                self._next()
+                name = self._expect(kind="name")
+                self._expect("on")
+                self._expect(kind="name")
+                self._directives()
+                fragments[name] = self._selection_set()
+            elif self._peek(kind="name") and self.tokens[self.index][1] in ("query", "mutation", "subscription"):
+                self._next()
+                if self._peek(kind="name"):
+                    self._next()
+                if self._peek("("):
+                    self._variable_definitions()
+                self._directives()
+                operations.append(self._selection_set())
+            else:
+                raise GraphQLSyntaxError(f"Unexpected token {self.tokens[self.index][1]!r}")
+        if not operations:
+            raise GraphQLSyntaxError("Document contains no operation")
+        return operations, fragments
+
+    def _variable_definitions(self):
+        self._expect("(")
+        while not self._peek(")"):
+            self._expect("$")
+            name = self._expect(kind="name")
+            self._expect(":")
+            self._type_reference()
+            if self._peek("="):
+                self._next()
+                self.variable_defaults[name] = self._value()
+            self._directives()
+        self._expect(")")
+
+    def _type_reference(self):
+        if self._peek("["):
+            self._next()
+            self._type_reference()
+            self._expect("]")
+        else:
+            self._expect(kind="name")
+        if self._peek("!"):
+            self._next()
+
+    def _directives(self):
+        while self._peek("@"):
+            self._next()
+            self._expect(kind="name")
+            if self._peek("("):
+                self._arguments()
+
+    def _arguments(self) -> Dict[str, Any]:
+        arguments = {}
+        self._expect("(")
+        while not self._peek(")"):
+            name = self._expect(kind="name")
+            self._expect(":")
+            arguments[name] = self._value()
+        self._expect(")")
+        return arguments
+
+    def _value(self) -> Any:
+        kind, value = self._next()
+        if kind == "punct" and value == "$":
+            return _Variable(self._expect(kind="name"))
+        if kind == "number":
+            return int(value) if value.lstrip("-").isdigit() else float(value)
+        if kind in ("string", "block_string", "name"):
+            return value
+        if kind == "punct" and value == "[":
+            self._enter()
+            while not self._peek("]"):
+                self._value()
+            self._next()
+            self.nesting -= 1
+            return None
+        if kind == "punct" and value == "{":
+            self._enter()
+            while not self._peek("}"):
+                self._expect(kind="name")
+                self._expect(":")
+                self._value()
+            self._next()
+            self.nesting -= 1
+            return None
+        raise GraphQLSyntaxError(f"Unexpected value token {value or kind!r}")
+
+    def _enter(self):
+        self.nesting += 1
+        if self.nesting > MAX_NESTING:
+            raise GraphQLSyntaxError(f"Document nesting exceeds {MAX_NESTING} levels")
+
+    def _selection_set(self) -> tuple:
+        self._expect("{")
+        self._enter()
+        selections = []
+        while not self._peek("}"):
+            if self._peek(kind="spread"):
+                self._next()
+                if self._peek(kind="name") and not self._peek("on"):
+                    selections.append(_Spread(self._next()[1]))
+                    self._directives()
+                else:
+                    if self._peek("on"):
+                        self._next()
+                        self._expect(kind="name")
+                    self._directives()
+                    # Inline fragment selections belong to the enclosing field's level.
+                    selections.extend(self._selection_set())
+                continue
+            self._expect(kind="name")
+            if self._peek(":"):
+                self._next()
+                self._expect(kind="name")
+            arguments = self._arguments() if self._peek("(") else {}
+            self._directives()
+            children = self._selection_set() if self._peek("{") else ()
+            multiplier = next((arguments[a] for a in PAGINATION_ARGUMENTS if a in arguments), 1)
+            selections.append(_Field(multiplier, children))
+        self._next()
+        self.nesting -= 1
+        return tuple(selections)
+
+
+def _resolve_multiplier(multiplier: Any, variables: Dict[str, Any]) -> int:
+    if isinstance(multiplier, _Variable):
+        multiplier = variables.get(multiplier.name, 1)
+    if isinstance(multiplier, bool) or not isinstance(multiplier, (int, float)):
+        return 1
+    if isinstance(multiplier, float) and not math.isfinite(multiplier):  # 1e400 parses to inf; NaN has no integer value
+        raise GraphQLSyntaxError(f"Pagination argument {multiplier!r} is not a finite number")
+    return min(max(int(multiplier), 1), MAX_MULTIPLIER)
+
+
+def _analyze_selections(selections: tuple, fragments: Dict[str, tuple], variables: Dict[str, Any],
+                        memo: Dict[str, Tuple[int, int, int]], visiting: frozenset = frozenset()) -> Tuple[int, int, int]:
+    """Returns (depth, field_count, cost) of a selection set with fragments expanded."""
+    depth = field_count = cost = 0
+    for selection in selections:
+        if isinstance(selection, _Spread):
+            name = selection.fragment
+            if name in visiting:
+                raise GraphQLSyntaxError(f"Fragment cycle through '{name}'")
+            if name not in fragments:
+                raise GraphQLSyntaxError(f"Unknown fragment '{name}'")
+            if name not in memo:
+                memo[name] = _analyze_selections(fragments[name], fragments, variables, memo, visiting | {name})
+            d, f, c = memo[name]
+            depth, field_count, cost = max(depth, d), field_count + f, cost + c
+            continue
+        d, f, c = _analyze_selections(selection.selections, fragments, variables, memo, visiting)
+        depth = max(depth, d + 1)
+        field_count += f + 1
+        cost += 1 + _resolve_multiplier(selection.multiplier, variables) * c
+    return depth, field_count, cost
+
+
+def _multiplier_variables(selections: tuple, fragments: Dict[str, tuple], seen: set, names: set) -> set:
+    """Adds to `names` the variables that pagination arguments in `selections` (fragments expanded) take their value from."""
+    for selection in selections:
+        if isinstance(selection, _Spread):
+            if selection.fragment not in seen:
+                seen.add(selection.fragment)
+                _multiplier_variables(fragments.get(selection.fragment, ()), fragments, seen, names)
+        else:
+            if isinstance(selection.multiplier, _Variable):
+                names.add(selection.multiplier.name)
+            _multiplier_variables(selection.selections, fragments, seen, names)
+    return names
+
+
+def _analyze_parsed(operations: List[tuple], fragments: Dict[str, tuple], variables: Dict[str, Any]) -> GraphQLAnalysis:
+    memo = {}
+    results = [_analyze_selections(op, fragments, variables, memo) for op in operations]
+    return GraphQLAnalysis(
+        depth=max(r[0] for r in results),
+        field_count=max(r[1] for r in results),
+        cost=max(r[2] for r in results),
+    )
+
+
+def analyze_document(query: str, variables: Optional[Dict[str, Any]] = None) -> GraphQLAnalysis:
+    """Parses `query` and returns its depth, field count and weighted cost (worst operation)."""
+    parser = _Parser(query)
+    operations, fragments = parser.parse_document()
+    return _analyze_parsed(operations, fragments, {**parser.variable_defaults, **(variables or {})})
+
+
+class _Document(NamedTuple):
+    operations: List[tuple]
+    fragments: Dict[str, tuple]
+    variable_defaults: Dict[str, Any]
+    multiplier_variables: Tuple[str, ...]
+
+
+class GraphQLAnalysisCache:
+    """
+    Bounded LRU of document analyses keyed on the SHA-256 of the query text, which
+    is also the Automatic Persisted Query (APQ) `sha256Hash`, so hash-only APQ
+    requests resolve to the analysis of the query registered earlier. Documents
+    whose pagination arguments come from variables are additionally keyed on
+    the values of those variables only.
+    """
+
+    def __init__(self, maxsize: int = CACHE_SIZE):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._documents: "OrderedDict[str, _Document]" = OrderedDict()
+        self._analyses: "OrderedDict[tuple, GraphQLAnalysis]" = OrderedDict()
+
+    def _remember(self, store: OrderedDict, key, value):
+        store[key] = value
+        if len(store) > self.maxsize:
+            store.popitem(last=False)
+
+    def analyze(self, query: Optional[str], variables: Optional[Dict[str, Any]] = None,
+                persisted_hash: Optional[str] = None) -> Optional[GraphQLAnalysis]:
+        """
+        Returns the analysis for the request, or None if it carries neither a
+        query nor an APQ hash. Raises PersistedQueryNotFound for a hash-only APQ
+        request whose query this gateway has not seen yet (or has evicted).
+        """
+        variables = variables if isinstance(variables, dict) else {}
+        if query is not None:
+            digest = hashlib.sha256(query.encode("utf-8")).hexdigest()
+            if persisted_hash and persisted_hash.lower() != digest:
+                raise GraphQLSyntaxError("Persisted query hash does not match the query text")
+        elif persisted_hash:
+            digest = persisted_hash.lower()
+        else:
+            return None
+
+        document = self._documents.get(digest)
+        if document is None:
+            if query is None:
+                raise PersistedQueryNotFound(f"Persisted query {digest[:16]}... is not known to the gateway")
+            parser = _Parser(query)
+            operations, fragments = parser.parse_document()
+            seen, names = set(), set()
+            for op in operations:
+                _multiplier_variables(op, fragments, seen, names)
+            document = _Document(operations, fragments, parser.variable_defaults, tuple(sorted(names)))
+            self._remember(self._documents, digest, document)
+        else:
+            self._documents.move_to_end(digest)
+
+        key = (digest, tuple((name, repr(variables[name])) for name in document.multiplier_variables if name in variables))
+        analysis = self._analyses.get(key)
+        if analysis is not None:
+            self.hits += 1
+            self._analyses.move_to_end(key)
+            return analysis
+
+        self.misses += 1
+        analysis = _analyze_parsed(document.operations, document.fragments, {**document.variable_defaults, **variables})
+        self._remember(self._analyses, key, analysis)
+        return analysis
+
+
+def extract_graphql_operations(payload: Any) -> List[Tuple[Optional[str], Dict[str, Any], Optional[str]]]:
+    """Returns (query, variables, apq_hash) for each operation of a single or batched GraphQL request body."""
+    operations = []
+    for item in payload if isinstance(payload, list) else [payload]:
+        if not isinstance(item, dict):
+            continue
+        query = item.get("query") if isinstance(item.get("query"), str) else None
+        persisted = (item.get("extensions") or {}).get("persistedQuery") if isinstance(item.get("extensions"), dict) else None
+        apq_hash = persisted.get("sha256Hash") if isinstance(persisted, dict) else None
+        if query is None and not isinstance(apq_hash, str):
+            continue
+        operations.append((query, item.get("variables") or {}, apq_hash if isinstance(apq_hash, str) else None))
+    return operations
@@ -0,0 +1,69 @@
+# aegis_toolkit/heavy_hitters.py
+from typing import Dict, Hashable, List, Tuple
+
+
+class SpaceSaving:
+    """
+    Space-Saving top-k counter (Metwally et al.) holding at most `capacity`
+    keys. When full, a new key replaces the key with the lowest count and
+    inherits that count as its possible overestimate, so any key seen more
+    than N / capacity times is guaranteed to be tracked. Keys are grouped in
+    buckets by count (the "stream summary"), which makes every update O(1).
+    """
+
+    def __init__(self, capacity: int):
+        self.capacity = max(capacity, 1)
+        self.clear()
+
+    def clear(self):
+        self._counts: Dict[Hashable, int] = {}
+        self._errors: Dict[Hashable, int] = {}
+        self._buckets: Dict[int, Dict[Hashable, None]] = {}  # count -> keys with that count (insertion ordered)
+        self._min_count = 0
+        self.total = 0
+
+    def _move(self, key: Hashable, old: int, new: int):
+        bucket = self._buckets[old]
+        del bucket[key]
+        if not bucket:
+            del self._buckets[old]
+            if self._min_count == old:
+                self._min_count = new
+        self._buckets.setdefault(new, {})[key] = None
+        self._counts[key] = new
+
+    def add(self, key: Hashable) -> Tuple[int, bool]:
+        """Counts one occurrence; returns (estimated count, whether the key just became tracked)."""
+        self.total += 1
+        count = self._counts.get(key)
+        if count is not None:
+            self._move(key, count, count + 1)
+            return count + 1, False
+
+        if len(self._counts) < self.capacity:
+            self._counts[key] = 1
+            self._errors[key] = 0
+            self._buckets.setdefault(1, {})[key] = None
+            self._min_count = 1
+            return 1, True
+
+        floor = self._min_count
+        evicted = next(iter(self._buckets[floor]))
+        del self._counts[evicted], self._errors[evicted]
+        self._counts[key] = floor
+        self._errors[key] = floor
+        self._buckets[floor][key] = None
+        del self._buckets[floor][evicted]
+        self._move(key, floor, floor + 1)
+        return floor + 1, True
+
+    def top(self, n: int) -> List[Tuple[Hashable, int, int]]:
+        """The `n` most frequent keys as (key, estimated count, maximum overestimate), highest first."""
+        ranked = sorted(self._counts.items(), key=lambda item: item[1], reverse=True)[:n]
+        return [(key, count, self._errors[key]) for key, count in ranked]
+
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._counts
+
+    def __len__(self) -> int:
+        return len(self._counts)
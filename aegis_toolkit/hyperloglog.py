@@ -0,0 +1,85 @@
+# aegis_toolkit/hyperloglog.py
+import hashlib
+import math
+from typing import Iterable, Optional
+
+_INVERSE_POWERS = [2.0 ** -i for i in range(65)]
+
+
+def _alpha(m: int) -> float:
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
+
+
+def estimate(registers: Iterable[int], m: int) -> float:
+    """HyperLogLog cardinality estimate, with linear counting for small ranges."""
+    total = 0.0
+    zeros = 0
+    for register in registers:
+        total += _INVERSE_POWERS[register]
+        zeros += register == 0
+    raw = _alpha(m) * m * m / total
+    if raw <= 2.5 * m and zeros:
+        return m * math.log(m / zeros)
+    return raw
+
+
+def _position(item: str, precision: int):
+    """Register index and rank (position of the first set bit) for an item."""
+    hashed = int.from_bytes(hashlib.blake2b(item.encode(), digest_size=8).digest(), "big")
+    width = 64 - precision
+    return hashed >> width, width - (hashed & ((1 << width) - 1)).bit_length() + 1
+
+
+class WindowedHyperLogLog:
+    """
+    Distinct-item estimate over a sliding window, kept as `slots` HyperLogLog
+    register blocks of `slot_seconds` each in one bytearray. The window
+    estimate merges the live slots; it is cached and only recomputed when a
+    register changes or a slot rotates out, so a repeated item costs one hash
+    and a byte compare.
+    """
+
+    __slots__ = ("precision", "slot_seconds", "registers", "epochs", "_estimate")
+
+    def __init__(self, slots: int = 4, slot_seconds: int = 15, precision: int = 7):
+        self.precision = precision
+        self.slot_seconds = slot_seconds
+        self.registers = bytearray(slots << precision)
+        self.epochs = [-1] * slots
+        self._estimate: Optional[float] = 0.0
+
+    def _reset_slot(self, index: int, epoch: int):
+        m = 1 << self.precision
+        self.registers[index * m:(index + 1) * m] = bytes(m)
+        self.epochs[index] = epoch
+        self._estimate = None
+
+    def add(self, item: str, second: int) -> float:
+        """Adds an item seen at `second` and returns the distinct estimate for the window."""
+        epoch = second // self.slot_seconds
+        slots = len(self.epochs)
+        index = epoch % slots
+        if self.epochs[index] != epoch:
+            self._reset_slot(index, epoch)
+        oldest = epoch - slots + 1
+        for i, slot_epoch in enumerate(self.epochs):
+            if 0 <= slot_epoch < oldest:
+                self._reset_slot(i, -1)
+
+        m = 1 << self.precision
+        register, rank = _position(item, self.precision)
+        offset = index * m + register
+        if rank > self.registers[offset]:
+            self.registers[offset] = rank
+            self._estimate = None
+        if self._estimate is None:
+            blocks = [self.registers[i * m:(i + 1) * m] for i in range(slots)]
+            merged = bytes(map(max, *blocks)) if slots > 1 else blocks[0]
+            self._estimate = estimate(merged, m)
+        return self._estimate
@@ -0,0 +1,77 @@
+# aegis_toolkit/ip_ranges.py
+import ipaddress
+from bisect import bisect_right
+from typing import Iterable, List, Optional, Tuple, Union
+
+IPNetwork = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def _merge(ranges: List[Tuple[int, int]]) -> Tuple[List[int], List[int]]:
+    """Sorts and coalesces inclusive integer ranges into parallel start/end lists."""
+    starts: List[int] = []
+    ends: List[int] = []
+    for start, end in sorted(ranges):
+        if ends and start <= ends[-1] + 1:
+            if end > ends[-1]:
+                ends[-1] = end
+        else:
+            starts.append(start)
+            ends.append(end)
+    return starts, ends
+
+
+def parse_address(value: str) -> Optional[Union[ipaddress.IPv4Address, ipaddress.IPv6Address]]:
+    """Parses a client address, unwrapping IPv4-mapped IPv6 (::ffff:a.b.c.d) to IPv4."""
+    try:
+        address = ipaddress.ip_address(value)
+    except ValueError:
+        return None
+    if address.version == 6 and address.ipv4_mapped is not None:
+        return address.ipv4_mapped
+    return address
+
+
+class IPRangeSet:
+    """
+    Set of IPv4/IPv6 addresses and CIDR ranges compiled into sorted, merged
+    integer intervals per address family. Membership is one binary search, so
+    lookups cost O(log n) on the number of disjoint ranges whatever the size
+    of the source list, and overlapping entries collapse at build time.
+    """
+
+    def __init__(self, networks: Iterable[IPNetwork] = ()):
+        v4: List[Tuple[int, int]] = []
+        v6: List[Tuple[int, int]] = []
+        for network in networks:
+            bounds = (int(network.network_address), int(network.broadcast_address))
+            (v4 if network.version == 4 else v6).append(bounds)
+        self._v4_starts, self._v4_ends = _merge(v4)
+        self._v6_starts, self._v6_ends = _merge(v6)
+
+    @classmethod
+    def from_strings(cls, entries: Iterable[str]) -> Tuple["IPRangeSet", List[str]]:
+        """Builds a set from addresses/CIDRs; returns it with the entries that failed to parse."""
+        networks, invalid = [], []
+        for entry in entries:
+            try:
+                networks.append(ipaddress.ip_network(entry.strip(), strict=False))
+            except ValueError:
+                invalid.append(entry)
+        return cls(networks), invalid
+
+    def __len__(self) -> int:
+        return len(self._v4_starts) + len(self._v6_starts)
+
+    def contains(self, value: Union[str, ipaddress.IPv4Address, ipaddress.IPv6Address]) -> bool:
+        address = parse_address(value) if isinstance(value, str) else value
+        if address is None:
+            return False
+        if address.version == 4:
+            starts, ends = self._v4_starts, self._v4_ends
+        else:
+            starts, ends = self._v6_starts, self._v6_ends
+        number = int(address)
+        index = bisect_right(starts, number) - 1
+        return index >= 0 and number <= ends[index]
+
+    __contains__ = contains
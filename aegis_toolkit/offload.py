@@ -0,0 +1,189 @@
+# aegis_toolkit/offload.py
+import asyncio
+import logging
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from typing import Dict, List, NamedTuple, Optional
+
+from .context import canonicalize_input
+from .signatures import SignatureEngine, SignatureMatch, ScanBudgetExceeded
+from .waf_rules import SIGNATURE_CATEGORIES
+
+audit_logger = logging.getLogger("audit")
+_WORKER_ENGINE: Optional[SignatureEngine] = None
+
+
+class OffloadedScanResult(NamedTuple):
+    signature: Optional[SignatureMatch]
+    signature_budget_error: Optional[str]
+    rule_hits: List[str]
+    rule_budget_overruns: List[str]
+    queue_wait_seconds: float
+    scan_seconds: float
+
+
+class OffloadCapacityExceeded(Exception):
+    pass
+
+
+class OffloadUnavailable(Exception):
+    """The worker pool broke (a worker died) or is being restarted; the caller should scan inline."""
+
+
+def _init_worker(rule_patterns: Dict[str, str]):
+    """Runs once per worker process: compiles the rule set so scans start warm."""
+    global _WORKER_ENGINE
+    # Patterns were already vetted when the parent compiled them.
+    _WORKER_ENGINE = SignatureEngine(SIGNATURE_CATEGORIES, rule_patterns, redos_policy="off")
+
+
+def _warm_up() -> bool:
+    return _WORKER_ENGINE is not None
+
+
+def _scan_in_worker(body: bytes, rule_names: List[str], budget_seconds: Optional[float], submitted_at: float):
+    # time.monotonic() is system-wide on Linux, so it is comparable with the parent's clock.
+    started_at = time.monotonic()
+    canonical_body = canonicalize_input(body.decode('utf-8', 'ignore'))
+
+    signature, signature_budget_error = None, None
+    try:
+        signature = _WORKER_ENGINE.scan(canonical_body, budget_seconds)
+    except ScanBudgetExceeded as e:
+        signature_budget_error = str(e)
+
+    rule_hits, rule_budget_overruns = [], []
+    for rule_name in rule_names:
+        try:
+            if _WORKER_ENGINE.search_rule(rule_name, canonical_body, budget_seconds):
+                rule_hits.append(rule_name)
+        except ScanBudgetExceeded:
+            rule_budget_overruns.append(rule_name)
+
+    finished_at = time.monotonic()
+    return OffloadedScanResult(
+        signature, signature_budget_error, rule_hits, rule_budget_overruns,
+        queue_wait_seconds=max(started_at - submitted_at, 0.0),
+        scan_seconds=finished_at - started_at,
+    )
+
+
+class OffloadMetrics:
+    """Running totals for offloaded scans, split into time spent queued and time spent scanning."""
+
+    def __init__(self):
+        self.scans = 0
+        self.rejected = 0
+        self.pool_restarts = 0
+        self.in_flight = 0
+        self.bytes_scanned = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.scan_total = 0.0
+        self.scan_max = 0.0
+
+    def record(self, result: OffloadedScanResult, size: int):
+        self.scans += 1
+        self.bytes_scanned += size
+        self.queue_wait_total += result.queue_wait_seconds
+        self.queue_wait_max = max(self.queue_wait_max, result.queue_wait_seconds)
+        self.scan_total += result.scan_seconds
+        self.scan_max = max(self.scan_max, result.scan_seconds)
+
+    def snapshot(self) -> Dict[str, float]:
+        scans = self.scans or 1
+        return {
+            "scans": self.scans,
+            "rejected": self.rejected,
+            "pool_restarts": self.pool_restarts,
+            "in_flight": self.in_flight,
+            "bytes_scanned": self.bytes_scanned,
+            "queue_wait_avg_ms": round(self.queue_wait_total / scans * 1000, 3),
+            "queue_wait_max_ms": round(self.queue_wait_max * 1000, 3),
+            "scan_avg_ms": round(self.scan_total / scans * 1000, 3),
+            "scan_max_ms": round(self.scan_max * 1000, 3),
+        }
+
+
+class ScanOffloader:
+    """
+    Runs canonicalization and signature scanning of large bodies in a process pool
+    so they do not block the event loop. Each worker compiles the rule set once
+    at start-up. At most `max_queue` scans may be queued or running; beyond that
+    submissions are refused with OffloadCapacityExceeded. If a worker dies, the
+    pool is broken for good: scans raise OffloadUnavailable while a new pool is
+    started in the background.
+    """
+
+    def __init__(self, rule_patterns: Dict[str, str], workers: int, max_queue: int,
+                 metrics: Optional[OffloadMetrics] = None, start_method: str = "spawn"):
+        self.rule_patterns = rule_patterns
+        self.workers = workers
+        self.max_queue = max_queue
+        self.metrics = metrics or OffloadMetrics()
+        self._closed = False
+        self._restart: Optional[asyncio.Task] = None
+        # spawn by default: forking a process that already runs an event loop and threads is unsafe.
+        # A pre-fork gateway worker forks its pool before starting its loop.
+        self._executor = self._start_executor(start_method)
+
+    def _start_executor(self, start_method: str = "spawn") -> ProcessPoolExecutor:
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker,
+            initargs=(self.rule_patterns,),
+        )
+        # Block until every worker is up so the first large request does not pay for process start-up.
+        wait([executor.submit(_warm_up) for _ in range(self.workers)])
+        return executor
+
+    async def scan_body(self, body: bytes, rule_names: List[str], budget_seconds: Optional[float]) -> OffloadedScanResult:
+        if self._restart is not None:
+            raise OffloadUnavailable("worker pool is restarting")
+        if self.metrics.in_flight >= self.max_queue:
+            self.metrics.rejected += 1
+            raise OffloadCapacityExceeded(f"{self.metrics.in_flight} scans already queued")
+        executor = self._executor
+        self.metrics.in_flight += 1
+        try:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                executor, _scan_in_worker, body, rule_names, budget_seconds, time.monotonic()
+            )
+        except BrokenProcessPool as e:
+            self._replace_broken(executor)
+            raise OffloadUnavailable(f"worker pool broken: {e}") from e
+        finally:
+            self.metrics.in_flight -= 1
+        self.metrics.record(result, len(body))
+        return result
+
+    def _replace_broken(self, broken: ProcessPoolExecutor):
+        # Every scan that was in the broken pool lands here; only the first starts a replacement.
+        if broken is not self._executor or self._restart is not None or self._closed:
+            return
+        self.metrics.pool_restarts += 1
+        self._restart = asyncio.get_running_loop().create_task(self._restart_executor(broken))
+
+    async def _restart_executor(self, broken: ProcessPoolExecutor):
+        broken.shutdown(wait=False, cancel_futures=True)
+        try:
+            # Off the event loop: starting and warming the workers takes a while.
+            executor = await asyncio.to_thread(self._start_executor)
+        except Exception as e:
+            audit_logger.error(f"AUDIT - WAF_OFFLOAD_RESTART_FAILED: {e}")
+            return  # the next scan hits the broken pool again and retries
+        finally:
+            self._restart = None
+        if self._closed:
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            self._executor = executor
+
+    def shutdown(self, cancel_pending: bool = True):
+        """Stops the pool. With cancel_pending=False, queued scans still finish (used when replacing the pool)."""
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=cancel_pending)
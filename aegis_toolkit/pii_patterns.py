@@ -0,0 +1,133 @@
+# aegis_toolkit/pii_patterns.py
+import re
+import socket
+from functools import lru_cache
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+
+_NON_DIGIT = re.compile(r"\D")
+_LUHN_DOUBLED = {str(n): n * 2 - 9 if n > 4 else n * 2 for n in range(10)}
+
+
+def _digits(text: str) -> str:
+    return _NON_DIGIT.sub("", text)
+
+
+def _luhn_valid(text: str) -> bool:
+    digits = _digits(text)
+    total = sum(map(int, digits[-1::-2])) + sum(map(_LUHN_DOUBLED.__getitem__, digits[-2::-2]))
+    return total % 10 == 0
+
+
+def _ssn_valid(text: str) -> bool:
+    # Same invalidation rules as Presidio's UsSsnRecognizer.
+    digits = _digits(text)
+    if len(set(text)) - len(set(digits)) > 1:  # mixed delimiters
+        return False
+    if len(set(digits)) == 1 or digits in ("123456789", "078051120", "219099999"):
+        return False
+    return digits[:3] not in ("000", "666") and digits[3:5] != "00" and digits[5:] != "0000"
+
+
+def _phone_valid(text: str) -> bool:
+    return 10 <= len(_digits(text)) <= 15
+
+
+def _iban_valid(text: str) -> bool:
+    compact = text.replace(" ", "")
+    rearranged = compact[4:] + compact[:4]
+    return 15 <= len(compact) <= 34 and int("".join(str(int(c, 36)) for c in rearranged)) % 97 == 1
+
+
+def _ip_valid(text: str) -> bool:
+    family = socket.AF_INET6 if ":" in text else socket.AF_INET
+    try:
+        socket.inet_pton(family, text)
+        return True
+    except OSError:
+        return False
+
+
+class PatternRecognizer(NamedTuple):
+    entity: str
+    pattern: "re.Pattern"
+    validator: Optional[Callable[[str], bool]]
+    trigger: str  # regex character class every match contains, used to skip text with no candidates
+    numeric: bool = False  # matches hold only digits and " ().+-", so they are only searched inside _NUMERIC_RUN
+
+
+# Candidate stretches for the numeric recognizers, at least 9 characters long
+# (the shortest SSN). Finding them is one pass over the text however many
+# numeric entities are requested, and the recognizers then only run on them.
+_NUMERIC_RUN = re.compile(r"[\d(+][\d ().+-]{7,}\d")
+_CAPITALIZED_WORD = "[A-Z][a-z]"
+
+PATTERN_RECOGNIZERS: Dict[str, PatternRecognizer] = {r.entity: r for r in (
+    PatternRecognizer("US_SSN", re.compile(r"\b\d{3}([- .]?)\d{2}\1\d{4}\b"), _ssn_valid, r"\d", True),
+    PatternRecognizer("CREDIT_CARD", re.compile(
+        r"\b(?:4\d{3}|5[0-5]\d{2}|6\d{3}|1\d{3}|3\d{3})[- ]?\d{3,4}[- ]?\d{3,4}[- ]?\d{3,5}\b"), _luhn_valid, r"\d", True),
+    PatternRecognizer("PHONE_NUMBER", re.compile(
+        r"(?<![\w+])(?:\+\d{1,3}[ .-]?)?(?:\(\d{2,4}\)|\d{2,4})[ .-]?\d{3,4}[ .-]?\d{3,4}(?!\w)"), _phone_valid, r"\d", True),
+    PatternRecognizer("EMAIL_ADDRESS", re.compile(
+        r"\b[\w.+-]+@[A-Za-z0-9-]+(?:\.[A-Za-z0-9-]+)*\.[A-Za-z]{2,}\b"), None, "@"),
+    PatternRecognizer("IP_ADDRESS", re.compile(
+        r"\b(?:\d{1,3}\.){3}\d{1,3}\b|(?<![\w:])(?:[0-9A-Fa-f]{0,4}:){2,7}[0-9A-Fa-f]{0,4}(?![\w:])"), _ip_valid, r"\d:"),
+    PatternRecognizer("IBAN_CODE", re.compile(
+        r"\b[A-Z]{2}\d{2} ?[A-Z0-9]{4}(?: ?[A-Z0-9]{4}){1,6}(?: ?[A-Z0-9]{1,3})?\b"), _iban_valid, r"\d"),
+)}
+
+# Entities the NER model finds in running text; spaCy only tags them on capitalized words.
+_NER_TRIGGERS = {"PERSON": _CAPITALIZED_WORD, "LOCATION": _CAPITALIZED_WORD,
+                 "NRP": _CAPITALIZED_WORD, "ORGANIZATION": _CAPITALIZED_WORD}
+
+
+def split_entities(entities: Iterable[str]) -> Tuple[List[str], List[str]]:
+    """(entities the pattern tier handles, entities that need the NER model)."""
+    pattern, context = [], []
+    for entity in entities:
+        (pattern if entity in PATTERN_RECOGNIZERS else context).append(entity)
+    return pattern, context
+
+
+@lru_cache(maxsize=64)
+def _candidate_regex(entities: Tuple[str, ...]) -> Optional["re.Pattern"]:
+    triggers = []
+    for entity in entities:
+        recognizer = PATTERN_RECOGNIZERS.get(entity)
+        trigger = recognizer.trigger if recognizer else _NER_TRIGGERS.get(entity)
+        if trigger is None:
+            return None  # no cheap test for this entity; every text is a candidate
+        triggers.append(trigger if trigger.startswith("[") else f"[{trigger}]")
+    return re.compile("|".join(sorted(set(triggers))))
+
+
+def has_candidates(text: str, entities: Tuple[str, ...]) -> bool:
+    """
+    False only when `text` cannot contain any of `entities` (no digit for an
+    SSN, no "@" for an email, no capitalized word for a name), so the
+    detection passes can be skipped outright.
+    """
+    regex = _candidate_regex(entities)
+    return regex is None or regex.search(text) is not None
+
+
+def find_pattern_entities(text: str, entities: Iterable[str]) -> List[Tuple[int, int, str]]:
+    """(start, end, entity) spans of the pattern-backed `entities` that pass their checksum or validity check."""
+    found = []
+    recognizers = [PATTERN_RECOGNIZERS[entity] for entity in entities]
+    numeric = [recognizer for recognizer in recognizers if recognizer.numeric]
+    if numeric:
+        for run in _NUMERIC_RUN.finditer(text):
+            # One character past the run, so a trailing \b still sees what follows it.
+            start, end = run.start(), run.end() + 1
+            for recognizer in numeric:
+                for match in recognizer.pattern.finditer(text, start, end):
+                    if recognizer.validator(match.group()):
+                        found.append((match.start(), match.end(), recognizer.entity))
+    for recognizer in recognizers:
+        if recognizer.numeric:
+            continue
+        for match in recognizer.pattern.finditer(text):
+            if recognizer.validator is None or recognizer.validator(match.group()):
+                found.append((match.start(), match.end(), recognizer.entity))
+    return found
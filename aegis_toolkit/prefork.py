@@ -0,0 +1,206 @@
+# aegis_toolkit/prefork.py
+import gc
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+from typing import Dict, List, Optional
+
+import uvicorn
+
+from .config import Settings
+from .transformer import initialize_pii_redaction, preload_pii_model
+from .waf import initialize_waf_offloader
+
+_STARTUP_FAILURE = 3  # exit code of a worker whose app never started; not worth re-forking
+_STABLE_AFTER_SECONDS = 30.0  # a worker that dies sooner counts towards the re-fork backoff
+PARENT_PID: Optional[int] = None  # set in pre-fork workers, for the memory report
+
+
+def process_memory(pid: int) -> Optional[Dict[str, int]]:
+    """
+    Memory of `pid` in KB from /proc/<pid>/smaps_rollup: RSS, PSS (shared
+    pages split between the processes mapping them) and USS (private pages,
+    what the process alone costs). None where unavailable (not Linux, exited).
+    """
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            lines = f.read().splitlines()[1:]
+    except OSError:
+        return None
+    fields = {}
+    for line in lines:
+        name, _, value = line.partition(":")
+        fields[name] = int(value.split()[0])
+    return {
+        "pid": pid,
+        "rss_kb": fields.get("Rss", 0),
+        "pss_kb": fields.get("Pss", 0),
+        "shared_kb": fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0),
+        "uss_kb": fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0),
+    }
+
+
+def _children(pid: int) -> List[int]:
+    try:
+        with open(f"/proc/{pid}/task/{pid}/children") as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def memory_report(root_pid: int) -> Dict[str, object]:
+    """Memory of `root_pid`, its children (gateway workers) and theirs (worker pools), with totals."""
+    members = [(root_pid, "parent")]
+    for worker in _children(root_pid):
+        members.append((worker, "worker"))
+        members.extend((pool_worker, "worker pool") for pool_worker in _children(worker))
+    processes = []
+    for pid, role in members:
+        usage = process_memory(pid)
+        if usage is not None:
+            processes.append({"role": role, **usage})
+    totals = {f"total_{key}": sum(p[key] for p in processes) for key in ("rss_kb", "pss_kb", "uss_kb")}
+    return {"processes": processes, **totals}
+
+
+def _log_memory_report(root_pid: int):
+    report = memory_report(root_pid)
+    if not report["processes"]:
+        print("WARNING: Memory report unavailable (needs /proc/<pid>/smaps_rollup).")
+        return
+    print("INFO: Pre-fork memory report (KB):")
+    for p in report["processes"]:
+        print(f"INFO:   {p['role']:<12} pid {p['pid']:<8} RSS {p['rss_kb']:>9,}  PSS {p['pss_kb']:>9,}  "
+              f"USS {p['uss_kb']:>9,}  shared {p['shared_kb']:>9,}")
+    print(f"INFO:   total        RSS {report['total_rss_kb']:,} (counting shared pages once per process), "
+          f"PSS {report['total_pss_kb']:,} (actual), USS {report['total_uss_kb']:,}")
+
+
+def _serve_worker(config: "uvicorn.Config", sock, settings: Settings) -> int:
+    # Own process group, shared with this worker's pools, so the parent can clean them all up if it dies.
+    os.setpgid(0, 0)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    gc.enable()
+    # Pools cannot be inherited across the fork; start this worker's own before its event loop exists,
+    # forked too so they share the compiled rules and the model. The lifespan keeps them; rebuilds on
+    # reload spawn, which re-imports only the launcher script.
+    initialize_waf_offloader(settings, start_method="fork")
+    initialize_pii_redaction(settings, start_method="fork")
+    server = uvicorn.Server(config)
+    server.run(sockets=[sock])
+    # The worker leaves with os._exit, which skips joining the pools' manager threads;
+    # let them finish stopping their processes first.
+    for thread in threading.enumerate():
+        if thread is not threading.current_thread() and not thread.daemon:
+            thread.join(timeout=5)
+    return 0 if server.started else _STARTUP_FAILURE
+
+
+def _kill_group(pid: int):
+    try:
+        os.killpg(pid, signal.SIGTERM)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+def serve(app, settings: Settings):
+    """
+    Pre-fork server for the gateway. Loads the read-only state that is
+    expensive to build (the NER model; the compiled WAF and the config
+    snapshot are already built when `app` was created) once in this process,
+    freezes the heap so the garbage collector does not write to those objects
+    in the children, binds the listening socket, and forks `prefork.workers`
+    processes that each run uvicorn on it. The workers share those pages
+    copy-on-write instead of each loading its own copy. A worker that dies is
+    replaced by a new fork after `prefork.restart_delay_seconds`, doubled for
+    each further worker that dies soon after starting (up to
+    `prefork.restart_max_delay_seconds`); SIGTERM or SIGINT stops them all.
+    Run it from a script that builds `app` only under `if __name__ ==
+    "__main__"` (AegisApp/prefork_server.py): spawned pool processes import the
+    main script again.
+    """
+    global PARENT_PID
+    prefork = settings.prefork
+    workers = prefork.workers or os.cpu_count() or 1
+    gc.disable()  # a collection now would dirty pages that are about to be shared
+    started = time.perf_counter()
+    model_loaded = preload_pii_model(settings)
+    config = uvicorn.Config(app, host=prefork.host, port=prefork.port)
+    sock = config.bind_socket()
+    PARENT_PID = os.getpid()
+    gc.freeze()
+    print(f"INFO: Pre-fork parent {PARENT_PID} loaded shared state in {time.perf_counter() - started:.1f}s "
+          f"(NER model {'loaded' if model_loaded else 'not needed or unavailable'}); forking {workers} workers.")
+
+    children: Dict[int, float] = {}
+
+    def fork_worker():
+        pid = os.fork()
+        if pid == 0:
+            code = 1
+            try:
+                code = _serve_worker(config, sock, settings)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                sys.stdout.flush()
+                os._exit(code)
+        children[pid] = time.monotonic()
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *_: stopping.append(True))
+    for _ in range(workers):
+        fork_worker()
+
+    exit_code = 0
+    quick_deaths = 0  # consecutive workers that died within _STABLE_AFTER_SECONDS
+    refork_at: List[float] = []
+    report_at = time.monotonic() + prefork.memory_report_delay_seconds if prefork.memory_report_delay_seconds > 0 else None
+    while not stopping:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid:
+            forked_at = children.pop(pid, None)
+            _kill_group(pid)  # pool processes the worker could not stop itself
+            code = os.waitstatus_to_exitcode(status)
+            if code == _STARTUP_FAILURE:
+                print(f"WARNING: Gateway worker {pid} failed to start; shutting down.")
+                exit_code = code
+                break
+            if forked_at is not None and time.monotonic() - forked_at < _STABLE_AFTER_SECONDS:
+                quick_deaths += 1
+            else:
+                quick_deaths = 0
+            delay = min(prefork.restart_delay_seconds * 2 ** max(quick_deaths - 1, 0), prefork.restart_max_delay_seconds)
+            print(f"WARNING: Gateway worker {pid} exited with {code}; forking a replacement in {delay:.1f}s.")
+            refork_at.append(time.monotonic() + delay)
+            continue
+        now = time.monotonic()
+        for due in [due for due in refork_at if due <= now]:
+            refork_at.remove(due)
+            fork_worker()
+        if report_at is not None and time.monotonic() >= report_at:
+            _log_memory_report(PARENT_PID)
+            report_at = None
+        time.sleep(0.5)
+
+    for pid in children:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in children:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+        _kill_group(pid)
+    sock.close()
+    sys.exit(exit_code)
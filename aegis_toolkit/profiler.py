@@ -1,10 +1,70 @@
-import time
 import math
-import json
 from collections import defaultdict
-from fastapi import Request, HTTPException
+from fastapi import HTTPException
+from . import cache
 from .config import Settings
-from aegis_toolkit.cache import redis_client
+from .context import RequestContext
+
+PATH_HISTORY_SIZE = 20
+PROFILE_TTL_SECONDS = 3600
+
+# Fingerprint check, path history push/trim and entropy in one server-side call.
+# The profile hash keeps the fingerprint, a count per path segment in the history
+# ("f:<segment>"), the history length "n" and "s" = sum of c*ln(c) over those
+# counts, so entropy = (ln(n) - s/n) / ln(2) is updated in O(1) per request.
+# KEYS[1] = profile hash, KEYS[2] = history list
+# ARGV = fingerprint, segment, history size, TTL, enforce fingerprint (1/0)
+# Returns {0} for a new profile, {1} for a fingerprint mismatch, else {2, entropy}.
+_PROFILE_SCRIPT = """
+local fingerprint = redis.call('HGET', KEYS[1], 'fingerprint')
+local ttl = tonumber(ARGV[4])
+if not fingerprint then
+  redis.call('DEL', KEYS[1], KEYS[2])
+  redis.call('HSET', KEYS[1], 'fingerprint', ARGV[1])
+  redis.call('EXPIRE', KEYS[1], ttl)
+  return {0}
+end
+if ARGV[5] == '1' and fingerprint ~= ARGV[1] then
+  return {1}
+end
+
+local function clogc(c)
+  if c <= 1 then return 0 end
+  return c * math.log(c)
+end
+local n = tonumber(redis.call('HGET', KEYS[1], 'n'))
+if not n then
+  redis.call('DEL', KEYS[2])
+  n = 0
+end
+local s = tonumber(redis.call('HGET', KEYS[1], 's') or '0')
+
+local field = 'f:' .. ARGV[2]
+local c = tonumber(redis.call('HGET', KEYS[1], field) or '0')
+s = s - clogc(c) + clogc(c + 1)
+redis.call('HSET', KEYS[1], field, c + 1)
+redis.call('LPUSH', KEYS[2], ARGV[2])
+n = n + 1
+
+if n > tonumber(ARGV[3]) then
+  local evicted = 'f:' .. redis.call('RPOP', KEYS[2])
+  local e = tonumber(redis.call('HGET', KEYS[1], evicted) or '1')
+  s = s - clogc(e) + clogc(e - 1)
+  if e <= 1 then
+    redis.call('HDEL', KEYS[1], evicted)
+  else
+    redis.call('HSET', KEYS[1], evicted, e - 1)
+  end
+  n = n - 1
+end
+
+redis.call('HSET', KEYS[1], 'n', n, 's', string.format('%.17g', s))
+redis.call('EXPIRE', KEYS[1], ttl)
+redis.call('EXPIRE', KEYS[2], ttl)
+local entropy = (math.log(n) - s / n) / math.log(2)
+if entropy < 0 then entropy = 0 end
+return {2, tostring(entropy)}
+"""
 
 def _shannon_entropy(data: list) -> float:
     """Calculates the randomness (entropy) of a sequence of path requests."""
@@ -23,54 +83,58 @@ def _shannon_entropy(data: list) -> float:
         
     return entropy
 
-async def profile_and_analyze(client_id: str, request: Request, settings: Settings):
+_script = None
+_script_client = None
+_warned_no_redis = False
+
+def _get_script(redis_client):
+    global _script, _script_client
+    if _script_client is not redis_client:
+        _script = redis_client.register_script(_PROFILE_SCRIPT)
+        _script_client = redis_client
+    return _script
+
+def path_segment(path: str) -> str:
+    path_parts = path.split('/')
+    return path_parts[1] if len(path_parts) > 1 else 'root'
+
+async def profile_and_analyze(client_id: str, ctx: RequestContext, settings: Settings):
     """
     Builds a client profile in Redis and analyzes behavior in real-time.
     Checks for:
     1. Client Fingerprint Consistency: Detects if headers like User-Agent change.
     2. Path Traversal Entropy: Detects random, non-sequential URL scanning.
+    Both checks run in a single Redis script call, and only with
+    `behavioral_analysis.enforce`.
     """
+    global _warned_no_redis
+    if not settings.behavioral_analysis.enforce:
+        return
+    redis_client = cache.redis_client
     if not redis_client:
-        print("WARNING: Redis not available, skipping client profiling.")
+        if not _warned_no_redis:
+            print("WARNING: Redis not available, skipping client profiling.")
+            _warned_no_redis = True
         return
 
-    profile_key = f"profile:{client_id}"
-    path_history_key = f"profile:paths:{client_id}"
-    
     current_fingerprint = (
-        request.headers.get("user-agent", "") + 
-        request.headers.get("accept-language", "")
+        ctx.headers.get("user-agent", "") +
+        ctx.headers.get("accept-language", "")
     )
-    
-    existing_fingerprint_bytes = await redis_client.hget(profile_key, "fingerprint")
-    existing_fingerprint = existing_fingerprint_bytes.decode('utf-8') if existing_fingerprint_bytes else None
-
-    if not existing_fingerprint:
-        pipe = redis_client.pipeline()
-        pipe.hset(profile_key, "fingerprint", current_fingerprint)
-        pipe.expire(profile_key, 3600)
-        await pipe.execute()
-        return
-    
-    if settings.behavioral_analysis.enforce_header_consistency:
-        if existing_fingerprint != current_fingerprint:
-            raise HTTPException(
-                status_code=403, 
-                detail="Forbidden: Client fingerprint has changed. Please re-authenticate."
-            )
+    enforce = settings.behavioral_analysis.enforce_header_consistency
 
-    path_segment = request.url.path.split('/')[1] if len(request.url.path.split('/')) > 1 else 'root'
-    pipe = redis_client.pipeline()
-    pipe.lpush(path_history_key, path_segment)
-    pipe.ltrim(path_history_key, 0, 19)
-    pipe.expire(path_history_key, 3600)
-    await pipe.execute()
-
-    path_history = await redis_client.lrange(path_history_key, 0, -1)
-    
-    entropy = _shannon_entropy(path_history)
-    if entropy > settings.behavioral_analysis.max_path_entropy:
+    verdict = await _get_script(redis_client)(
+        keys=[f"profile:{client_id}", f"profile:paths:{client_id}"],
+        args=[current_fingerprint, path_segment(ctx.path), PATH_HISTORY_SIZE, PROFILE_TTL_SECONDS, int(enforce)],
+    )
+    status = int(verdict[0])
+    if status == 1:
+        raise HTTPException(
+            status_code=403,
+            detail="Forbidden: Client fingerprint has changed. Please re-authenticate."
+        )
+    if status == 2 and float(verdict[1]) > settings.behavioral_analysis.max_path_entropy:
         raise HTTPException(
-            status_code=403, 
+            status_code=403,
             detail="Forbidden: Suspicious browsing pattern detected (high entropy)."
-        )
\ No newline at end of file
+        )
@@ -0,0 +1,198 @@
+# aegis_toolkit/rate_limiter.py
+import math
+import re
+import time
+from typing import Dict, NamedTuple, Optional, Tuple
+
+from fastapi import Request
+from jose import jwt, JWTError
+
+from . import cache
+from . import security
+from .config import Settings, RateLimitingConfig
+
+_RATE_PATTERN = re.compile(r"^\s*(\d+)\s*(?:/|per)\s*(\d+)?\s*(second|minute|hour|day)s?\s*$", re.IGNORECASE)
+_PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+_LOCAL_SWEEP_SIZE = 50_000
+
+# Generic cell rate algorithm: one key per limited entity holding its "theoretical
+# arrival time" (TAT). Uses the Redis server clock so every gateway worker agrees.
+# Returns {allowed, remaining, reset_ms, retry_after_ms}.
+_GCRA_SCRIPT = """
+local emission = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + tonumber(t[2]) / 1000
+local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+if tat < now then tat = now end
+local period = emission * limit
+local new_tat = tat + emission
+local allow_at = new_tat - period
+if allow_at > now then
+  return {0, 0, math.ceil(tat - now), math.ceil(allow_at - now)}
+end
+redis.call('SET', KEYS[1], new_tat, 'PX', math.ceil(new_tat - now) + 1)
+return {1, math.floor((now + period - new_tat) / emission), math.ceil(new_tat - now), 0}
+"""
+
+
+class Quota(NamedTuple):
+    limit: int
+    period: float  # seconds
+
+    @property
+    def policy(self) -> str:
+        return f"{self.limit};w={int(self.period)}"
+
+
+def parse_rate(rate: str) -> Quota:
+    """Parses "100/minute", "10 per second" or "1000/1 hour" into a Quota."""
+    match = _RATE_PATTERN.match(rate or "")
+    if not match:
+        raise ValueError(f"Invalid rate limit '{rate}'. Expected e.g. '100/minute'.")
+    count, multiplier, unit = match.groups()
+    return Quota(int(count), _PERIODS[unit.lower()] * int(multiplier or 1))
+
+
+class RateLimitDecision(NamedTuple):
+    allowed: bool
+    quota: Quota
+    remaining: int
+    reset_seconds: float
+    retry_after_seconds: float
+
+    def headers(self) -> Dict[str, str]:
+        """IETF RateLimit header fields (draft-ietf-httpapi-ratelimit-headers)."""
+        headers = {
+            "RateLimit-Limit": str(self.quota.limit),
+            "RateLimit-Remaining": str(max(self.remaining, 0)),
+            "RateLimit-Reset": str(math.ceil(self.reset_seconds)),
+            "RateLimit-Policy": self.quota.policy,
+        }
+        if not self.allowed:
+            headers["Retry-After"] = str(max(math.ceil(self.retry_after_seconds), 1))
+        return headers
+
+
+class TokenBucket:
+    """In-process token buckets, used when Redis is not configured or unreachable."""
+
+    def __init__(self):
+        self._buckets: Dict[str, Tuple[float, float]] = {}  # key -> (tokens, updated_at)
+
+    def take(self, key: str, quota: Quota) -> RateLimitDecision:
+        now = time.monotonic()
+        rate = quota.limit / quota.period
+        tokens, updated_at = self._buckets.get(key, (float(quota.limit), now))
+        tokens = min(float(quota.limit), tokens + (now - updated_at) * rate)
+        allowed = tokens >= 1.0
+        if allowed:
+            tokens -= 1.0
+        if len(self._buckets) >= _LOCAL_SWEEP_SIZE and key not in self._buckets:
+            self._sweep(now)
+        self._buckets[key] = (tokens, now)
+        reset = (quota.limit - tokens) / rate
+        retry_after = 0.0 if allowed else (1.0 - tokens) / rate
+        return RateLimitDecision(allowed, quota, int(tokens), reset, retry_after)
+
+    def _sweep(self, now: float):
+        # Idle buckets are full again; dropping them is indistinguishable from keeping them.
+        self._buckets = {k: v for k, v in self._buckets.items() if now - v[1] < 3600}
+
+
+class RateLimiter:
+    """
+    Per-client (optionally per-user) rate limiting. Quotas come from config:
+    a per-client override, else a per-role quota, else the global `rate_limit`.
+    With Redis each decision is one EVALSHA of a GCRA script; without it (or
+    when Redis errors) an in-process token bucket takes over. After an error,
+    Redis is left alone for `degraded_backoff_seconds` instead of every request
+    waiting on it to fail again.
+    """
+
+    def __init__(self, settings: Settings):
+        self.config: RateLimitingConfig = settings.rate_limiting
+        self.default_quota = parse_rate(settings.snapshot.rate_limit or "100/minute")
+        self.role_quotas = {role: parse_rate(rate) for role, rate in self.config.roles.items()}
+        self.client_quotas = {client: parse_rate(rate) for client, rate in self.config.clients.items()}
+        self.jwt_secret_key = settings.jwt_secret_key
+        self.local = TokenBucket()
+        self._script = None
+        self._script_client = None
+        self.redis_failures = 0
+        self.degraded_until = 0.0
+
+    def quota_for(self, client_id: Optional[str], role: Optional[str]) -> Quota:
+        if client_id in self.client_quotas:
+            return self.client_quotas[client_id]
+        return self.role_quotas.get(role, self.default_quota)
+
+    async def check(self, key: str, quota: Quota) -> RateLimitDecision:
+        redis_client = cache.redis_client
+        if redis_client is not None and time.monotonic() >= self.degraded_until:
+            try:
+                if self._script_client is not redis_client:
+                    self._script = redis_client.register_script(_GCRA_SCRIPT)
+                    self._script_client = redis_client
+                emission_ms = quota.period * 1000 / quota.limit
+                allowed, remaining, reset_ms, retry_ms = await self._script(
+                    keys=[f"aegis:ratelimit:{quota.policy}:{key}"], args=[emission_ms, quota.limit]
+                )
+                return RateLimitDecision(bool(allowed), quota, int(remaining), int(reset_ms) / 1000, int(retry_ms) / 1000)
+            except Exception as e:
+                self.redis_failures += 1
+                self.degraded_until = time.monotonic() + self.config.degraded_backoff_seconds
+                if self.redis_failures == 1 or self.redis_failures % 100 == 0:
+                    print(f"WARNING: Redis rate limiting failed ({e}); using in-process buckets "
+                          f"for {self.config.degraded_backoff_seconds:g}s.")
+        return self.local.take(key, quota)
+
+    def _user_id(self, request: Request) -> Optional[str]:
+        authorization = request.headers.get("authorization", "")
+        if not authorization.lower().startswith("bearer "):
+            return None
+        token = authorization[7:].strip()
+        payload = security.TOKEN_CACHE.get(token)
+        if payload is None:
+            try:
+                payload = jwt.decode(token, self.jwt_secret_key, algorithms=["HS256"])
+            except JWTError:
+                return None
+        user_id = payload.get("user_id")
+        return str(user_id) if user_id is not None else None
+
+    async def check_request(self, request: Request) -> Optional[RateLimitDecision]:
+        """
+        Resolves the caller (API client, else remote IP) and its quota and takes
+        one unit. Returns None for exempt paths.
+        """
+        path = request.url.path
+        if any(path.startswith(prefix) for prefix in self.config.exempt_path_prefixes):
+            return None
+
+        api_key = request.headers.get("x-api-key")
+        registered = security.CLIENT_REGISTRY.lookup(api_key) if api_key and security.CLIENT_REGISTRY else None
+        if registered is not None:
+            client = registered.client
+            key = f"client:{client.client_id}"
+            quota = self.quota_for(client.client_id, client.role)
+        else:
+            key = f"ip:{request.client.host if request.client else 'unknown'}"
+            quota = self.default_quota
+
+        if self.config.key_by_user:
+            user_id = self._user_id(request)
+            if user_id is not None:
+                key = f"{key}:user:{user_id}"
+        return await self.check(key, quota)
+
+
+RATE_LIMITER: Optional[RateLimiter] = None
+
+def initialize_rate_limiter(settings: Settings):
+    """Builds the limiter from config; re-run on config reload so quota changes apply."""
+    global RATE_LIMITER
+    RATE_LIMITER = RateLimiter(settings)
+    print(f"Rate limiter initialized: default {RATE_LIMITER.default_quota.limit} per "
+          f"{int(RATE_LIMITER.default_quota.period)}s, {len(RATE_LIMITER.role_quotas)} role and "
+          f"{len(RATE_LIMITER.client_quotas)} client quotas.")
@@ -0,0 +1,136 @@
+# aegis_toolkit/regex_safety.py
+import re
+import string
+from typing import FrozenSet, List, NamedTuple, Optional, Tuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+_REPEATS = (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT)
+_CATEGORY_CHARS = {
+    sre_parse.CATEGORY_DIGIT: frozenset(string.digits),
+    sre_parse.CATEGORY_SPACE: frozenset(string.whitespace),
+    sre_parse.CATEGORY_WORD: frozenset(string.ascii_letters + string.digits + "_"),
+}
+
+
+class RegexFinding(NamedTuple):
+    severity: str  # "error" (catastrophic backtracking) or "warning"
+    message: str
+
+
+def _class_chars(members) -> Optional[FrozenSet[str]]:
+    """Approximate character set of an IN node; None means 'effectively any character'."""
+    chars = set()
+    for op, av in members:
+        if op is sre_parse.LITERAL:
+            chars.add(chr(av))
+        elif op is sre_parse.RANGE and av[1] - av[0] <= 512:
+            chars.update(chr(c) for c in range(av[0], av[1] + 1))
+        elif op is sre_parse.CATEGORY and av in _CATEGORY_CHARS:
+            chars |= _CATEGORY_CHARS[av]
+        else:
+            return None
+    return frozenset(chars)
+
+
+def _first_chars(items) -> Tuple[Optional[FrozenSet[str]], bool]:
+    """Returns (possible first characters or None for 'any', nullable) for a parsed sequence."""
+    first: Optional[set] = set()
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            chars, nullable = frozenset(chr(av)), False
+        elif op is sre_parse.IN:
+            chars, nullable = _class_chars(av), False
+        elif op is sre_parse.SUBPATTERN:
+            chars, nullable = _first_chars(av[3])
+        elif op in _REPEATS:
+            chars, nullable = _first_chars(av[2])
+            nullable = nullable or av[0] == 0
+        elif op is sre_parse.BRANCH:
+            chars, nullable = frozenset(), False
+            for branch in av[1]:
+                branch_chars, branch_nullable = _first_chars(branch)
+                chars = None if chars is None or branch_chars is None else chars | branch_chars
+                nullable = nullable or branch_nullable
+        elif op in (sre_parse.AT, sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            continue
+        else:
+            chars, nullable = None, False
+        first = None if first is None or chars is None else first | chars
+        if not nullable:
+            return (None if first is None else frozenset(first)), False
+    return (None if first is None else frozenset(first)), True
+
+
+def _overlaps(a: Optional[FrozenSet[str]], b: Optional[FrozenSet[str]]) -> bool:
+    if a is None or b is None:
+        return True
+    return bool(a & b)
+
+
+def _union(a: Optional[FrozenSet[str]], b: Optional[FrozenSet[str]]) -> Optional[FrozenSet[str]]:
+    return None if a is None or b is None else a | b
+
+
+def _walk(items, outer: Optional[str], follow: Optional[FrozenSet[str]], findings: List[RegexFinding]):
+    """
+    `outer` is None outside any repeat, else "bounded"/"unbounded" for the enclosing
+    repeat; `follow` approximates the characters that may come right after `items`.
+    A variable quantifier nested in a repeat is only ambiguous when what it consumes
+    overlaps what can follow it, so '(?:[a-z]+,)*' passes while '(a+)+' does not.
+    """
+    for index, (op, av) in enumerate(items):
+        rest_first, rest_nullable = _first_chars(items[index + 1:])
+        after = _union(rest_first, follow) if rest_nullable else rest_first
+        if op in _REPEATS:
+            low, high, sub = av
+            variable = low != high
+            unbounded = high == sre_parse.MAXREPEAT
+            sub_first, _ = _first_chars(sub)
+            if outer and variable and (outer == "unbounded" or unbounded) and _overlaps(sub_first, after):
+                findings.append(RegexFinding(
+                    "error", "nested quantifier inside a repeat (e.g. '(a+)+') can backtrack exponentially"))
+            if high > 1:
+                inner = "unbounded" if outer == "unbounded" or (unbounded and variable) else "bounded"
+                _walk(sub, inner, _union(sub_first, after), findings)
+            else:
+                _walk(sub, outer, after, findings)
+        elif op is sre_parse.SUBPATTERN:
+            _walk(av[3], outer, after, findings)
+        elif op is sre_parse.BRANCH:
+            if outer:
+                firsts = []
+                for branch in av[1]:
+                    branch_first, branch_nullable = _first_chars(branch)
+                    firsts.append(_union(branch_first, after) if branch_nullable else branch_first)
+                if any(_overlaps(firsts[i], firsts[j]) for i in range(len(firsts)) for j in range(i + 1, len(firsts))):
+                    findings.append(RegexFinding(
+                        "error", "alternatives that can match the same text inside a repeat (e.g. '(a|aa)*')"))
+            for branch in av[1]:
+                _walk(branch, outer, after, findings)
+        elif op in (sre_parse.ASSERT, sre_parse.ASSERT_NOT):
+            _walk(av[1], outer, None, findings)
+
+
+def analyze_pattern(pattern: str) -> List[RegexFinding]:
+    """
+    Statically inspects a regex for constructs that make the backtracking `re`
+    engine super-linear on adversarial input: nested variable quantifiers and
+    ambiguous alternation under an unbounded repeat are errors; a leading
+    unanchored `.*` is a warning since it rescans the input from every offset.
+    """
+    try:
+        parsed = list(sre_parse.parse(pattern))
+    except re.error as e:
+        return [RegexFinding("error", f"invalid pattern: {e}")]
+
+    findings: List[RegexFinding] = []
+    _walk(parsed, None, frozenset(), findings)
+    if parsed and parsed[0][0] in _REPEATS and parsed[0][1][1] == sre_parse.MAXREPEAT:
+        sub_first, _ = _first_chars(parsed[0][1][2])
+        if sub_first is None:
+            findings.append(RegexFinding("warning", "leading unbounded wildcard makes each search quadratic"))
+    return list(dict.fromkeys(findings))
@@ -0,0 +1,178 @@
+# aegis_toolkit/revocation.py
+import asyncio
+import hashlib
+import logging
+import math
+import time
+from typing import Any, Dict, Optional
+
+from . import cache
+from .config import Settings, TokenRevocationConfig
+
+audit_logger = logging.getLogger("audit")
+
+_REVOKED_KEY_PREFIX = "aegis:revoked:jti:"
+_REVOCATION_LOG_KEY = "aegis:revoked:log"
+# Each incremental sync re-reads this much of the log so writers with slightly skewed clocks are not missed.
+_SYNC_OVERLAP_MS = 5000
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter using double hashing over one BLAKE2b digest."""
+
+    def __init__(self, capacity: int, error_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, item: str):
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, item: str) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(item))
+
+
+REVOCATION_CONFIG = TokenRevocationConfig()
+REVOCATION_FILTER: Optional[BloomFilter] = None
+REVOCATION_METRICS = {"checks": 0, "filter_positives": 0, "confirmed": 0, "false_positives": 0, "redis_errors": 0}
+# Authoritative store when no Redis is configured (single-process deployments): jti -> expires_at.
+_LOCAL_REVOKED: Dict[str, float] = {}
+_last_synced_ms = 0
+_last_rebuild = 0.0
+
+
+def _new_filter() -> BloomFilter:
+    return BloomFilter(REVOCATION_CONFIG.expected_revocations, REVOCATION_CONFIG.false_positive_rate)
+
+def _get_filter() -> BloomFilter:
+    global REVOCATION_FILTER
+    if REVOCATION_FILTER is None:
+        REVOCATION_FILTER = _new_filter()
+    return REVOCATION_FILTER
+
+def initialize_revocation(settings: Settings):
+    """Applies the token_revocation config; the filter is rebuilt on the next sync."""
+    global REVOCATION_CONFIG, _last_rebuild
+    REVOCATION_CONFIG = settings.token_revocation
+    _last_rebuild = 0.0
+    _get_filter()
+
+async def revoke_token(jti: str, expires_at: Optional[float] = None) -> bool:
+    """
+    Records a revoked token ID until the token's own expiry. Returns False if
+    the token has already expired, since there is nothing left to revoke.
+    """
+    now = time.time()
+    ttl = int(math.ceil(expires_at - now)) if expires_at else REVOCATION_CONFIG.max_token_lifetime_seconds
+    if ttl <= 0:
+        return False
+
+    redis_client = cache.redis_client
+    if redis_client is not None:
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.set(f"{_REVOKED_KEY_PREFIX}{jti}", 1, ex=ttl)
+        pipe.zadd(_REVOCATION_LOG_KEY, {jti: int(now * 1000)})
+        await pipe.execute()
+    else:
+        _LOCAL_REVOKED[jti] = now + ttl
+    _get_filter().add(jti)
+    audit_logger.warning(f"AUDIT - TOKEN_REVOKED: jti '{jti}' revoked for {ttl}s")
+    return True
+
+async def is_token_revoked(payload: Dict[str, Any]) -> bool:
+    """
+    In-memory Bloom filter test first; only a filter positive is confirmed
+    against the authoritative store. Tokens without a `jti` cannot be revoked.
+    """
+    if not REVOCATION_CONFIG.enabled:
+        return False
+    jti = payload.get("jti")
+    if not jti:
+        return False
+    REVOCATION_METRICS["checks"] += 1
+    if jti not in _get_filter():
+        return False
+
+    REVOCATION_METRICS["filter_positives"] += 1
+    redis_client = cache.redis_client
+    if redis_client is None:
+        expires_at = _LOCAL_REVOKED.get(jti)
+        revoked = expires_at is not None and expires_at > time.time()
+    else:
+        try:
+            revoked = bool(await redis_client.exists(f"{_REVOKED_KEY_PREFIX}{jti}"))
+        except Exception as e:
+            REVOCATION_METRICS["redis_errors"] += 1
+            audit_logger.error(f"AUDIT - TOKEN_REVOCATION_CHECK_FAILED: jti '{jti}': {e}")
+            return REVOCATION_CONFIG.fail_closed
+
+    REVOCATION_METRICS["confirmed" if revoked else "false_positives"] += 1
+    return revoked
+
+async def sync_revocations() -> int:
+    """
+    Pulls revocations recorded since the last sync (by any worker) into the
+    local filter. Periodically rebuilds the filter from scratch, after trimming
+    entries older than the longest token lifetime, so it does not fill up with
+    long-expired IDs. Returns the number of IDs read.
+    """
+    global REVOCATION_FILTER, _last_synced_ms, _last_rebuild
+    now = time.time()
+    now_ms = int(now * 1000)
+    rebuild = now - _last_rebuild >= REVOCATION_CONFIG.full_rebuild_seconds
+    target = _new_filter() if rebuild else _get_filter()
+
+    redis_client = cache.redis_client
+    if redis_client is not None:
+        if rebuild:
+            horizon_ms = now_ms - REVOCATION_CONFIG.max_token_lifetime_seconds * 1000
+            await redis_client.zremrangebyscore(_REVOCATION_LOG_KEY, "-inf", horizon_ms)
+            since_ms = horizon_ms
+        else:
+            since_ms = _last_synced_ms - _SYNC_OVERLAP_MS
+        revoked_ids = await redis_client.zrangebyscore(_REVOCATION_LOG_KEY, since_ms, "+inf")
+    elif rebuild:
+        for jti in [jti for jti, expires_at in _LOCAL_REVOKED.items() if expires_at <= now]:
+            del _LOCAL_REVOKED[jti]
+        revoked_ids = list(_LOCAL_REVOKED)
+    else:
+        revoked_ids = []
+
+    for jti in revoked_ids:
+        target.add(jti)
+    if rebuild:
+        REVOCATION_FILTER = target
+        _last_rebuild = now
+    _last_synced_ms = now_ms
+    return len(revoked_ids)
+
+async def run_revocation_sync():
+    """Background task keeping this worker's filter in step with the shared revocation log."""
+    while True:
+        try:
+            await sync_revocations()
+        except Exception as e:
+            REVOCATION_METRICS["redis_errors"] += 1
+            print(f"WARNING: Token revocation sync failed: {e}")
+        await asyncio.sleep(REVOCATION_CONFIG.refresh_interval_seconds)
+
+def revocation_status() -> Dict[str, Any]:
+    bloom = _get_filter()
+    return {
+        **REVOCATION_METRICS,
+        "filter_entries": bloom.count,
+        "filter_bits": bloom.size,
+        "filter_hashes": bloom.hash_count,
+        "last_synced_ms": _last_synced_ms,
+    }
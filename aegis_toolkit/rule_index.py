@@ -0,0 +1,89 @@
+# aegis_toolkit/rule_index.py
+import re
+from fnmatch import translate
+from typing import Dict, Iterable, List, NamedTuple, Optional, Pattern
+
+_GLOB_CHARS = "*?["
+
+
+class _IndexedRule(NamedTuple):
+    order: int
+    rule: object
+    matcher: Pattern
+
+
+class _TrieNode:
+    __slots__ = ("children", "by_method")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        self.by_method: Dict[str, List[_IndexedRule]] = {}
+
+
+def _add(buckets: Dict[str, List[_IndexedRule]], methods: Iterable[str], entry: _IndexedRule):
+    for method in methods:
+        buckets.setdefault(method, []).append(entry)
+
+
+def _collect(buckets: Dict[str, List[_IndexedRule]], method: str, out: List[_IndexedRule]):
+    out.extend(buckets.get(method, ()))
+    if method != "*":
+        out.extend(buckets.get("*", ()))
+
+
+class RuleIndex:
+    """
+    Dispatch index over WAF rules keyed by `path_pattern` and `methods`.
+
+    Patterns without glob characters live in an exact-path dict. Globbed patterns
+    are filed in a trie under the complete path segments of their literal prefix
+    ("/api/v1/users/*" under "" -> "api" -> "v1" -> "users"), so a lookup walks the
+    request path once and only visits rules that could apply. Patterns that start
+    with a glob sit at the root and form the small residual list checked for every
+    path. Candidates are confirmed with the rule's precompiled fnmatch regex and
+    returned in config order.
+    """
+
+    def __init__(self, rules: Iterable):
+        self._exact: Dict[str, Dict[str, List[_IndexedRule]]] = {}
+        self._root = _TrieNode()
+        self.size = 0
+
+        for order, rule in enumerate(rules):
+            methods = {m.upper() for m in rule.methods} or {"*"}
+            if "*" in methods:
+                methods = {"*"}
+            entry = _IndexedRule(order, rule, re.compile(translate(rule.path_pattern)))
+            self.size += 1
+
+            pattern = rule.path_pattern
+            glob_at = min((i for i in (pattern.find(c) for c in _GLOB_CHARS) if i >= 0), default=-1)
+            if glob_at < 0:
+                _add(self._exact.setdefault(pattern, {}), methods, entry)
+                continue
+
+            node = self._root
+            for segment in pattern[:glob_at].split("/")[:-1]:
+                node = node.children.setdefault(segment, _TrieNode())
+            _add(node.by_method, methods, entry)
+
+    def match(self, path: str, method: str) -> List:
+        """Returns the rules whose path pattern and methods apply to `method path`, in config order."""
+        candidates: List[_IndexedRule] = []
+        exact = self._exact.get(path)
+        if exact:
+            candidates.extend(exact.get(method, ()))
+            candidates.extend(exact.get("*", ()))
+
+        node: Optional[_TrieNode] = self._root
+        _collect(node.by_method, method, candidates)
+        for segment in path.split("/"):
+            node = node.children.get(segment)
+            if node is None:
+                break
+            _collect(node.by_method, method, candidates)
+
+        matched = [c for c in candidates if c.matcher.match(path)]
+        if len(matched) > 1:
+            matched.sort(key=lambda c: c.order)
+        return [c.rule for c in matched]
@@ -4,33 +4,54 @@ from fastapi import HTTPException, status, Depends, Request
 from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
 from jose import jwt, JWTError
 from .config import Settings, ApiClient
+from .client_registry import ClientRegistry
+from .revocation import is_token_revoked
+from .token_cache import VerifiedTokenCache
+
+# Shared by every get_current_user dependency, so a token verified once is reused across routers.
+TOKEN_CACHE = VerifiedTokenCache(maxsize=10_000)
+CLIENT_REGISTRY = None
+
+def initialize_client_registry(settings: Settings):
+    """Builds the shared client registry from the current config; re-run on config reload."""
+    global CLIENT_REGISTRY
+    CLIENT_REGISTRY = ClientRegistry(settings.api_clients)
+    print(f"Client registry loaded with {len(CLIENT_REGISTRY)} API clients.")
+
+def _get_client_registry(settings: Settings) -> ClientRegistry:
+    if CLIENT_REGISTRY is None:
+        initialize_client_registry(settings)
+        settings.add_reload_listener(initialize_client_registry)
+    return CLIENT_REGISTRY
 
 def get_api_client_factory(settings: Settings):
     """Factory that returns the get_api_client dependency function."""
     api_key_header_scheme = APIKeyHeader(name="x-api-key", auto_error=False)
-    API_CLIENTS_BY_KEY = {client.api_key: client for client in settings.api_clients}
+    _get_client_registry(settings)
 
     async def get_api_client(request: Request, api_key: str = Depends(api_key_header_scheme)) -> ApiClient:
-        if not api_key or api_key not in API_CLIENTS_BY_KEY:
+        registered = CLIENT_REGISTRY.lookup(api_key) if api_key else None
+        if registered is None:
             raise HTTPException(
                 status_code=status.HTTP_401_UNAUTHORIZED,
                 detail="Invalid or missing API Key"
             )
-            
-        client = API_CLIENTS_BY_KEY[api_key]
         
-        if client.allowed_ips:
-            if request.client.host not in client.allowed_ips:
-                raise HTTPException(
-                    status_code=status.HTTP_403_FORBIDDEN,
-                    detail="Forbidden: This IP address is not allowed to use this API key."
-                )
-        return client
+        if not registered.ip_allowed(request.client.host if request.client else ""):
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Forbidden: This IP address is not allowed to use this API key."
+            )
+        return registered.client
         
     return get_api_client
 
-def get_current_user_factory(settings: Settings):
-    """Factory that returns the get_current_user dependency function."""
+def get_current_user_factory(settings: Settings, use_cache: bool = True):
+    """
+    Factory that returns the get_current_user dependency function.
+    Verified payloads are cached in TOKEN_CACHE until the token's `exp`; the
+    revocation check runs on every request, cached or not.
+    """
     oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login", auto_error=False)
     
     async def get_current_user(token: str | None = Depends(oauth2_scheme)) -> dict:
@@ -41,9 +62,15 @@ def get_current_user_factory(settings: Settings):
             detail="Could not validate credentials",
             headers={"WWW-Authenticate": "Bearer"},
         )
-        try:
-            payload = jwt.decode(token, settings.jwt_secret_key, algorithms=["HS256"])
-            return payload
-        except JWTError:
+        payload = TOKEN_CACHE.get(token) if use_cache else None
+        if payload is None:
+            try:
+                payload = jwt.decode(token, settings.jwt_secret_key, algorithms=["HS256"])
+            except JWTError:
+                raise credentials_exception
+            if use_cache:
+                TOKEN_CACHE.put(token, payload)
+        if await is_token_revoked(payload):
             raise credentials_exception
+        return payload
     return get_current_user
\ No newline at end of file
@@ -0,0 +1,246 @@
+# aegis_toolkit/signatures.py
+import re
+from time import perf_counter
+from typing import Dict, Iterable, List, NamedTuple, Optional, Pattern, Tuple
+
+try:
+    from re import _parser as sre_parse
+except ImportError:  # Python < 3.11
+    import sre_parse
+
+from .regex_safety import analyze_pattern
+from .waf_rules import SIGNATURE_CATEGORIES
+
+
+class SignatureMatch(NamedTuple):
+    name: str
+    category: str
+    pattern: str
+
+
+class ScanBudgetExceeded(Exception):
+    """Raised when a scan runs past its time budget; `signature` is the one that was running."""
+
+    def __init__(self, signature: str, elapsed_ms: float):
+        super().__init__(f"Signature '{signature}' exceeded the scan budget ({elapsed_ms:.2f} ms)")
+        self.signature = signature
+        self.elapsed_ms = elapsed_ms
+
+
+class SignatureStats:
+    __slots__ = ("calls", "regex_runs", "hits", "total_seconds", "max_seconds")
+
+    def __init__(self):
+        self.calls = 0
+        self.regex_runs = 0
+        self.hits = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def as_dict(self) -> Dict[str, float]:
+        return {
+            "calls": self.calls,
+            "regex_runs": self.regex_runs,
+            "hits": self.hits,
+            "total_ms": round(self.total_seconds * 1000, 3),
+            "avg_us": round(self.total_seconds / self.calls * 1e6, 2) if self.calls else 0.0,
+            "max_ms": round(self.max_seconds * 1000, 3),
+        }
+
+
+class _CompiledSignature(NamedTuple):
+    match: SignatureMatch
+    regex: Pattern
+    anchors: Optional[Tuple[str, ...]]
+
+
+def _literal_candidates(items) -> List[Tuple[str, ...]]:
+    """
+    Collects literal strings that any match of the parsed sequence `items` must contain.
+    Each candidate is a tuple of alternatives: at least one of them has to be present.
+    """
+    candidates = []
+    run = ""
+    for op, av in items:
+        if op is sre_parse.LITERAL:
+            run += chr(av)
+            continue
+        if run:
+            candidates.append((run,))
+            run = ""
+        if op is sre_parse.SUBPATTERN:
+            _, add_flags, del_flags, sub = av
+            if not add_flags and not del_flags:
+                candidates.extend(_literal_candidates(sub))
+        elif op in (sre_parse.MAX_REPEAT, sre_parse.MIN_REPEAT):
+            low, _, sub = av
+            if low >= 1:
+                candidates.extend(_literal_candidates(sub))
+        elif op is sre_parse.BRANCH:
+            alternatives = []
+            for branch in av[1]:
+                best = _best_candidate(_literal_candidates(branch))
+                if best is None:
+                    break
+                alternatives.extend(best)
+            else:
+                candidates.append(tuple(alternatives))
+        elif op is sre_parse.IN and all(member_op is sre_parse.LITERAL for member_op, _ in av):
+            candidates.append(tuple(chr(member) for _, member in av))
+    if run:
+        candidates.append((run,))
+    return candidates
+
+
+def _best_candidate(candidates: List[Tuple[str, ...]]) -> Optional[Tuple[str, ...]]:
+    if not candidates:
+        return None
+    return max(candidates, key=lambda alts: (min(len(a) for a in alts), -len(alts)))
+
+
+def required_literals(pattern: str) -> Optional[Tuple[str, ...]]:
+    """
+    Returns literals of which at least one must appear in any text `pattern` matches,
+    or None when no such prefilter can be derived (e.g. case-insensitive patterns).
+    """
+    try:
+        parsed = sre_parse.parse(pattern)
+    except re.error:
+        return None
+    if parsed.state.flags & (re.IGNORECASE | re.VERBOSE):
+        return None
+    return _best_candidate(_literal_candidates(list(parsed)))
+
+
+def _compile(match: SignatureMatch) -> _CompiledSignature:
+    return _CompiledSignature(match, re.compile(match.pattern), required_literals(match.pattern))
+
+
+def _search(signature: _CompiledSignature, text: str) -> bool:
+    if signature.anchors is not None:
+        for anchor in signature.anchors:
+            if anchor in text:
+                break
+        else:
+            return False
+    return signature.regex.search(text) is not None
+
+
+def _check_regex_safety(name: str, pattern: str, policy: str):
+    if policy == "off":
+        return
+    for finding in analyze_pattern(pattern):
+        message = f"Pattern '{pattern}' of '{name}': {finding.message}"
+        if finding.severity == "error" and policy == "reject":
+            raise ValueError(f"Rejected backtracking-prone WAF pattern. {message}")
+        print(f"WARNING: WAF regex safety: {message}")
+
+
+class SignatureEngine:
+    """
+    Compiled form of the WAF signature set.
+
+    CPython's `re` has no multi-pattern automaton: a single alternation of every
+    signature defeats the per-pattern literal-prefix optimizations and is several
+    times slower than the loop it would replace. Instead each signature is compiled
+    once together with the literals any match must contain; a scan checks those
+    anchors with C-speed substring tests and only runs the regexes whose anchors
+    are present. Per-rule `pattern` strings from config get the same treatment
+    instead of being recompiled on every request.
+    """
+
+    def __init__(self, signatures: Dict[str, List[str]], rule_patterns: Optional[Dict[str, str]] = None,
+                 redos_policy: str = "reject", profile: bool = False):
+        self._signatures: List[_CompiledSignature] = []
+        for category, patterns in signatures.items():
+            for index, pattern in enumerate(patterns):
+                name = f"{category}_{index}"
+                _check_regex_safety(name, pattern, "warn" if redos_policy != "off" else "off")
+                self._signatures.append(_compile(SignatureMatch(name, category, pattern)))
+        self.signatures: Dict[str, SignatureMatch] = {s.match.name: s.match for s in self._signatures}
+
+        self.rule_patterns: Dict[str, _CompiledSignature] = {}
+        for rule_name, pattern in (rule_patterns or {}).items():
+            try:
+                self.rule_patterns[rule_name] = _compile(SignatureMatch(rule_name, "rule", pattern))
+            except re.error as e:
+                raise ValueError(f"WAF rule '{rule_name}' has an invalid pattern '{pattern}': {e}") from e
+            _check_regex_safety(rule_name, pattern, redos_policy)
+
+        self.profile = profile
+        self.stats: Dict[str, SignatureStats] = {}
+
+    @classmethod
+    def from_rules(cls, waf_rules: Iterable, redos_policy: str = "reject", profile: bool = False) -> "SignatureEngine":
+        """Builds an engine from the built-in signatures plus any `pattern` rules in config."""
+        rule_patterns = {rule.name: rule.pattern for rule in waf_rules if rule.pattern}
+        return cls(SIGNATURE_CATEGORIES, rule_patterns, redos_policy=redos_policy, profile=profile)
+
+    def scan(self, text: str, budget_seconds: Optional[float] = None) -> Optional[SignatureMatch]:
+        """
+        Returns the first signature found in `text`, or None if it is clean.
+        With a budget, raises ScanBudgetExceeded once the elapsed time passes it;
+        `re` cannot be interrupted, so the check happens between signatures.
+        """
+        if not text:
+            return None
+        if self.profile:
+            return self._scan_profiled(text, budget_seconds)
+        started = perf_counter() if budget_seconds is not None else 0.0
+        for match, regex, anchors in self._signatures:
+            if anchors is not None:
+                for anchor in anchors:
+                    if anchor in text:
+                        break
+                else:
+                    continue
+            if regex.search(text):
+                return match
+            if budget_seconds is not None and perf_counter() - started > budget_seconds:
+                raise ScanBudgetExceeded(match.name, (perf_counter() - started) * 1000)
+        return None
+
+    def _scan_profiled(self, text: str, budget_seconds: Optional[float]) -> Optional[SignatureMatch]:
+        started = perf_counter()
+        for signature in self._signatures:
+            found = self._timed_search(signature, text)
+            if found:
+                return signature.match
+            if budget_seconds is not None and perf_counter() - started > budget_seconds:
+                raise ScanBudgetExceeded(signature.match.name, (perf_counter() - started) * 1000)
+        return None
+
+    def _timed_search(self, signature: _CompiledSignature, text: str) -> bool:
+        stats = self.stats.get(signature.match.name)
+        if stats is None:
+            stats = self.stats[signature.match.name] = SignatureStats()
+        before = perf_counter()
+        anchored = signature.anchors is None or any(anchor in text for anchor in signature.anchors)
+        found = anchored and signature.regex.search(text) is not None
+        elapsed = perf_counter() - before
+        stats.calls += 1
+        stats.regex_runs += anchored
+        stats.hits += found
+        stats.total_seconds += elapsed
+        stats.max_seconds = max(stats.max_seconds, elapsed)
+        return found
+
+    def search_rule(self, rule_name: str, text: str, budget_seconds: Optional[float] = None) -> bool:
+        """Runs the precompiled pattern of a config rule against `text`, raising ScanBudgetExceeded if it overruns."""
+        signature = self.rule_patterns.get(rule_name)
+        if not signature or not text:
+            return False
+        before = perf_counter()
+        found = self._timed_search(signature, text) if self.profile else _search(signature, text)
+        if budget_seconds is not None and not found and perf_counter() - before > budget_seconds:
+            raise ScanBudgetExceeded(rule_name, (perf_counter() - before) * 1000)
+        return found
+
+    def profile_report(self) -> List[Dict[str, object]]:
+        """Per-signature timing and hit counts, most expensive first."""
+        patterns = {**{name: s.match for name, s in self.rule_patterns.items()}, **self.signatures}
+        report = [
+            {"signature": name, "category": patterns[name].category, "pattern": patterns[name].pattern, **stats.as_dict()}
+            for name, stats in self.stats.items()
+        ]
+        return sorted(report, key=lambda row: row["total_ms"], reverse=True)
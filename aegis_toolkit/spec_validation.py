@@ -0,0 +1,236 @@
+# aegis_toolkit/spec_validation.py
+import hashlib
+import json
+from datetime import date, datetime
+from typing import Annotated, Any, Dict, List, Literal, Optional, Tuple, Union
+from uuid import UUID
+
+from pydantic import ConfigDict, EmailStr, Field, TypeAdapter, create_model
+
+from .endpoint_router import EndpointRouter
+
+_JSON_METHODS = {"get", "put", "post", "delete", "options", "head", "patch", "trace"}
+_STRING_FORMATS = {"email": EmailStr, "uuid": UUID, "date-time": datetime, "date": date}
+
+
+class SpecSchemaError(ValueError):
+    pass
+
+
+class BodyValidator:
+    """A compiled `requestBody` validator for one operation of the spec."""
+
+    __slots__ = ("operation", "adapter", "required")
+
+    def __init__(self, operation: str, adapter: TypeAdapter, required: bool):
+        self.operation = operation
+        self.adapter = adapter
+        self.required = required
+
+    def validate(self, body: bytes):
+        """Validates raw JSON bytes in a single pass; raises pydantic.ValidationError."""
+        return self.adapter.validate_json(body)
+
+
+class _SchemaCompiler:
+    """
+    Translates the JSON Schema subset used by OpenAPI request bodies into Python
+    types pydantic can validate: objects become generated models, `$ref`s resolve
+    against `components/schemas` (recursive references fall back to Any), and
+    scalar constraints become Field constraints. Primitives are strict, so "1" is
+    not accepted where the spec says integer.
+    """
+
+    def __init__(self, components: Dict[str, Any]):
+        self.components = components
+        self.built: Dict[str, Any] = {}
+
+    def compile(self, schema: Any, name: str, resolving: Tuple[str, ...] = ()) -> Any:
+        if not isinstance(schema, dict):
+            return Any
+        if "$ref" in schema:
+            return self._ref(schema["$ref"], resolving)
+
+        nullable = schema.get("nullable", False)
+        schema_type = schema.get("type")
+        if isinstance(schema_type, list):
+            nullable = nullable or "null" in schema_type
+            types = [t for t in schema_type if t != "null"]
+            schema_type = types[0] if len(types) == 1 else None
+
+        if "enum" in schema:
+            compiled = Literal[tuple(schema["enum"])]
+        elif "allOf" in schema:
+            compiled = self._all_of(schema["allOf"], name, resolving)
+        elif "oneOf" in schema or "anyOf" in schema:
+            options = [self.compile(s, f"{name}Option{i}", resolving) for i, s in enumerate(schema.get("oneOf") or schema["anyOf"])]
+            compiled = Union[tuple(options)] if len(options) > 1 else options[0]
+        elif schema_type == "object" or "properties" in schema:
+            compiled = self._object(schema, name, resolving)
+        elif schema_type == "array":
+            item = self.compile(schema.get("items", {}), f"{name}Item", resolving)
+            compiled = Annotated[List[item], Field(min_length=schema.get("minItems"), max_length=schema.get("maxItems"))]
+        elif schema_type == "string":
+            compiled = self._string(schema)
+        elif schema_type in ("integer", "number"):
+            compiled = self._number(schema, int if schema_type == "integer" else float)
+        elif schema_type == "boolean":
+            compiled = Annotated[bool, Field(strict=True)]
+        else:
+            compiled = Any
+        return Optional[compiled] if nullable else compiled
+
+    def _ref(self, ref: str, resolving: Tuple[str, ...]) -> Any:
+        if not ref.startswith("#/components/schemas/"):
+            raise SpecSchemaError(f"unsupported $ref '{ref}'")
+        ref_name = ref.rsplit("/", 1)[-1]
+        if ref_name in self.built:
+            return self.built[ref_name]
+        if ref_name in resolving:
+            return Any
+        if ref_name not in self.components:
+            raise SpecSchemaError(f"unresolved $ref '{ref}'")
+        compiled = self.compile(self.components[ref_name], ref_name, resolving + (ref_name,))
+        self.built[ref_name] = compiled
+        return compiled
+
+    def _resolve(self, schema: Dict[str, Any], resolving: Tuple[str, ...]) -> Dict[str, Any]:
+        while isinstance(schema, dict) and "$ref" in schema:
+            ref_name = schema["$ref"].rsplit("/", 1)[-1]
+            if ref_name in resolving or ref_name not in self.components:
+                return {}
+            schema, resolving = self.components[ref_name], resolving + (ref_name,)
+        return schema if isinstance(schema, dict) else {}
+
+    def _all_of(self, parts: List[Any], name: str, resolving: Tuple[str, ...]) -> Any:
+        merged: Dict[str, Any] = {"type": "object", "properties": {}, "required": []}
+        for part in parts:
+            part = self._resolve(part, resolving)
+            if part.get("type", "object") != "object":
+                return Any
+            merged["properties"].update(part.get("properties", {}))
+            merged["required"].extend(part.get("required", []))
+            if part.get("additionalProperties") is False:
+                merged["additionalProperties"] = False
+        return self._object(merged, name, resolving)
+
+    def _object(self, schema: Dict[str, Any], name: str, resolving: Tuple[str, ...]) -> Any:
+        properties = schema.get("properties") or {}
+        additional = schema.get("additionalProperties", True)
+        if not properties:
+            if isinstance(additional, dict):
+                return Dict[str, self.compile(additional, f"{name}Value", resolving)]
+            return Dict[str, Any]
+
+        required = set(schema.get("required", []))
+        fields = {}
+        for index, (prop, prop_schema) in enumerate(properties.items()):
+            field_type = self.compile(prop_schema, f"{name}_{prop}", resolving)
+            if prop in required:
+                fields[f"field_{index}"] = (field_type, Field(..., alias=prop))
+            else:
+                default = prop_schema.get("default") if isinstance(prop_schema, dict) else None
+                fields[f"field_{index}"] = (Optional[field_type], Field(default, alias=prop))
+
+        config = ConfigDict(extra="forbid" if additional is False else "ignore")
+        safe_name = "".join(c if c.isalnum() else "_" for c in name) or "Body"
+        return create_model(safe_name, __config__=config, **fields)
+
+    @staticmethod
+    def _string(schema: Dict[str, Any]) -> Any:
+        fmt = _STRING_FORMATS.get(schema.get("format"))
+        if fmt is not None:
+            return fmt
+        return Annotated[str, Field(
+            strict=True,
+            min_length=schema.get("minLength"),
+            max_length=schema.get("maxLength"),
+            pattern=schema.get("pattern"),
+        )]
+
+    @staticmethod
+    def _number(schema: Dict[str, Any], base: type) -> Any:
+        constraints = {"ge": schema.get("minimum"), "le": schema.get("maximum"), "multiple_of": schema.get("multipleOf")}
+        # OpenAPI 3.0 uses boolean exclusive flags, 3.1 uses the bound itself.
+        for key, bound, strict_key in (("exclusiveMinimum", "ge", "gt"), ("exclusiveMaximum", "le", "lt")):
+            value = schema.get(key)
+            if value is True:
+                constraints[strict_key], constraints[bound] = constraints[bound], None
+            elif isinstance(value, (int, float)) and not isinstance(value, bool):
+                constraints[strict_key] = value
+        return Annotated[base, Field(strict=True, **constraints)]
+
+
+def _json_media_schema(request_body: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    for media_type, media in (request_body.get("content") or {}).items():
+        if media_type.split(";")[0].strip() == "application/json" or media_type.endswith("+json"):
+            return (media or {}).get("schema")
+    return None
+
+
+class SpecValidatorRegistry:
+    """
+    Request-body validators compiled from an OpenAPI document, keyed by
+    "METHOD /path/{template}", plus an EndpointRouter over every operation of
+    the spec that maps concrete request paths to those templates. Compiled
+    adapters are also cached by a hash of
+    the operation schema plus the component schemas, so re-uploading an
+    unchanged spec reuses them instead of rebuilding every model.
+    """
+
+    def __init__(self):
+        self.validators: Dict[str, BodyValidator] = {}
+        self.router = EndpointRouter()
+        self._adapter_cache: Dict[str, TypeAdapter] = {}
+
+    def load(self, spec: Dict[str, Any]) -> List[str]:
+        """Compiles validators for every JSON requestBody in `spec`; returns per-operation errors."""
+        components = (spec.get("components") or {}).get("schemas") or {}
+        components_digest = hashlib.sha256(json.dumps(components, sort_keys=True, default=str).encode()).hexdigest()
+        compiler = _SchemaCompiler(components)
+        validators: Dict[str, BodyValidator] = {}
+        router = EndpointRouter()
+        adapter_cache: Dict[str, TypeAdapter] = {}
+        errors = []
+
+        for path, operations in (spec.get("paths") or {}).items():
+            for method, operation in (operations or {}).items():
+                if method.lower() not in _JSON_METHODS or not isinstance(operation, dict):
+                    continue
+                # Every operation is a routing target, so a literal route without a body is not
+                # mistaken for a neighbouring `{param}` route that has one.
+                router.add(method, path)
+                request_body = operation.get("requestBody")
+                if isinstance(request_body, dict) and "$ref" in request_body:
+                    ref_name = request_body["$ref"].rsplit("/", 1)[-1]
+                    request_body = ((spec.get("components") or {}).get("requestBodies") or {}).get(ref_name)
+                if not isinstance(request_body, dict):
+                    continue
+                schema = _json_media_schema(request_body)
+                if schema is None:
+                    continue
+
+                key = f"{method.upper()} {path}"
+                digest = hashlib.sha256(
+                    (json.dumps(schema, sort_keys=True, default=str) + components_digest).encode()
+                ).hexdigest()
+                try:
+                    adapter = self._adapter_cache.get(digest) or adapter_cache.get(digest)
+                    if adapter is None:
+                        name = operation.get("operationId") or f"{method}_{path}"
+                        adapter = TypeAdapter(compiler.compile(schema, f"{name}Body"))
+                    adapter_cache[digest] = adapter
+                except Exception as e:
+                    errors.append(f"{key}: {e}")
+                    continue
+
+                validators[key] = BodyValidator(key, adapter, bool(request_body.get("required", False)))
+
+        # Tables are replaced only once the whole spec compiled, so lookups never see a partial registry.
+        self.validators, self.router, self._adapter_cache = validators, router, adapter_cache
+        return errors
+
+    def lookup(self, method: str, path: str) -> Optional[BodyValidator]:
+        """Finds the validator for a concrete request path, preferring literal segments over `{params}`."""
+        endpoint = self.router.match(method, path)
+        return self.validators.get(endpoint.signature) if endpoint is not None else None
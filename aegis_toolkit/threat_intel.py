@@ -1,31 +1,192 @@
 # core/threat_intel.py
+import asyncio
 import httpx
 import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
 from fastapi import Request, HTTPException
-from .config import Settings
+from . import cache
+from .blocklist import is_blocklisted
+from .config import Settings, IPReputationConfig
 
 audit_logger = logging.getLogger("audit")
-ABUSEIPDB_KEY = Settings.abuseipdb_api_key
 
-async def check_ip_reputation(request: Request, settings: Settings):
-    """Checks the client's IP against the AbuseIPDB blacklist."""
-    ABUSEIPDB_KEY = settings.abuseipdb_api_key
-    if not ABUSEIPDB_KEY:
-        return
+_REDIS_KEY_PREFIX = "aegis:iprep:"
+_UNKNOWN = -1  # stored score for a failed lookup, cached for `error_ttl_seconds`
+
+
+class ReputationCache:
+    """
+    Abuse confidence scores per IP, in least-recently-used order. Each entry
+    carries its own expiry, so clean, malicious and failed lookups can be kept
+    for different lengths of time.
+    """
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[str, Tuple[int, float]]" = OrderedDict()  # ip -> (score, expires_at)
+
+    def get(self, ip: str) -> Optional[int]:
+        entry = self._entries.get(ip)
+        if entry is None:
+            return None
+        if entry[1] <= time.monotonic():
+            del self._entries[ip]
+            return None
+        self._entries.move_to_end(ip)
+        return entry[0]
+
+    def put(self, ip: str, score: int, ttl: float):
+        self._entries[ip] = (score, time.monotonic() + ttl)
+        self._entries.move_to_end(ip)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class IPReputationService:
+    """
+    AbuseIPDB lookups behind a per-worker cache (and a shared Redis cache when
+    configured). Concurrent requests from an IP that is not cached share one
+    in-flight lookup, and all lookups go through one pooled HTTP client.
+    TTLs, the API key and the threshold are read from `settings` on every
+    call, so config reloads apply without rebuilding the service.
+    """
+
+    def __init__(self, settings: Settings):
+        self.settings = settings
+        config = settings.ip_reputation
+        self.cache = ReputationCache(config.max_cached_ips)
+        self.client = httpx.AsyncClient(
+            timeout=config.timeout_seconds,
+            limits=httpx.Limits(max_connections=config.max_connections,
+                                max_keepalive_connections=config.max_connections),
+        )
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self.metrics = {"cache_hits": 0, "shared_cache_hits": 0, "coalesced": 0, "lookups": 0,
+                        "lookup_errors": 0, "allowed_pending": 0}
+
+    @property
+    def config(self) -> IPReputationConfig:
+        return self.settings.ip_reputation
+
+    def _ttl_for(self, score: int) -> float:
+        if score == _UNKNOWN:
+            return self.config.error_ttl_seconds
+        if score >= self.settings.abuseipdb_confidence_minimum:
+            return self.config.malicious_ttl_seconds
+        return self.config.clean_ttl_seconds
+
+    async def score(self, ip: str, wait: bool = True) -> Optional[int]:
+        """
+        Abuse confidence score for `ip`, or None if it is unknown (lookup failed,
+        or `wait` is False and no cached verdict exists yet; a lookup is then
+        started in the background).
+        """
+        cached = self.cache.get(ip)
+        if cached is not None:
+            self.metrics["cache_hits"] += 1
+            return None if cached == _UNKNOWN else cached
+
+        task = self._inflight.get(ip)
+        if task is None:
+            task = asyncio.create_task(self._lookup(ip))
+            self._inflight[ip] = task
+            task.add_done_callback(lambda _, ip=ip: self._inflight.pop(ip, None))
+        else:
+            self.metrics["coalesced"] += 1
+        if not wait:
+            self.metrics["allowed_pending"] += 1
+            return None
+        # Shielded so a cancelled request does not cancel the lookup other requests are waiting on.
+        score = await asyncio.shield(task)
+        return None if score == _UNKNOWN else score
 
-    client_ip = request.client.host
-    
-    headers = {'Key': ABUSEIPDB_KEY, 'Accept': 'application/json'}
-    params = {'ipAddress': client_ip, 'maxAgeInDays': '90'}
-    
-    async with httpx.AsyncClient() as client:
+    async def _lookup(self, ip: str) -> int:
+        redis_client = cache.redis_client
+        if redis_client is not None:
+            try:
+                shared = await redis_client.get(f"{_REDIS_KEY_PREFIX}{ip}")
+            except Exception as e:
+                shared = None
+                audit_logger.error(f"Could not read cached IP reputation: {e}")
+            if shared is not None:
+                self.metrics["shared_cache_hits"] += 1
+                score = int(shared)
+                self.cache.put(ip, score, self._ttl_for(score))
+                return score
+
+        score = await self._query_abuseipdb(ip)
+        ttl = self._ttl_for(score)
+        self.cache.put(ip, score, ttl)
+        if redis_client is not None and score != _UNKNOWN:
+            try:
+                await redis_client.set(f"{_REDIS_KEY_PREFIX}{ip}", score, ex=int(ttl))
+            except Exception as e:
+                audit_logger.error(f"Could not cache IP reputation: {e}")
+        return score
+
+    async def _query_abuseipdb(self, ip: str) -> int:
+        self.metrics["lookups"] += 1
+        headers = {'Key': self.settings.abuseipdb_api_key, 'Accept': 'application/json'}
+        params = {'ipAddress': ip, 'maxAgeInDays': '90'}
         try:
-            response = await client.get("https://api.abuseipdb.com/api/v2/check", headers=headers, params=params)
+            response = await self.client.get(self.config.api_url, headers=headers, params=params)
             if response.status_code == 200:
                 data = response.json().get('data', {})
-                confidence_score = data.get('abuseConfidenceScore', 0)
-                if confidence_score >= settings.abuseipdb_confidence_minimum:
-                    audit_logger.critical(f"AUDIT - IP_BLACKLISTED: IP '{client_ip}' blocked due to abuse score of {confidence_score}.")
-                    raise HTTPException(status_code=403, detail="Forbidden: Your IP address is listed as malicious.")
+                return int(data.get('abuseConfidenceScore', 0))
+            audit_logger.error(f"Could not check IP reputation: AbuseIPDB returned {response.status_code}")
         except Exception as e:
-            audit_logger.error(f"Could not check IP reputation: {e}")
\ No newline at end of file
+            audit_logger.error(f"Could not check IP reputation: {e}")
+        self.metrics["lookup_errors"] += 1
+        return _UNKNOWN
+
+    async def aclose(self):
+        for task in list(self._inflight.values()):
+            task.cancel()
+        await self.client.aclose()
+
+    def status(self) -> Dict[str, int]:
+        return {**self.metrics, "cached_ips": len(self.cache), "lookups_in_flight": len(self._inflight)}
+
+
+REPUTATION_SERVICE: Optional[IPReputationService] = None
+
+def _get_reputation_service(settings: Settings) -> IPReputationService:
+    global REPUTATION_SERVICE
+    if REPUTATION_SERVICE is None:
+        REPUTATION_SERVICE = IPReputationService(settings)
+    return REPUTATION_SERVICE
+
+async def shutdown_threat_intel():
+    """Closes the pooled AbuseIPDB client."""
+    global REPUTATION_SERVICE
+    if REPUTATION_SERVICE is not None:
+        await REPUTATION_SERVICE.aclose()
+        REPUTATION_SERVICE = None
+
+async def check_ip_reputation(request: Request, settings: Settings):
+    """
+    Checks the client's IP against the offline blocklist, then the AbuseIPDB
+    blacklist. With `ip_reputation.background_lookup`, an IP without a cached
+    verdict is allowed while its lookup runs; later requests see the verdict.
+    """
+    client_ip = request.client.host if request.client else ""
+    if not client_ip:
+        return
+
+    if is_blocklisted(client_ip):
+        audit_logger.critical(f"AUDIT - IP_BLOCKLISTED: IP '{client_ip}' blocked by the offline blocklist.")
+        raise HTTPException(status_code=403, detail="Forbidden: Your IP address is listed as malicious.")
+
+    if not settings.abuseipdb_api_key:
+        return
+
+    service = _get_reputation_service(settings)
+    confidence_score = await service.score(client_ip, wait=not settings.ip_reputation.background_lookup)
+    if confidence_score is not None and confidence_score >= settings.abuseipdb_confidence_minimum:
+        audit_logger.critical(f"AUDIT - IP_BLACKLISTED: IP '{client_ip}' blocked due to abuse score of {confidence_score}.")
+        raise HTTPException(status_code=403, detail="Forbidden: Your IP address is listed as malicious.")
@@ -0,0 +1,89 @@
+# aegis_toolkit/token_cache.py
+import hashlib
+import heapq
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+
+class VerifiedTokenCache:
+    """
+    Bounded LRU of already-verified JWT payloads, keyed by the SHA-256 of the
+    raw token so the cache never holds bearer credentials. A cached payload is
+    only served before its `exp`; a min-heap of expiry times lets inserts drop
+    expired entries eagerly instead of waiting for them to age out of the LRU.
+    """
+
+    def __init__(self, maxsize: int = 10_000):
+        self.maxsize = maxsize
+        self._entries: "OrderedDict[bytes, Tuple[Dict[str, Any], float]]" = OrderedDict()
+        self._expiries: List[Tuple[float, bytes]] = []
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evicted = 0
+
+    @staticmethod
+    def _key(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[Dict[str, Any]]:
+        key = self._key(token)
+        entry = self._entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        payload, expires_at = entry
+        if expires_at <= time.time():
+            del self._entries[key]
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return dict(payload)
+
+    def put(self, token: str, payload: Dict[str, Any]):
+        exp = payload.get("exp")
+        expires_at = float(exp) if isinstance(exp, (int, float)) else float("inf")
+        now = time.time()
+        if expires_at <= now:
+            return
+        self._purge_expired(now)
+
+        key = self._key(token)
+        self._entries[key] = (dict(payload), expires_at)
+        self._entries.move_to_end(key)
+        if expires_at != float("inf"):
+            heapq.heappush(self._expiries, (expires_at, key))
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+            self.evicted += 1
+        if len(self._expiries) > 2 * self.maxsize:
+            # Drop heap records for entries the LRU already evicted.
+            self._expiries = [(t, k) for t, k in self._expiries if k in self._entries]
+            heapq.heapify(self._expiries)
+
+    def _purge_expired(self, now: float):
+        while self._expiries and self._expiries[0][0] <= now:
+            expires_at, key = heapq.heappop(self._expiries)
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] == expires_at:
+                del self._entries[key]
+                self.expired += 1
+
+    def clear(self):
+        self._entries.clear()
+        self._expiries.clear()
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "expired": self.expired,
+            "evicted": self.evicted,
+        }
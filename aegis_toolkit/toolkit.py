@@ -1,19 +1,53 @@
 # aegis_toolkit/toolkit.py
 
+import asyncio
 import httpx
 import logging
+import tempfile
 from fastapi import APIRouter, Request, Depends, HTTPException
 from fastapi.responses import StreamingResponse
 
 from .config import Settings, ApiClient
-from .waf import inspect_request
+from .waf import (
+    inspect_request, initialize_waf, check_declared_body_size, read_bounded_body,
+    requires_buffered_body, create_streaming_inspector,
+)
 from .threat_intel import check_ip_reputation
 from .profiler import profile_and_analyze
 from .transformer import purify_response_body
 from .authorization import apply_request_enhancements
 from .security import get_api_client_factory, get_current_user_factory
-from .cartographer import check_for_shadow_api
-from .anomaly_detector import track_request
+from .cartographer import check_for_shadow_api, initialize_shadow_tracking
+from .anomaly_detector import track_request, initialize_anomaly_detector
+from .context import RequestContext
+
+_SPOOL_READ_SIZE = 64 * 1024
+
+async def _spool(stream, max_memory: int) -> tempfile.SpooledTemporaryFile:
+    """
+    Writes every chunk of `stream` to a file that stays in memory up to
+    `max_memory` bytes and moves to disk beyond that. Once on disk, writes run
+    in a thread so the event loop is not blocked on I/O.
+    """
+    spool = tempfile.SpooledTemporaryFile(max_size=max_memory)
+    try:
+        async for chunk in stream:
+            if spool._rolled:
+                await asyncio.to_thread(spool.write, chunk)
+            else:
+                spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    spool.seek(0)
+    return spool
+
+async def _replay(spool: tempfile.SpooledTemporaryFile):
+    while True:
+        chunk = await asyncio.to_thread(spool.read, _SPOOL_READ_SIZE) if spool._rolled else spool.read(_SPOOL_READ_SIZE)
+        if not chunk:
+            return
+        yield chunk
 
 def create_security_shield(settings: Settings) -> APIRouter:
     """
@@ -25,8 +59,21 @@ def create_security_shield(settings: Settings) -> APIRouter:
     audit_logger = logging.getLogger("audit")
     proxy_client = httpx.AsyncClient(base_url=settings.backend_target_url)
 
+    def _track(client_id: str, ctx: RequestContext, is_error: bool):
+        try:
+            track_request(client_id, ctx, is_error=is_error)
+        except HTTPException as e:
+            audit_logger.critical(f"AUDIT - ANOMALY_BLOCKED: Client '{client_id}' IP '{ctx.client_host}' Reason: {e.detail}")
+            raise e
+
     get_api_client = get_api_client_factory(settings)
     get_current_user = get_current_user_factory(settings)
+    initialize_waf(settings)
+    settings.add_reload_listener(initialize_waf)
+    initialize_anomaly_detector(settings)
+    settings.add_reload_listener(initialize_anomaly_detector)
+    initialize_shadow_tracking(settings)
+    settings.add_reload_listener(initialize_shadow_tracking)
 
     @router.api_route("/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH", "OPTIONS"])
     async def universal_gateway(
@@ -35,37 +82,61 @@ def create_security_shield(settings: Settings) -> APIRouter:
         client: ApiClient = Depends(get_api_client),
         user_jwt: dict = Depends(get_current_user)
     ):
-        body = await request.body()
+        streaming_config = settings.waf_streaming
+        ctx = RequestContext(request)
+        body_content = None
+        spooled_body = None
         is_error = False
         try:
-            check_for_shadow_api(request.method, path, settings)
+            check_declared_body_size(request, streaming_config.max_body_size)
+            if streaming_config.enabled and not requires_buffered_body(ctx, settings):
+                inspector = create_streaming_inspector(settings)
+                if streaming_config.forward_while_scanning:
+                    body_content = inspector.iter_scanned(request.stream())
+                else:
+                    spooled_body = await _spool(inspector.iter_scanned(request.stream()), streaming_config.spool_max_memory)
+                    body_content = _replay(spooled_body)
+            else:
+                ctx.body = await read_bounded_body(request, streaming_config.max_body_size)
+
+            check_for_shadow_api(ctx.method, ctx.path, ctx.endpoint, settings)
             await check_ip_reputation(request, settings)
-            await inspect_request(request, body, settings)
-            await profile_and_analyze(client.client_id, request, settings)
-            apply_request_enhancements(request, client.role, user_jwt, settings)
+            await inspect_request(ctx, settings, body_scanned=body_content is not None)
+            await profile_and_analyze(client.client_id, ctx, settings)
+            apply_request_enhancements(ctx, client.role, user_jwt, settings)
 
         except HTTPException as e:
             is_error = True
-            audit_logger.critical(f"AUDIT - REQUEST_BLOCKED: Client '{client.client_id}' IP '{request.client.host}' Reason: {e.detail}")
+            if spooled_body is not None:
+                spooled_body.close()
+            audit_logger.critical(f"AUDIT - REQUEST_BLOCKED: Client '{client.client_id}' IP '{ctx.client_host}' Reason: {e.detail}")
             raise e
         finally:
-            try:
-                track_request(client.client_id, request, is_error=is_error)
-            except HTTPException as e:
-                audit_logger.critical(f"AUDIT - ANOMALY_BLOCKED: Client '{client.client_id}' IP '{request.client.host}' Reason: {e.detail}")
-                raise e
+            _track(client.client_id, ctx, is_error)
 
-        url = httpx.URL(path=path, query=request.url.query.encode("utf-8"))
+        url = httpx.URL(path=path, query=ctx.query_string.encode("utf-8"))
         backend_request = proxy_client.build_request(
-            method=request.method, url=url, headers=request.headers.raw, content=body
+            method=request.method, url=url, headers=request.headers.raw,
+            content=body_content if body_content is not None else ctx.body
         )
         try:
             backend_response = await proxy_client.send(backend_request, stream=True)
         except httpx.ConnectError:
             raise HTTPException(status_code=503, detail="Backend service is unavailable.")
+        except HTTPException as e:
+            # Raised by the streaming inspector while the body was being forwarded,
+            # after the request was already tracked as clean.
+            audit_logger.critical(f"AUDIT - REQUEST_BLOCKED: Client '{client.client_id}' IP '{ctx.client_host}' Reason: {e.detail}")
+            _track(client.client_id, ctx, is_error=True)
+            raise e
+        finally:
+            if spooled_body is not None:
+                spooled_body.close()
         
         response_body_bytes = await backend_response.aread()
-        purified_body = purify_response_body(client.role, response_body_bytes, settings)
+        purified_body = await purify_response_body(
+            client.role, response_body_bytes, settings, backend_response.headers.get("content-type", "")
+        )
         
         response_headers = backend_response.headers
         excluded_headers = ["content-encoding", "content-length", "transfer-encoding", "connection"]
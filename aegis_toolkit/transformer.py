@@ -1,54 +1,485 @@
 # core/transformer.py
+import asyncio
+import json
 import logging
-from .config import Settings
-from presidio_analyzer import AnalyzerEngine
-from presidio_anonymizer import AnonymizerEngine
-from presidio_anonymizer.entities import OperatorConfig
+import multiprocessing
+import time
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+from fastapi import HTTPException
+from .config import Settings, PIIRedactionConfig, PIIScanPolicy
+from .pii_patterns import find_pattern_entities, has_candidates, split_entities
 
 audit_logger = logging.getLogger("audit")
 
-try:
-    analyzer = AnalyzerEngine()
-    anonymizer = AnonymizerEngine()
-    PII_ENGINE_ENABLED = True
-    print("INFO: PII Purifier Engine initialized successfully.")
-except Exception as e:
-    PII_ENGINE_ENABLED = False
-    print(f"WARNING: PII Purifier Engine failed to initialize: {e}. DLP will be limited.")
+# The NER-backed analyzer, loaded once per process and only when a policy asks
+# for context entities: in each pool worker, or in the gateway process itself
+# when redaction runs inline (pii_redaction.workers: 0).
+_ANALYZER = None
+PII_ENGINE_ENABLED = None  # None until the engine has been loaded in this process
+_SIZE_BUCKETS = ((1024, "<=1KB"), (10 * 1024, "<=10KB"), (100 * 1024, "<=100KB"), (1024 * 1024, "<=1MB"))
+_REPLACEMENT = "[REDACTED]"
+# Joins JSON string values for the single analyzer pass; a blank line keeps the
+# NER model from reading neighbouring values as one sentence.
+_FIELD_SEPARATOR = "\n\n"
+# Integers this large can be an SSN, card or phone number sent as a JSON number.
+_MIN_SCANNED_INTEGER = 10 ** 8
 
-def purify_response_body(client_role: str, body: bytes, settings: Settings) -> bytes:
+
+def _load_analyzer():
+    global _ANALYZER, PII_ENGINE_ENABLED
+    if PII_ENGINE_ENABLED is not None:
+        return _ANALYZER
+    try:
+        from presidio_analyzer import AnalyzerEngine
+        _ANALYZER = AnalyzerEngine()
+        PII_ENGINE_ENABLED = True
+        print("INFO: PII Purifier Engine initialized successfully.")
+    except Exception as e:
+        PII_ENGINE_ENABLED = False
+        print(f"WARNING: PII Purifier Engine failed to initialize: {e}. DLP will be limited.")
+    return _ANALYZER
+
+
+def _detect(text: str, entities: List[str]) -> List[Tuple[int, int]]:
+    """
+    Spans to redact. Pattern-backed entities (SSNs, card numbers, phone
+    numbers...) come from compiled regexes with checksums; the NER model only
+    runs when `entities` includes context entities such as PERSON, and only
+    for those.
+    """
+    pattern_entities, context_entities = split_entities(entities)
+    spans = [(start, end) for start, end, _ in find_pattern_entities(text, pattern_entities)]
+    if context_entities:
+        analyzer = _load_analyzer()
+        if analyzer is not None:
+            results = analyzer.analyze(text=text, entities=context_entities, language='en')
+            spans.extend((result.start, result.end) for result in results)
+    return spans
+
+
+def _mask(value: str, spans: List[Tuple[int, int]]) -> str:
+    merged: List[List[int]] = []
+    for start, end in sorted(spans):
+        if merged and start <= merged[-1][1]:
+            merged[-1][1] = max(merged[-1][1], end)
+        else:
+            merged.append([start, end])
+    parts, position = [], 0
+    for start, end in merged:
+        parts.append(value[position:start])
+        parts.append(_REPLACEMENT)
+        position = end
+    parts.append(value[position:])
+    return "".join(parts)
+
+
+def _redact_text(text: str, entities: List[str]) -> Tuple[str, bool]:
+    """(redacted text, whether anything was redacted)."""
+    spans = _detect(text, entities)
+    if not spans:
+        return text, False
+    return _mask(text, spans), True
+
+
+def _redact_fields(values: List[str], entities: List[str]) -> Dict[int, str]:
+    """
+    Redacts a batch of JSON string values with one detection pass over their
+    concatenation, mapping each finding back to the value(s) it falls in.
+    Returns {index: redacted value} for the values that changed.
+    """
+    starts, offset = [], 0
+    for value in values:
+        starts.append(offset)
+        offset += len(value) + len(_FIELD_SEPARATOR)
+
+    spans: Dict[int, List[Tuple[int, int]]] = {}
+    for found_start, found_end in _detect(_FIELD_SEPARATOR.join(values), entities):
+        index = bisect_right(starts, found_start) - 1
+        while index < len(values) and starts[index] < found_end:
+            start = max(found_start - starts[index], 0)
+            end = min(found_end - starts[index], len(values[index]))
+            if start < end:
+                spans.setdefault(index, []).append((start, end))
+            index += 1
+    return {index: _mask(values[index], value_spans) for index, value_spans in spans.items()}
+
+
+_WORKER_BARRIER = None
+
+
+def _init_worker(load_model: bool, barrier):
+    """Runs once per worker process: loads the analyzer before the worker takes any job."""
+    global _WORKER_BARRIER
+    _WORKER_BARRIER = barrier
+    if load_model:
+        _load_analyzer()
+
+
+def _warm_up() -> bool:
+    # Every worker blocks here until all of them have started, so each one answers exactly once.
+    _WORKER_BARRIER.wait()
+    return _ANALYZER is not None
+
+
+class RedactionCapacityExceeded(Exception):
+    pass
+
+
+class RedactionUnavailable(Exception):
+    """The worker pool broke (a worker died) or is being restarted."""
+
+
+class RedactionMetrics:
+    """Queue depth, outcomes and redaction latency (submit to result) by response body size."""
+
+    def __init__(self):
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.redactions = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.failures = 0
+        self.pool_restarts = 0
+        self.engine_unavailable = 0
+        self.json_bodies = 0
+        self.fields_scanned = 0
+        self.no_candidates = 0
+        self.pattern_only = 0
+        self.model_scans = 0
+        self.latency: Dict[str, List[float]] = {}  # size bucket -> [count, total seconds, max seconds]
+
+    def record(self, size: int, seconds: float):
+        self.redactions += 1
+        label = next((label for limit, label in _SIZE_BUCKETS if size <= limit), ">1MB")
+        bucket = self.latency.setdefault(label, [0, 0.0, 0.0])
+        bucket[0] += 1
+        bucket[1] += seconds
+        bucket[2] = max(bucket[2], seconds)
+
+    def snapshot(self) -> Dict[str, object]:
+        order = [label for _, label in _SIZE_BUCKETS] + [">1MB"]
+        return {
+            "in_flight": self.in_flight,
+            "max_in_flight": self.max_in_flight,
+            "redactions": self.redactions,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "failures": self.failures,
+            "pool_restarts": self.pool_restarts,
+            "engine_unavailable": self.engine_unavailable,
+            "json_bodies": self.json_bodies,
+            "fields_scanned": self.fields_scanned,
+            "skipped_no_candidates": self.no_candidates,
+            "pattern_tier_only": self.pattern_only,
+            "model_scans": self.model_scans,
+            "latency_by_body_size": {
+                label: {
+                    "count": self.latency[label][0],
+                    "avg_ms": round(self.latency[label][1] / self.latency[label][0] * 1000, 3),
+                    "max_ms": round(self.latency[label][2] * 1000, 3),
+                }
+                for label in order if label in self.latency
+            },
+        }
+
+
+class RedactionPool:
+    """
+    Runs PII detection in worker processes so a large response does not
+    stall the event loop. With `load_model`, each worker loads the NER
+    analyzer once at start-up. At most `max_queue` redactions may be queued or
+    running; beyond that submissions are refused with RedactionCapacityExceeded.
+    If a worker dies, the pool is broken for good: redactions raise
+    RedactionUnavailable while a new pool is started in the background.
+    """
+
+    def __init__(self, workers: int, max_queue: int, load_model: bool, start_method: str = "spawn"):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.load_model = load_model
+        self._closed = False
+        self._restart: Optional[asyncio.Task] = None
+        # spawn by default: forking a process that already runs an event loop and threads is unsafe.
+        # A pre-fork gateway worker forks its pool before starting its loop, so the pool shares its model.
+        self._executor, self.model_loaded = self._start_executor(start_method)
+
+    def _start_executor(self, start_method: str = "spawn") -> Tuple[ProcessPoolExecutor, bool]:
+        context = multiprocessing.get_context(start_method)
+        executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.load_model, context.Barrier(self.workers)),
+        )
+        # Block until every worker is up and has loaded the model, so the first responses do not pay for it.
+        warmed = [executor.submit(_warm_up) for _ in range(self.workers)]
+        wait(warmed)
+        return executor, self.load_model and all(future.result() for future in warmed)
+
+    async def run(self, timeout: float, fn, *args):
+        """
+        Runs `fn(*args)` (_redact_text or _redact_fields) in a worker. Raises
+        RedactionCapacityExceeded when full, RedactionUnavailable when the pool
+        is broken or restarting, and asyncio.TimeoutError after `timeout` seconds.
+        """
+        if self._restart is not None:
+            raise RedactionUnavailable("worker pool is restarting")
+        metrics = REDACTION_METRICS
+        if metrics.in_flight >= self.max_queue:
+            metrics.rejected += 1
+            raise RedactionCapacityExceeded(f"{metrics.in_flight} redactions already queued")
+        loop = asyncio.get_running_loop()
+        executor = self._executor
+        try:
+            job = executor.submit(fn, *args)
+        except BrokenProcessPool as e:
+            self._replace_broken(executor)
+            raise RedactionUnavailable(f"worker pool broken: {e}") from e
+        metrics.in_flight += 1
+        metrics.max_in_flight = max(metrics.max_in_flight, metrics.in_flight)
+        # The slot is held until the worker is done with the job, not just until this request gives up on it.
+        job.add_done_callback(lambda _: self._release(loop))
+        # On timeout, a job still waiting in the queue is cancelled; one already running finishes in its worker.
+        try:
+            return await asyncio.wait_for(asyncio.wrap_future(job), timeout)
+        except BrokenProcessPool as e:
+            self._replace_broken(executor)
+            raise RedactionUnavailable(f"worker pool broken: {e}") from e
+
+    def _replace_broken(self, broken: ProcessPoolExecutor):
+        # Every job that was in the broken pool lands here; only the first starts a replacement.
+        if broken is not self._executor or self._restart is not None or self._closed:
+            return
+        REDACTION_METRICS.pool_restarts += 1
+        audit_logger.error("AUDIT - PII_REDACTION_POOL_BROKEN: A redaction worker died; starting a new pool.")
+        self._restart = asyncio.get_running_loop().create_task(self._restart_executor(broken))
+
+    async def _restart_executor(self, broken: ProcessPoolExecutor):
+        broken.shutdown(wait=False, cancel_futures=True)
+        try:
+            # Off the event loop: the new workers may have to load the model.
+            executor, model_loaded = await asyncio.to_thread(self._start_executor)
+        except Exception as e:
+            audit_logger.error(f"AUDIT - PII_REDACTION_RESTART_FAILED: {e}")
+            return  # the next redaction hits the broken pool again and retries
+        finally:
+            self._restart = None
+        if self._closed:
+            executor.shutdown(wait=False, cancel_futures=True)
+        else:
+            self._executor, self.model_loaded = executor, model_loaded
+
+    @staticmethod
+    def _release(loop: asyncio.AbstractEventLoop):
+        def release():
+            REDACTION_METRICS.in_flight -= 1
+        try:
+            loop.call_soon_threadsafe(release)
+        except RuntimeError:
+            pass  # the loop has closed (shutdown); nothing left to account for
+
+    def shutdown(self, cancel_pending: bool = True):
+        self._closed = True
+        self._executor.shutdown(wait=False, cancel_futures=cancel_pending)
+
+
+PII_REDACTION_CONFIG = PIIRedactionConfig()
+REDACTION_POOL: Optional[RedactionPool] = None
+REDACTION_METRICS = RedactionMetrics()
+
+def _needs_model(settings: Settings) -> bool:
+    return any(split_entities(policy.redact_entities)[1] for policy in settings.pii_scan_policy)
+
+def preload_pii_model(settings: Settings) -> bool:
+    """
+    Loads the NER model into this process if a policy needs it, so processes
+    forked from it share the model's memory. Returns whether it is loaded.
+    """
+    return _needs_model(settings) and _load_analyzer() is not None
+
+def initialize_pii_redaction(settings: Settings, start_method: str = "spawn"):
+    """
+    Starts the redaction worker pool from `pii_redaction`. Call it from the
+    application's startup, not at import time, since spawned workers import
+    the main module again. Until it runs, redaction happens inline. The NER
+    model is only loaded when some policy asks for a context entity. Re-run
+    on config reload; the pool is only rebuilt when its worker count or its
+    need for the model changes, since every new worker has to load it again.
+    `start_method` "fork" is only safe before the event loop has started.
+    """
+    global PII_REDACTION_CONFIG, REDACTION_POOL
+    config = settings.pii_redaction
+    previous = REDACTION_POOL
+    load_model = _needs_model(settings)
+    if not settings.pii_scan_policy:
+        pool = None
+    elif config.workers <= 0:
+        pool = None
+        if load_model:
+            _load_analyzer()
+    elif previous is not None and previous.workers == config.workers and previous.load_model == load_model:
+        pool = previous
+    else:
+        pool = RedactionPool(config.workers, config.max_queue, load_model, start_method)
+        print(f"PII redaction running in {config.workers} worker processes"
+              f"{' with the NER model' if load_model else ' (pattern recognizers only)'}.")
+    if pool is not None:
+        pool.max_queue = config.max_queue
+    REDACTION_POOL, PII_REDACTION_CONFIG = pool, config
+    if previous is not None and previous is not pool:
+        previous.shutdown(cancel_pending=False)
+
+def shutdown_pii_redaction():
+    global REDACTION_POOL
+    if REDACTION_POOL is not None:
+        REDACTION_POOL.shutdown()
+        REDACTION_POOL = None
+
+def _redaction_failed(client_role: str, body: bytes, reason: str) -> bytes:
+    """Applies `pii_redaction.on_failure`: "open" passes the body through, "closed" withholds it."""
+    audit_logger.error(f"AUDIT - PII_REDACTION_FAILED: Response for role '{client_role}' could not be scanned: {reason}")
+    if PII_REDACTION_CONFIG.on_failure == "closed":
+        raise HTTPException(status_code=503, detail="Service busy: response could not be inspected. Please retry.")
+    return body
+
+@lru_cache(maxsize=256)
+def _parse_field_paths(paths: Tuple[str, ...]) -> Tuple[Tuple[str, ...], ...]:
+    return tuple(tuple(path.split(".")) for path in paths)
+
+def _covers(rule: Tuple[str, ...], path: Tuple[str, ...]) -> bool:
+    """True if `path` is `rule` or lies under it; "*" matches any object key or array index."""
+    return len(rule) <= len(path) and all(r == "*" or r == p for r, p in zip(rule, path))
+
+def _may_reach(rule: Tuple[str, ...], path: Tuple[str, ...]) -> bool:
+    """True if `rule` could still cover `path` or something below it."""
+    return all(r == "*" or r == p for r, p in zip(rule, path))
+
+def _collect_strings(document: List[Any], policy: PIIScanPolicy,
+                     entities: Tuple[str, ...]) -> Tuple[List[Tuple[Any, Any]], List[str]]:
+    """
+    The string values in a parsed JSON document (wrapped in a one-item list so
+    a top-level string can be replaced too) that the policy's
+    `scan_fields`/`skip_fields` leave in scope and that could hold one of
+    `entities`, with the (container, key) each one came from. Integers of 9 or
+    more digits are collected as their decimal text. Keys, smaller numbers,
+    booleans and nulls are never scanned.
+    """
+    scan = _parse_field_paths(tuple(policy.scan_fields))
+    skip = _parse_field_paths(tuple(policy.skip_fields))
+    refs: List[Tuple[Any, Any]] = []
+    values: List[str] = []
+    stack = [(document, 0, ())]
+    while stack:
+        container, key, path = stack.pop()
+        if skip and any(_covers(rule, path) for rule in skip):
+            continue
+        if scan and not any(_may_reach(rule, path) for rule in scan):
+            continue
+        value = container[key]
+        if type(value) is int and abs(value) >= _MIN_SCANNED_INTEGER:
+            value = str(value)
+        if isinstance(value, str):
+            if value and (not scan or any(_covers(rule, path) for rule in scan)) and has_candidates(value, entities):
+                refs.append((container, key))
+                values.append(value)
+        elif isinstance(value, dict):
+            stack.extend((value, k, path + (k,)) for k in reversed(value))
+        elif isinstance(value, list):
+            stack.extend((value, i, path + (str(i),)) for i in reversed(range(len(value))))
+    return refs, values
+
+def _model_available() -> bool:
+    pool = REDACTION_POOL
+    return pool.model_loaded if pool is not None else _load_analyzer() is not None
+
+async def purify_response_body(client_role: str, body: bytes, settings: Settings, content_type: str = "") -> bytes:
     """
     Uses a PII engine to find and redact sensitive data based on the pii_scan_policy.
+    JSON responses (with `pii_redaction.json_aware`) are parsed once and only
+    their string values are scanned, in a single batched detection pass; the
+    body is re-serialized only when something was redacted. Text that cannot
+    hold any requested entity is not scanned at all, and pattern-only policies
+    of small bodies are handled on the event loop without the worker pool.
     """
-    body_str = body.decode('utf-8', errors='ignore')
-    
-    if not PII_ENGINE_ENABLED:
+    policy = next((p for p in settings.pii_scan_policy if p.role == "*" or client_role == p.role), None)
+    if policy is None or not policy.redact_entities or not body:
         return body
+    pattern_entities, context_entities = split_entities(policy.redact_entities)
+    if context_entities and not _model_available():
+        # Without the model, still redact what the pattern recognizers can find.
+        REDACTION_METRICS.engine_unavailable += 1
+        context_entities = []
+        if not pattern_entities:
+            return body
+    entities = tuple(pattern_entities + context_entities)
 
-    entities_to_redact = []
-    for policy in settings.pii_scan_policy:
-        if policy.role == "*" or client_role == policy.role:
-            entities_to_redact.extend(policy.redact_entities)
-            break
+    document = None
+    if PII_REDACTION_CONFIG.json_aware and "json" in content_type.lower():
+        try:
+            document = [json.loads(body)]
+        except ValueError:
+            pass  # not valid JSON after all; scan it as text
+    if document is not None:
+        refs, values = _collect_strings(document, policy, entities)
+        REDACTION_METRICS.json_bodies += 1
+        REDACTION_METRICS.fields_scanned += len(values)
+        if not values:
+            REDACTION_METRICS.no_candidates += 1
+            return body
+        job = (_redact_fields, values, list(entities))
+    else:
+        body_str = body.decode('utf-8', errors='ignore')
+        if not has_candidates(body_str, entities):
+            REDACTION_METRICS.no_candidates += 1
+            return body
+        job = (_redact_text, body_str, list(entities))
 
-    if not entities_to_redact:
-        return body
-        
-    analyzer_results = analyzer.analyze(
-        text=body_str,
-        entities=entities_to_redact,
-        language='en'
-    )
-    
-    anonymized_result = anonymizer.anonymize(
-        text=body_str,
-        analyzer_results=analyzer_results,
-        operators={"DEFAULT": OperatorConfig("replace", {"new_value": "[REDACTED]"})}
-    )
-    
-    if anonymized_result.text != body_str:
-        audit_logger.warning(
-            f"AUDIT - PII_REDACTED: Purifier Engine redacted sensitive data for role '{client_role}'."
-        )
+    if context_entities:
+        REDACTION_METRICS.model_scans += 1
+    else:
+        REDACTION_METRICS.pattern_only += 1
+    started = time.perf_counter()
+    pool = REDACTION_POOL
+    if pool is None or (not context_entities and len(body) <= PII_REDACTION_CONFIG.inline_pattern_max_bytes):
+        result = job[0](*job[1:])
+    else:
+        try:
+            result = await pool.run(PII_REDACTION_CONFIG.timeout_ms / 1000, *job)
+        except RedactionCapacityExceeded as e:
+            return _redaction_failed(client_role, body, str(e))
+        except RedactionUnavailable as e:
+            if context_entities:
+                return _redaction_failed(client_role, body, str(e))
+            # The pattern tier needs no model; run it here until the pool is back.
+            result = job[0](*job[1:])
+        except asyncio.TimeoutError:
+            REDACTION_METRICS.timeouts += 1
+            return _redaction_failed(client_role, body, f"timed out after {PII_REDACTION_CONFIG.timeout_ms:g}ms")
+        except Exception as e:
+            REDACTION_METRICS.failures += 1
+            return _redaction_failed(client_role, body, f"{type(e).__name__}: {e}")
+    REDACTION_METRICS.record(len(body), time.perf_counter() - started)
 
-    return anonymized_result.text.encode('utf-8')
\ No newline at end of file
+    if document is not None:
+        if not result:
+            return body
+        for index, redacted_value in result.items():
+            container, key = refs[index]
+            # A number cannot be partly masked; the whole value becomes the marker string.
+            container[key] = redacted_value if isinstance(container[key], str) else _REPLACEMENT
+        detail = f" in {len(result)} JSON fields"
+        redacted = json.dumps(document[0], ensure_ascii=False, separators=(",", ":")).encode('utf-8')
+    else:
+        redacted_text, changed = result
+        if not changed:
+            return body
+        detail = ""
+        redacted = redacted_text.encode('utf-8')
+    audit_logger.warning(
+        f"AUDIT - PII_REDACTED: Purifier Engine redacted sensitive data{detail} for role '{client_role}'."
+    )
+    return redacted
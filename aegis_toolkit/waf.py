@@ -1,89 +1,286 @@
 # core/waf.py
-import re
 import json
+import codecs
 import logging
-import html
-from fnmatch import fnmatch
+from typing import Optional
 from fastapi import Request, HTTPException
-from urllib.parse import unquote
 
-from .config import Settings, WAFRule
-from .waf_rules import ALL_PATTERNS
+from .config import Settings, WAFRule, WAFEngineConfig, WAFOffloadConfig
+from .context import RequestContext, canonicalize_input
+from .signatures import SignatureEngine, ScanBudgetExceeded
+from .rule_index import RuleIndex
+from .offload import ScanOffloader, OffloadCapacityExceeded, OffloadUnavailable, OffloadedScanResult
+from .graphql_analysis import GraphQLAnalysisCache, GraphQLSyntaxError, PersistedQueryNotFound, extract_graphql_operations
 from .request_schemas import SCHEMA_REGISTRY
+from .cartographer import SPEC_VALIDATORS
 from pydantic import ValidationError
 
 audit_logger = logging.getLogger("audit")
+SIGNATURE_ENGINE = None
+RULE_INDEX = None
+WAF_ENGINE_CONFIG = WAFEngineConfig()
+WAF_OFFLOAD_CONFIG = WAFOffloadConfig()
+SCAN_OFFLOADER = None
+GRAPHQL_ANALYSIS_CACHE = GraphQLAnalysisCache()
+# Appended to non-final chunk windows so end-of-input anchors ('$') cannot fire
+# at an arbitrary chunk boundary. Null bytes never survive canonicalization.
+_CHUNK_SENTINEL = "\x00"
 
-def _canonicalize_input(data: str) -> str:
+def initialize_waf(settings: Settings):
     """
-    Normalizes input by decoding, converting to lowercase, and removing null bytes
-    to defeat common WAF evasion techniques.
+    Compiles the signature set, config rule patterns and the rule dispatch index.
+    Runs at startup and again after a config reload; everything is built first
+    and then swapped in, so a rule set that fails to compile leaves the old one active.
     """
-    if not data:
-        return ""
-    
-    decoded_data = data
+    global SIGNATURE_ENGINE, RULE_INDEX, WAF_ENGINE_CONFIG, WAF_OFFLOAD_CONFIG
+    waf_rules = settings.waf_rules
+    engine_config = settings.waf_engine
+    engine = SignatureEngine.from_rules(
+        waf_rules, redos_policy=engine_config.redos_policy, profile=engine_config.profile_signatures
+    )
+    rule_index = RuleIndex(waf_rules)
+
+    SIGNATURE_ENGINE, RULE_INDEX, WAF_ENGINE_CONFIG = engine, rule_index, engine_config
+    WAF_OFFLOAD_CONFIG = settings.waf_offload
+
+    print(f"WAF signature engine compiled with {len(engine.signatures)} signatures "
+          f"and {len(engine.rule_patterns)} rule patterns; {rule_index.size} rules indexed.")
+
+def initialize_waf_offloader(settings: Settings, start_method: str = "spawn"):
+    """
+    Starts the scan worker pool from `waf_offload`. Call it from the
+    application's startup, not at import time, since spawned workers import
+    the main module again. Until it runs, bodies are scanned inline. Re-run
+    on config reload; the pool is only rebuilt when its worker count or the
+    rule patterns it compiled change.
+    `start_method` "fork" is only safe before the event loop has started.
+    """
+    global SCAN_OFFLOADER
+    offload_config = settings.waf_offload
+    previous = SCAN_OFFLOADER
+    rule_patterns = {rule.name: rule.pattern for rule in settings.waf_rules if rule.pattern}
+    if not offload_config.enabled:
+        offloader = None
+    elif previous is not None and previous.workers == offload_config.workers and previous.rule_patterns == rule_patterns:
+        offloader = previous
+        offloader.max_queue = offload_config.max_queue
+    else:
+        offloader = ScanOffloader(rule_patterns, offload_config.workers, offload_config.max_queue,
+                                  metrics=previous.metrics if previous is not None else None,
+                                  start_method=start_method)
+        print(f"WAF scan offloading enabled: {offload_config.workers} workers for bodies "
+              f">= {offload_config.size_threshold} bytes.")
+    SCAN_OFFLOADER = offloader
+    if previous is not None and previous is not offloader:
+        previous.shutdown(cancel_pending=False)
+
+def shutdown_waf():
+    """Stops the scan worker pool, if one was started."""
+    global SCAN_OFFLOADER
+    if SCAN_OFFLOADER is not None:
+        SCAN_OFFLOADER.shutdown()
+        SCAN_OFFLOADER = None
+
+def _get_signature_engine(settings: Settings) -> SignatureEngine:
+    if SIGNATURE_ENGINE is None:
+        initialize_waf(settings)
+    return SIGNATURE_ENGINE
+
+def _get_rule_index(settings: Settings) -> RuleIndex:
+    if RULE_INDEX is None:
+        initialize_waf(settings)
+    return RULE_INDEX
+
+def _scan_budget_seconds():
+    budget_ms = WAF_ENGINE_CONFIG.scan_time_budget_ms
+    return budget_ms / 1000 if budget_ms else None
+
+def _report_signature(match, location: str):
+    audit_logger.critical(
+        f"AUDIT - WAF_SIGNATURE_VIOLATION: Signature '{match.name}' ({match.category}) "
+        f"pattern '{match.pattern}' triggered on '{location}'"
+    )
+    raise HTTPException(status_code=403, detail="Forbidden: Malicious signature detected.")
+
+def _report_scan_overrun(reason, location: str):
+    audit_logger.critical(f"AUDIT - WAF_SCAN_BUDGET_EXCEEDED: {reason} on '{location}'")
+    if WAF_ENGINE_CONFIG.signature_budget_action == 'block':
+        raise HTTPException(status_code=403, detail="Forbidden: Request could not be inspected in time.")
+
+def _perform_signature_detection(engine: SignatureEngine, text_to_scan: str, location: str):
+    """Scans text against the full OWASP-inspired signature set in a single pass."""
+    try:
+        match = engine.scan(text_to_scan, _scan_budget_seconds())
+    except ScanBudgetExceeded as e:
+        _report_scan_overrun(e, location)
+        return
+    if match:
+        _report_signature(match, location)
+
+async def _scan_body_offloaded(ctx: RequestContext, rules) -> Optional[OffloadedScanResult]:
+    """
+    Signature and body-pattern scan of a large body in the worker pool, keeping
+    the event loop free. None if the pool is broken or restarting; the caller
+    then scans inline.
+    """
+    rule_names = [rule.name for rule in rules if rule.pattern and "body" in rule.inspect_locations]
     try:
-        for _ in range(3):
-            new_decoded_data = unquote(decoded_data)
-            if new_decoded_data == decoded_data:
-                break
-            decoded_data = new_decoded_data
-
-        decoded_data = html.unescape(decoded_data)
-
-        decoded_data = decoded_data.replace('\x00', '')
-        
-        decoded_data = decoded_data.lower()
-
-    except Exception as e:
-        audit_logger.warning(f"WAF: Input canonicalization failed for data snippet '{data[:50]}...': {e}")
-        pass 
-        
-    return decoded_data
-
-def _perform_signature_detection(text_to_scan: str, location: str):
-    """Scans text against the full OWASP-inspired regex pattern set."""
-    for pattern in ALL_PATTERNS:
-        if re.search(pattern, text_to_scan):
-            audit_logger.critical(f"AUDIT - WAF_SIGNATURE_VIOLATION: Pattern '{pattern}' triggered on '{location}'")
-            raise HTTPException(status_code=403, detail="Forbidden: Malicious signature detected.")
-
-def _get_query_depth(query: dict, max_depth=0) -> int:
-    if not isinstance(query, dict): return max_depth
-    current_depth = max_depth + 1
-    max_child_depth = current_depth
-    for key, value in query.items():
-        if isinstance(value, dict):
-            child_depth = _get_query_depth(value, current_depth)
-            max_child_depth = max(max_child_depth, child_depth)
-        elif isinstance(value, list):
-            for item in value:
-                child_depth = _get_query_depth(item, current_depth)
-                max_child_depth = max(max_child_depth, child_depth)
-    return max_child_depth
-
-async def inspect_request(request: Request, body: bytes, settings: Settings):
+        result = await SCAN_OFFLOADER.scan_body(ctx.body, rule_names, _scan_budget_seconds())
+    except OffloadCapacityExceeded as e:
+        audit_logger.error(f"AUDIT - WAF_OFFLOAD_REJECTED: {e}")
+        raise HTTPException(status_code=503, detail="Service busy: request inspection capacity exceeded. Please retry.")
+    except OffloadUnavailable as e:
+        audit_logger.error(f"AUDIT - WAF_OFFLOAD_UNAVAILABLE: {e}; scanning the body inline.")
+        return None
+    if result.signature_budget_error:
+        _report_scan_overrun(result.signature_budget_error, "request body")
+    if result.signature:
+        _report_signature(result.signature, "request body")
+    return result
+
+def _offloaded_rule_hit(result: OffloadedScanResult, rule: WAFRule) -> bool:
+    if rule.name in result.rule_budget_overruns:
+        audit_logger.critical(f"AUDIT - WAF_SCAN_BUDGET_EXCEEDED: Rule '{rule.name}' exceeded the scan budget on 'request body'")
+        return rule.action == 'block'
+    return rule.name in result.rule_hits
+
+def _body_too_large(max_body_size: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"Request body exceeds the maximum allowed size of {max_body_size} bytes.")
+
+def check_declared_body_size(request: Request, max_body_size: int):
+    """Rejects a request from its Content-Length header before any of the body is read."""
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > max_body_size:
+        raise _body_too_large(max_body_size)
+
+async def read_bounded_body(request: Request, max_body_size: int) -> bytes:
+    """Buffers the request body, aborting as soon as it grows past `max_body_size`."""
+    chunks = []
+    received = 0
+    async for chunk in request.stream():
+        received += len(chunk)
+        if received > max_body_size:
+            raise _body_too_large(max_body_size)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+class StreamingBodyInspector:
+    """
+    Scans a request body for signatures chunk by chunk, keeping memory bounded by
+    the chunk size plus an overlap window. The last `overlap` decoded characters of
+    each chunk are prepended to the next one, so a signature (or a percent-encoded
+    sequence) split across a chunk boundary is still seen whole.
+    """
+
+    def __init__(self, engine: SignatureEngine, max_body_size: int, overlap: int):
+        self.engine = engine
+        self.max_body_size = max_body_size
+        self.overlap = overlap
+        self.received = 0
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="ignore")
+        self._tail = ""
+
+    def feed(self, chunk: bytes, final: bool = False):
+        self.received += len(chunk)
+        if self.received > self.max_body_size:
+            raise _body_too_large(self.max_body_size)
+
+        window = self._tail + self._decoder.decode(chunk, final)
+        canonical_window = canonicalize_input(window)
+        if not final:
+            canonical_window += _CHUNK_SENTINEL
+        _perform_signature_detection(self.engine, canonical_window, "request body")
+        self._tail = window[-self.overlap:] if self.overlap else ""
+
+    async def iter_scanned(self, stream):
+        """
+        Yields the chunks of `stream` once they have been scanned. The most recent
+        chunk is held back until the end-of-body scan passes, so a violation always
+        interrupts the upload before the backend has received the complete body.
+        """
+        pending = None
+        async for chunk in stream:
+            if not chunk:
+                continue
+            self.feed(chunk)
+            if pending is not None:
+                yield pending
+            pending = chunk
+        self.feed(b"", final=True)
+        if pending is not None:
+            yield pending
+
+def requires_buffered_body(ctx: RequestContext, settings: Settings) -> bool:
+    """True if a path-specific rule needs the whole body (schemas, body patterns, GraphQL checks)."""
+    for rule in _get_rule_index(settings).match(ctx.path, ctx.method):
+        if rule.body_schema or rule.max_depth or rule.max_cost or (rule.pattern and "body" in rule.inspect_locations):
+            return True
+    return settings.api_discovery.validate_request_bodies and _spec_body_validator(ctx) is not None
+
+def create_streaming_inspector(settings: Settings) -> StreamingBodyInspector:
+    config = settings.waf_streaming
+    return StreamingBodyInspector(_get_signature_engine(settings), config.max_body_size, config.chunk_overlap)
+
+def _graphql_operations(ctx: RequestContext):
+    """GraphQL operations from a JSON body (single or batched), or from the query string of a GET."""
+    if ctx.method == "GET" and "query" in ctx.query_params:
+        params = ctx.query_params
+        try:
+            variables = json.loads(params.get("variables") or "{}")
+            extensions = json.loads(params.get("extensions") or "{}")
+        except json.JSONDecodeError:
+            variables, extensions = {}, {}
+        return extract_graphql_operations({"query": params["query"], "variables": variables, "extensions": extensions})
+    try:
+        return extract_graphql_operations(ctx.json())
+    except json.JSONDecodeError:
+        return []
+
+def _enforce_graphql_limits(rule: WAFRule, ctx: RequestContext):
+    """Checks depth and weighted cost of each GraphQL operation, using cached analyses for repeated queries."""
+    for query, variables, persisted_hash in _graphql_operations(ctx):
+        try:
+            analysis = GRAPHQL_ANALYSIS_CACHE.analyze(query, variables, persisted_hash)
+        except GraphQLSyntaxError as e:
+            _trigger_violation(rule, f"GraphQL document ({e})")
+            continue
+        except PersistedQueryNotFound as e:
+            # Its depth and cost cannot be checked; APQ clients resend the full query on this error.
+            audit_logger.warning(f"AUDIT - WAF_GRAPHQL_UNKNOWN_PERSISTED_QUERY: Rule '{rule.name}': {e}")
+            if rule.action == 'block':
+                raise HTTPException(status_code=400, detail="PersistedQueryNotFound")
+            continue
+        if analysis is None:
+            continue
+        if rule.max_depth and analysis.depth > rule.max_depth:
+            _trigger_violation(rule, f"GraphQL query depth ({analysis.depth})")
+        if rule.max_cost and analysis.cost > rule.max_cost:
+            _trigger_violation(rule, f"GraphQL query cost ({analysis.cost})")
+
+async def inspect_request(ctx: RequestContext, settings: Settings, body_scanned: bool = False):
     """
     Inspects an incoming request against all WAF rules.
     1. Canonicalizes input to defeat evasion.
     2. Performs global signature checks.
     3. Applies specific, path-based rules (schema validation, pattern matching, etc.).
+
+    Decoded, canonical and parsed forms come from the shared RequestContext, so
+    each is computed at most once however many rules need it.
+    Pass `body_scanned=True` when the body was already (or is being) checked by a
+    StreamingBodyInspector; the body signature pass is then skipped.
     """
-    canonical_query_str = _canonicalize_input(request.url.query)
-    raw_body_str = body.decode('utf-8', 'ignore')
-    canonical_body_str = _canonicalize_input(raw_body_str)
+    engine = _get_signature_engine(settings)
+    rules = _get_rule_index(settings).match(ctx.path, ctx.method)
 
-    _perform_signature_detection(canonical_query_str, "query parameters")
-    _perform_signature_detection(canonical_body_str, "request body")
+    _perform_signature_detection(engine, ctx.canonical_query, "query parameters")
+    offloaded = None
+    if not body_scanned:
+        if SCAN_OFFLOADER is not None and len(ctx.body) >= WAF_OFFLOAD_CONFIG.size_threshold:
+            offloaded = await _scan_body_offloaded(ctx, rules)
+        if offloaded is None:
+            _perform_signature_detection(engine, ctx.canonical_body, "request body")
     
-    for rule in settings.waf_rules:
-        if not fnmatch(request.url.path, rule.path_pattern):
-            continue
-        if "*" not in rule.methods and request.method not in rule.methods:
-            continue
-
-
+    for rule in rules:
         if rule.body_schema:
             schema = SCHEMA_REGISTRY.get(rule.body_schema)
             if not schema:
@@ -91,34 +288,55 @@ async def inspect_request(request: Request, body: bytes, settings: Settings):
                 continue
             
             try:
-                body_json = json.loads(raw_body_str)
-                schema.model_validate(body_json)
-            except (json.JSONDecodeError, ValidationError) as e:
+                schema.model_validate_json(ctx.body)
+            except ValidationError as e:
                 audit_logger.warning(f"AUDIT - WAF_SCHEMA_VIOLATION: Rule '{rule.name}' triggered. Reason: {e}")
                 raise HTTPException(status_code=422, detail=f"Invalid request body format: {str(e)}")
 
         elif rule.pattern:
-            pattern = re.compile(rule.pattern)
-            if "body" in rule.inspect_locations and pattern.search(canonical_body_str):
-                _trigger_violation(rule, "request body")
-            if "query_params" in rule.inspect_locations and pattern.search(canonical_query_str):
+            if "body" in rule.inspect_locations:
+                if offloaded is not None:
+                    body_hit = _offloaded_rule_hit(offloaded, rule)
+                else:
+                    body_hit = _search_rule(engine, rule, ctx.canonical_body, "request body")
+                if body_hit:
+                    _trigger_violation(rule, "request body")
+            if "query_params" in rule.inspect_locations and _search_rule(engine, rule, ctx.canonical_query, "query parameters"):
                 _trigger_violation(rule, "query parameters")
-        elif rule.type == 'graphql_depth_check':
-            if not rule.max_depth: continue
-            try:
-                gql_body = json.loads(raw_body_str)
-                if _get_query_depth(gql_body) > rule.max_depth:
-                    _trigger_violation(rule, "GraphQL query depth")
-            except (json.JSONDecodeError, AttributeError):
-                continue
-        elif rule.type == 'graphql_cost_check' and "body" in rule.inspect_locations:
-            if not rule.max_cost: continue
-            try:
-                cost = len(re.findall(r'[:\s](\w+)\s*[{]', canonical_body_str))
-                if cost > rule.max_cost:
-                   _trigger_violation(rule, f"GraphQL query cost ({cost})")
-            except Exception:
-                continue
+        elif rule.type in ('graphql_depth_check', 'graphql_cost_check'):
+            _enforce_graphql_limits(rule, ctx)
+
+    if settings.api_discovery.validate_request_bodies:
+        _validate_against_spec(ctx)
+
+def _spec_body_validator(ctx: RequestContext):
+    """The spec's requestBody validator for this request, if it carries (or must carry) a JSON body."""
+    content_type = ctx.headers.get("content-type", "").split(";")[0].strip()
+    if content_type and content_type != "application/json" and not content_type.endswith("+json"):
+        return None
+    return SPEC_VALIDATORS.validators.get(ctx.endpoint.signature) if ctx.endpoint is not None else None
+
+def _validate_against_spec(ctx: RequestContext):
+    """Validates the raw body bytes against the OpenAPI requestBody schema of the matched operation."""
+    validator = _spec_body_validator(ctx)
+    if validator is None or (not ctx.body and not validator.required):
+        return
+    try:
+        validator.validate(ctx.body)
+    except ValidationError as e:
+        audit_logger.warning(f"AUDIT - WAF_SCHEMA_VIOLATION: Spec operation '{validator.operation}' rejected body. Reason: {e}")
+        raise HTTPException(status_code=422, detail=f"Invalid request body format: {str(e)}")
+
+def _search_rule(engine: SignatureEngine, rule: WAFRule, text: str, location: str) -> bool:
+    """
+    Runs a rule pattern under the scan budget. An overrun fails closed for
+    blocking rules and open for log-only rules.
+    """
+    try:
+        return engine.search_rule(rule.name, text, _scan_budget_seconds())
+    except ScanBudgetExceeded as e:
+        audit_logger.critical(f"AUDIT - WAF_SCAN_BUDGET_EXCEEDED: {e} on '{location}'")
+        return rule.action == 'block'
 
 def _trigger_violation(rule, location):
     audit_logger.critical(f"AUDIT - WAF_VIOLATION: Rule '{rule.name}' triggered on '{location}'")
@@ -5,7 +5,7 @@
 SQLI_PATTERNS = [
     r"(union\s*select)",
     r"(--|#|;)\s*$",
-    r"(\s*or\s*\d+=\d+)",
+    r"(or\s*\d+=\d+)", # no leading \s*: same matches, but lets re use the literal prefix
     r"(and\s*(select|update|delete))",
     r"(benchmark\s*\()",
     r"(information_schema)",
@@ -30,4 +30,12 @@ INJECTION_PATTERNS = [
     r"(/bin/sh)",
 ]
 
-ALL_PATTERNS = SQLI_PATTERNS + XSS_PATTERNS + INJECTION_PATTERNS
\ No newline at end of file
+ALL_PATTERNS = SQLI_PATTERNS + XSS_PATTERNS + INJECTION_PATTERNS
+
+# Named view of the signature set, used by the compiled SignatureEngine to
+# report which category a match came from.
+SIGNATURE_CATEGORIES = {
+    "sqli": SQLI_PATTERNS,
+    "xss": XSS_PATTERNS,
+    "injection": INJECTION_PATTERNS,
+}
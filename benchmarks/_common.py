@@ -0,0 +1,18 @@
+# benchmarks/_common.py
+import time
+
+
+def measure(func, iterations: int) -> float:
+    """Runs `func` `iterations` times and returns calls per second."""
+    start = time.perf_counter()
+    for _ in range(iterations):
+        func()
+    elapsed = time.perf_counter() - start
+    return iterations / elapsed if elapsed else float("inf")
+
+
+def report(label: str, rate: float, baseline: float = None):
+    line = f"{label:<45} {rate:>14,.0f} ops/sec"
+    if baseline:
+        line += f"   ({rate / baseline:.2f}x)"
+    print(line)
@@ -0,0 +1,46 @@
+# benchmarks/bench_auth.py
+"""
+JWT dependency resolution, cached versus verifying on every request.
+
+Run from the repository root:
+    python -m benchmarks.bench_auth
+"""
+import asyncio
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+from jose import jwt
+
+from ._common import measure, report
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("API_CLIENTS_JSON", json.dumps([]))
+
+from aegis_toolkit.config import Settings  # noqa: E402
+from aegis_toolkit.security import TOKEN_CACHE, get_current_user_factory  # noqa: E402
+
+ITERATIONS = 20_000
+
+
+def bench_current_user():
+    settings = Settings()
+    token = jwt.encode(
+        {"user_id": "u-123", "role": "user", "exp": datetime.now(timezone.utc) + timedelta(minutes=30)},
+        settings.jwt_secret_key, algorithm="HS256",
+    )
+    uncached = get_current_user_factory(settings, use_cache=False)
+    cached = get_current_user_factory(settings)
+    loop = asyncio.new_event_loop()
+
+    print("get_current_user dependency (same token reused)")
+    verify_rate = measure(lambda: loop.run_until_complete(uncached(token)), ITERATIONS)
+    cached_rate = measure(lambda: loop.run_until_complete(cached(token)), ITERATIONS)
+    report("  jose.jwt.decode every request", verify_rate)
+    report("  verified-token cache", cached_rate, verify_rate)
+    print(f"  cache metrics: {TOKEN_CACHE.snapshot()}")
+    loop.close()
+
+
+if __name__ == "__main__":
+    bench_current_user()
@@ -0,0 +1,67 @@
+# benchmarks/bench_offload.py
+"""
+Event-loop latency for small requests while large bodies are being scanned,
+inline versus in the worker pool.
+
+Run from the repository root:
+    python -m benchmarks.bench_offload
+"""
+import asyncio
+import time
+
+from aegis_toolkit.context import canonicalize_input
+from aegis_toolkit.offload import ScanOffloader
+from aegis_toolkit.signatures import SignatureEngine
+from aegis_toolkit.waf_rules import SIGNATURE_CATEGORIES
+
+LARGE_BODY = (b'{"note": "' + b"lorem ipsum dolor sit amet, consectetur adipiscing elit " * 40_000 + b'"}')
+UPLOADS = 8
+TICK_SECONDS = 0.001
+
+
+async def _probe_latency(stop: asyncio.Event):
+    """Stands in for small requests: measures how late each 1 ms tick is scheduled."""
+    delays = []
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        delays.append(time.perf_counter() - start - TICK_SECONDS)
+    return delays
+
+
+async def _run(scan):
+    stop = asyncio.Event()
+    probe = asyncio.create_task(_probe_latency(stop))
+    await asyncio.sleep(0.05)
+    start = time.perf_counter()
+    await asyncio.gather(*(scan() for _ in range(UPLOADS)))
+    elapsed = time.perf_counter() - start
+    stop.set()
+    delays = sorted(await probe)
+    p99 = delays[int(len(delays) * 0.99) - 1] if delays else 0.0
+    return elapsed, p99, delays[-1] if delays else 0.0
+
+
+def _print(label, elapsed, p99, worst):
+    print(f"  {label:<22} total {elapsed * 1000:>8.1f} ms   loop p99 lag {p99 * 1000:>7.2f} ms   worst {worst * 1000:>7.2f} ms")
+
+
+async def main():
+    engine = SignatureEngine(SIGNATURE_CATEGORIES)
+    offloader = ScanOffloader({}, workers=2, max_queue=UPLOADS)
+
+    async def inline():
+        engine.scan(canonicalize_input(LARGE_BODY.decode("utf-8", "ignore")))
+
+    async def offloaded():
+        await offloader.scan_body(LARGE_BODY, [], None)
+
+    print(f"WAF scan of {UPLOADS} x {len(LARGE_BODY) // 1024} KB bodies")
+    _print("inline", *await _run(inline))
+    _print("process pool", *await _run(offloaded))
+    print(f"  offload metrics: {offloader.metrics.snapshot()}")
+    offloader.shutdown()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,71 @@
+# benchmarks/bench_pii.py
+"""
+PII detection throughput per tier: the candidate pre-check, the regex +
+checksum recognizers, and the NER model (the previous path for every entity).
+
+Run from the repository root:
+    python -m benchmarks.bench_pii
+The NER tier needs presidio-analyzer and the spaCy model; without them it is skipped.
+"""
+import json
+import os
+import random
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("API_CLIENTS_JSON", json.dumps([]))
+os.environ.setdefault("AEGIS_CONFIG_PATH", "AegisApp/config.yaml")
+
+from aegis_toolkit.pii_patterns import PATTERN_RECOGNIZERS, has_candidates  # noqa: E402
+from aegis_toolkit.transformer import _load_analyzer, _redact_fields, _redact_text  # noqa: E402
+
+from ._common import measure, report  # noqa: E402
+
+PATTERN_ENTITIES = ["US_SSN", "CREDIT_CARD", "PHONE_NUMBER"]
+WORDS = ["order", "status", "shipped", "warehouse", "customer", "account", "balance", "pending", "notes", "item"]
+
+
+def _records(count: int, with_pii: bool):
+    rng = random.Random(11)
+    records = []
+    for i in range(count):
+        record = {"id": f"ord_{i}", "status": rng.choice(WORDS), "notes": " ".join(rng.choices(WORDS, k=12))}
+        if with_pii:
+            record["contact"] = f"call 415-555-{rng.randrange(1000, 9999)} re card 4111 1111 1111 1111"
+            record["ssn"] = f"{rng.randrange(100, 665)}-{rng.randrange(10, 99)}-{rng.randrange(1000, 9999)}"
+        records.append(record)
+    return records
+
+
+def _bench(label: str, func, size: int, iterations: int, baseline: float = None) -> float:
+    rate = measure(func, iterations)
+    report(f"  {label}", rate, baseline)
+    print(f"  {'':<45} {rate * size / 1e6:>14,.1f} MB/sec")
+    return rate
+
+
+def main():
+    # No digits at all, so the pre-check has to scan the whole body to rule it out.
+    clean = "".join(c for c in json.dumps(_records(200, with_pii=False)) if not c.isdigit())
+    dirty = json.dumps(_records(200, with_pii=True))
+    values = [v for record in _records(200, with_pii=True) for v in record.values()]
+    entities = tuple(PATTERN_ENTITIES)
+    print(f"PII detection throughput ({len(dirty) // 1024} KB body, entities: {', '.join(PATTERN_ENTITIES)})")
+
+    analyzer = _load_analyzer()
+    ner = None
+    if analyzer is not None:
+        ner = _bench("NER analyzer (previous path, all entities)",
+                     lambda: analyzer.analyze(text=dirty, entities=PATTERN_ENTITIES, language="en"), len(dirty), 20)
+    _bench("tier 0: candidate pre-check, clean body", lambda: has_candidates(clean, entities), len(clean), 2_000, ner)
+    _bench("tier 1: pattern recognizers, text body", lambda: _redact_text(dirty, list(entities)), len(dirty), 200, ner)
+    _bench("tier 1: pattern recognizers, JSON fields", lambda: _redact_fields(values, list(entities)), len(dirty), 200, ner)
+    if analyzer is not None:
+        _bench("tier 2: patterns + NER for PERSON",
+               lambda: _redact_text(dirty, list(entities) + ["PERSON"]), len(dirty), 20, ner)
+    else:
+        print("  (presidio-analyzer / spaCy model not installed: NER tier skipped)")
+    print(f"  pattern-backed entities: {', '.join(PATTERN_RECOGNIZERS)}")
+
+
+if __name__ == "__main__":
+    main()
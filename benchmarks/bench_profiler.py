@@ -0,0 +1,118 @@
+# benchmarks/bench_profiler.py
+"""
+Client profiling latency: one Redis script call versus the previous
+HGET + pipeline + pipeline + LRANGE sequence with entropy recomputed in Python.
+
+Run from the repository root:
+    REDIS_URL=redis://localhost:6379/0 python -m benchmarks.bench_profiler
+Without REDIS_URL only the entropy computation itself is compared.
+"""
+import asyncio
+import json
+import math
+import os
+import random
+import time
+from types import SimpleNamespace
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("API_CLIENTS_JSON", json.dumps([]))
+os.environ.setdefault("AEGIS_CONFIG_PATH", "AegisApp/config.yaml")
+
+from aegis_toolkit import cache  # noqa: E402
+from aegis_toolkit.config import Settings  # noqa: E402
+from aegis_toolkit.profiler import PATH_HISTORY_SIZE, _shannon_entropy, path_segment, profile_and_analyze  # noqa: E402
+
+from ._common import measure, report  # noqa: E402
+
+ITERATIONS = 5_000
+CLIENTS = 200
+SEGMENTS = ["users", "orders", "products", "search", "cart", "health"]
+
+
+async def legacy_profile(redis_client, client_id: str, ctx):
+    """The pre-script implementation: four round trips and a full entropy recompute."""
+    profile_key = f"legacy:profile:{client_id}"
+    path_history_key = f"legacy:profile:paths:{client_id}"
+    fingerprint = ctx.headers.get("user-agent", "") + ctx.headers.get("accept-language", "")
+    if await redis_client.hget(profile_key, "fingerprint") is None:
+        pipe = redis_client.pipeline()
+        pipe.hset(profile_key, "fingerprint", fingerprint)
+        pipe.expire(profile_key, 3600)
+        await pipe.execute()
+        return
+    pipe = redis_client.pipeline()
+    pipe.lpush(path_history_key, path_segment(ctx.path))
+    pipe.ltrim(path_history_key, 0, PATH_HISTORY_SIZE - 1)
+    pipe.expire(path_history_key, 3600)
+    await pipe.execute()
+    _shannon_entropy(await redis_client.lrange(path_history_key, 0, -1))
+
+
+def _requests():
+    rng = random.Random(7)
+    headers = {"user-agent": "bench/1.0", "accept-language": "en"}
+    return [
+        (f"c{rng.randrange(CLIENTS)}", SimpleNamespace(path=f"/{rng.choice(SEGMENTS)}/{i}", headers=headers))
+        for i in range(ITERATIONS)
+    ]
+
+
+async def _latencies(call, requests):
+    samples = []
+    for client_id, ctx in requests:
+        start = time.perf_counter()
+        await call(client_id, ctx)
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2], samples[int(len(samples) * 0.99)]
+
+
+async def bench_redis():
+    redis_client = cache.redis_client
+    requests = _requests()
+    # No entropy limit, so the profiler never raises mid-run.
+    settings = SimpleNamespace(behavioral_analysis=SimpleNamespace(enforce=True, enforce_header_consistency=True, max_path_entropy=float("inf")))
+    await _latencies(lambda c, ctx: profile_and_analyze(c, ctx, settings), requests[:200])  # load the script
+
+    print(f"Client profiling latency, sequential ({ITERATIONS} requests, {CLIENTS} clients)")
+    legacy = await _latencies(lambda c, ctx: legacy_profile(redis_client, c, ctx), requests)
+    script = await _latencies(lambda c, ctx: profile_and_analyze(c, ctx, settings), requests)
+    print(f"  {'4 round trips + Python entropy':<40} p50 {legacy[0]:.3f}ms  p99 {legacy[1]:.3f}ms")
+    print(f"  {'single Lua script':<40} p50 {script[0]:.3f}ms  p99 {script[1]:.3f}ms"
+          f"   ({legacy[0] / script[0]:.2f}x at p50)")
+
+
+def bench_entropy():
+    history = [SEGMENTS[i % len(SEGMENTS)] for i in range(PATH_HISTORY_SIZE)]
+    counts = {s: history.count(s) for s in set(history)}
+    state = {"s": sum(c * math.log(c) for c in counts.values())}
+
+    def clogc(c):
+        return c * math.log(c) if c > 1 else 0.0
+
+    def incremental():
+        # Push one segment and evict another, as the script does.
+        added, evicted = SEGMENTS[0], SEGMENTS[1]
+        state["s"] += clogc(counts[added] + 1) - clogc(counts[added]) + clogc(counts[evicted] - 1) - clogc(counts[evicted])
+        n = PATH_HISTORY_SIZE
+        return (math.log(n) - state["s"] / n) / math.log(2)
+
+    print(f"Entropy update ({PATH_HISTORY_SIZE}-entry history)")
+    full = measure(lambda: _shannon_entropy(history), 200_000)
+    report("  full recompute", full)
+    report("  incremental sum of c*ln(c)", measure(incremental, 200_000), full)
+
+
+def main():
+    bench_entropy()
+    settings = Settings()
+    if settings.redis_url:
+        cache.initialize_cache(settings)
+        asyncio.run(bench_redis())
+    else:
+        print("(set REDIS_URL to compare Redis round-trip latency)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+# benchmarks/bench_rate_limit.py
+"""
+Rate limiter decisions per second.
+
+Run from the repository root:
+    python -m benchmarks.bench_rate_limit
+Set REDIS_URL to also measure the Redis GCRA script (one round trip per decision).
+"""
+import asyncio
+import json
+import os
+import time
+
+os.environ.setdefault("JWT_SECRET_KEY", "benchmark-secret")
+os.environ.setdefault("API_CLIENTS_JSON", json.dumps([]))
+os.environ.setdefault("AEGIS_CONFIG_PATH", "AegisApp/config.yaml")
+
+from aegis_toolkit import cache  # noqa: E402
+from aegis_toolkit.config import Settings  # noqa: E402
+from aegis_toolkit.rate_limiter import RateLimiter, parse_rate  # noqa: E402
+
+from ._common import measure, report  # noqa: E402
+
+ITERATIONS = 50_000
+CLIENTS = 1_000
+
+
+def bench_local(limiter: RateLimiter):
+    quota = parse_rate("100/second")
+    keys = [f"client:c{i}" for i in range(CLIENTS)]
+    counter = iter(range(10 ** 9))
+    rate = measure(lambda: limiter.local.take(keys[next(counter) % CLIENTS], quota), ITERATIONS)
+    report("  in-process token bucket", rate)
+    return rate
+
+
+async def bench_redis(limiter: RateLimiter, baseline: float, concurrency: int = 50):
+    quota = parse_rate("100/second")
+    decisions = ITERATIONS // 10
+
+    async def worker(offset: int):
+        for i in range(decisions // concurrency):
+            await limiter.check(f"client:c{(offset + i) % CLIENTS}", quota)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker(n) for n in range(concurrency)))
+    rate = decisions / (time.perf_counter() - start)
+    report(f"  Redis GCRA script ({concurrency} concurrent)", rate, baseline)
+
+
+def main():
+    settings = Settings()
+    limiter = RateLimiter(settings)
+    print(f"Rate limit decisions ({CLIENTS} clients)")
+    baseline = bench_local(limiter)
+    if settings.redis_url:
+        cache.initialize_cache(settings)
+        asyncio.run(bench_redis(limiter, baseline))
+    else:
+        print("  (set REDIS_URL to benchmark the Redis GCRA script)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,134 @@
+# benchmarks/bench_waf.py
+"""
+WAF hot-path micro-benchmarks.
+
+Run from the repository root:
+    python -m benchmarks.bench_waf
+"""
+import json
+import re
+from fnmatch import fnmatch
+
+from aegis_toolkit.config import WAFRule
+from aegis_toolkit.graphql_analysis import GraphQLAnalysisCache, analyze_document
+from aegis_toolkit.request_schemas import CreateUserRequest
+from aegis_toolkit.rule_index import RuleIndex
+from aegis_toolkit.signatures import SignatureEngine
+from aegis_toolkit.spec_validation import SpecValidatorRegistry
+from aegis_toolkit.waf_rules import ALL_PATTERNS, SIGNATURE_CATEGORIES
+
+from ._common import measure, report
+
+ITERATIONS = 20_000
+
+BENIGN_QUERY = "page=2&sort=created_at&filter=status%3Aactive&q=wireless+headphones"
+BENIGN_BODY = json.dumps({
+    "username": "jane_doe",
+    "email": "jane@example.com",
+    "full_name": "Jane Doe",
+    "preferences": {"theme": "dark", "notifications": True, "tags": ["a", "b", "c"] * 20},
+    "bio": "Coffee enthusiast, hiker and amateur photographer. " * 10,
+}).lower()
+
+
+def _legacy_scan(text: str):
+    """The pre-engine implementation: one re.search per pattern."""
+    for pattern in ALL_PATTERNS:
+        if re.search(pattern, text):
+            return pattern
+    return None
+
+
+def bench_signatures():
+    engine = SignatureEngine(SIGNATURE_CATEGORIES)
+    print(f"Signature scan ({len(ALL_PATTERNS)} signatures)")
+    for label, text in (("query string", BENIGN_QUERY), (f"json body ({len(BENIGN_BODY)} chars)", BENIGN_BODY)):
+        legacy = measure(lambda: _legacy_scan(text), ITERATIONS)
+        compiled = measure(lambda: engine.scan(text), ITERATIONS)
+        report(f"  legacy loop, {label}", legacy)
+        report(f"  compiled engine, {label}", compiled, legacy)
+
+
+def _synthetic_rules(count: int):
+    """Per-endpoint rules spread over many services, plus a few globbed catch-alls."""
+    rules = []
+    for i in range(count):
+        service = f"svc{i % 25}"
+        if i % 3 == 0:
+            path_pattern = f"/api/v1/{service}/resource{i}"
+        elif i % 3 == 1:
+            path_pattern = f"/api/v1/{service}/resource{i}/*"
+        else:
+            path_pattern = f"/api/v2/{service}/*/item{i}"
+        rules.append(WAFRule(name=f"rule{i}", path_pattern=path_pattern, methods=["POST"] if i % 2 else ["*"], action="block"))
+    rules.append(WAFRule(name="global_admin", path_pattern="*/admin/*", action="log"))
+    return rules
+
+
+def _legacy_lookup(rules, path: str, method: str):
+    """The pre-index implementation: fnmatch against every rule on every request."""
+    return [r for r in rules if fnmatch(path, r.path_pattern) and ("*" in r.methods or method in r.methods)]
+
+
+def bench_rule_lookup():
+    for count in (10, 100, 1000):
+        rules = _synthetic_rules(count)
+        index = RuleIndex(rules)
+        requests = [("/api/v1/svc3/resource28/details", "POST"), ("/api/v2/svc7/x/item32", "GET"), ("/static/app.js", "GET")]
+        # tests/test_rule_index.py checks the index returns the same rules as the legacy loop.
+
+        iterations = max(200, 200_000 // count)
+        legacy = measure(lambda: [_legacy_lookup(rules, p, m) for p, m in requests], iterations)
+        indexed = measure(lambda: [index.match(p, m) for p, m in requests], iterations)
+        print(f"Rule lookup ({count + 1} rules, {len(requests)} requests per op)")
+        report("  legacy fnmatch loop", legacy)
+        report("  rule index", indexed, legacy)
+
+
+MOBILE_QUERY = """
+query ProductPage($id: ID!, $reviews: Int = 5) {
+  product(id: $id) {
+    id name price { amount currency }
+    images(first: 8) { url width height }
+    reviews(first: $reviews) { edges { node { rating title author { name avatar } } } }
+    ...Availability
+  }
+}
+fragment Availability on Product { stock { warehouse quantity } shipping { carrier days } }
+"""
+
+
+def bench_graphql_analysis():
+    cache = GraphQLAnalysisCache()
+    variables = {"id": "p-1", "reviews": 5}
+    print("GraphQL analysis (mobile product query)")
+    parsed = measure(lambda: analyze_document(MOBILE_QUERY, variables), ITERATIONS // 4)
+    cached = measure(lambda: cache.analyze(MOBILE_QUERY, variables), ITERATIONS)
+    report("  parse + analyze every request", parsed)
+    report("  cached by query hash", cached, parsed)
+
+
+USER_SPEC = {
+    "paths": {"/api/v1/users": {"post": {"requestBody": {"required": True, "content": {"application/json": {
+        "schema": {"$ref": "#/components/schemas/CreateUserRequest"}}}}}}},
+    "components": {"schemas": {"CreateUserRequest": CreateUserRequest.model_json_schema()}},
+}
+USER_BODY = json.dumps({"username": "jane_doe", "email": "jane@example.com", "full_name": "Jane Doe"}).encode()
+
+
+def bench_body_validation():
+    registry = SpecValidatorRegistry()
+    registry.load(USER_SPEC)
+    validator = registry.lookup("POST", "/api/v1/users")
+    print("Request body validation (CreateUserRequest)")
+    legacy = measure(lambda: CreateUserRequest.model_validate(json.loads(USER_BODY.decode())), ITERATIONS)
+    spec = measure(lambda: validator.validate(USER_BODY), ITERATIONS)
+    report("  json.loads + model_validate", legacy)
+    report("  spec TypeAdapter.validate_json(bytes)", spec, legacy)
+
+
+if __name__ == "__main__":
+    bench_signatures()
+    bench_rule_lookup()
+    bench_graphql_analysis()
+    bench_body_validation()
@@ -0,0 +1,120 @@
+# tests/test_blocklist.py
+"""
+IP blocklist feeds: parsing, the compiled file built by the command-line tool
+and looked up through mmap, and reloads.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+
+from aegis_toolkit import blocklist
+from aegis_toolkit.blocklist import IPBlocklist, compile_ranges, parse_feed_entry, read_feeds
+from aegis_toolkit.config import IPBlocklistConfig
+
+REPO_ROOT = Path(__file__).resolve().parent.parent
+
+FEED = """\
+# Example feed: comments, blank lines and trailing annotations are ignored
+198.51.100.0/24   ; abuse reports
+198.51.100.128/25
+203.0.113.10
+203.0.113.11      # adjacent, merges with .10
+192.0.2.100-192.0.2.110
+2001:db8:bad::/48
+::ffff:100.64.0.1
+
+not-an-address
+10.0.0.0/33
+192.0.2.9-192.0.2.1
+2001:db8::1-10.0.0.1
+"""
+
+BLOCKED = ["198.51.100.0", "198.51.100.255", "203.0.113.10", "203.0.113.11", "192.0.2.100", "192.0.2.110",
+           "2001:db8:bad::1", "2001:db8:bad:ffff:ffff:ffff:ffff:ffff", "100.64.0.1", "::ffff:198.51.100.7"]
+ALLOWED = ["198.51.99.255", "198.51.101.0", "203.0.113.12", "192.0.2.99", "192.0.2.111",
+           "2001:db8:bae::", "2001:db8:bac:ffff:ffff:ffff:ffff:ffff", "10.0.0.1", "garbage", ""]
+
+
+@pytest.fixture
+def feed(tmp_path):
+    path = tmp_path / "feed.txt"
+    path.write_text(FEED)
+    return path
+
+
+@pytest.mark.parametrize("token, expected", [
+    ("10.1.2.3", (4, 0x0A010203, 0x0A010203)),
+    ("10.1.2.3/24", (4, 0x0A010200, 0x0A0102FF)),
+    ("10.0.0.1-10.0.0.5", (4, 0x0A000001, 0x0A000005)),
+    ("::ffff:10.0.0.1", (4, 0x0A000001, 0x0A000001)),
+    ("::/0", (6, 0, (1 << 128) - 1)),
+    ("10.0.0.0/x", None),
+    ("10.0.0.0/33", None),
+    ("10.0.0.5-10.0.0.1", None),
+    ("10.0.0.1-::1", None),
+    ("example.com", None),
+])
+def test_parse_feed_entry(token, expected):
+    assert parse_feed_entry(token) == expected
+
+
+def test_unparseable_feed_lines_are_skipped_and_counted(feed):
+    v4, v6, invalid = read_feeds([str(feed)])
+    assert invalid == 4
+    assert len(v4) == 6 and len(v6) == 1
+
+
+def test_in_memory_blocklist_from_feeds(feed):
+    index, invalid = IPBlocklist.from_feeds([str(feed)])
+    assert invalid == 4
+    assert len(index) == 5  # the /25 and .10/.11 entries merge
+    assert not index.mapped
+    assert [ip for ip in BLOCKED if ip not in index] == []
+    assert [ip for ip in ALLOWED if ip in index] == []
+
+
+def test_command_line_build_then_mmap_lookup(feed, tmp_path):
+    compiled = tmp_path / "blocklist.bin"
+    result = subprocess.run(
+        [sys.executable, "-m", "aegis_toolkit.blocklist", str(compiled), str(feed)],
+        cwd=REPO_ROOT, capture_output=True, text=True, check=True,
+    )
+    assert "(4 skipped)" in result.stdout
+    assert not list(tmp_path.glob("*.tmp.*"))
+
+    index = IPBlocklist.open(str(compiled))
+    assert index.mapped and index.nbytes == compiled.stat().st_size
+    assert [ip for ip in BLOCKED if ip not in index] == []
+    assert [ip for ip in ALLOWED if ip in index] == []
+
+
+def test_rejects_files_that_are_not_compiled_blocklists(tmp_path):
+    with pytest.raises(ValueError, match="not a compiled"):
+        IPBlocklist(b"\0" * 64)
+    data = compile_ranges([(1, 2), (10, 20)], [])
+    with pytest.raises(ValueError, match="truncated"):
+        IPBlocklist(data[:-2])
+
+
+def test_refresh_reloads_only_when_the_compiled_file_changes(feed, tmp_path, monkeypatch):
+    compiled = tmp_path / "blocklist.bin"
+    blocklist.write_compiled(str(compiled), compile_ranges(*read_feeds([str(feed)])[:2]))
+    monkeypatch.setattr(blocklist, "BLOCKLIST_CONFIG", blocklist.BLOCKLIST_CONFIG)
+    monkeypatch.setattr(blocklist, "BLOCKLIST", None)
+    monkeypatch.setattr(blocklist, "_loaded_mtimes", {})
+    blocklist.initialize_blocklist(SimpleNamespace(ip_blocklist=IPBlocklistConfig(enabled=True, compiled_path=str(compiled))))
+    assert blocklist.is_blocklisted("203.0.113.10")
+    assert not blocklist.refresh_blocklist()
+
+    blocklist.write_compiled(str(compiled), compile_ranges([(0x0A000000, 0x0AFFFFFF)], []))
+    os.utime(compiled, (1, 1))  # A different mtime, whatever the filesystem's resolution
+    assert blocklist.refresh_blocklist()
+    assert blocklist.is_blocklisted("10.1.1.1")
+    assert not blocklist.is_blocklisted("203.0.113.10")
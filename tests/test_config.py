@@ -0,0 +1,112 @@
+# tests/test_config.py
+"""
+Config snapshots: immutability and hot reloads that fail part-way.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import pytest
+import yaml
+from pydantic import ValidationError
+
+from aegis_toolkit.config import Settings, WAFRule
+
+BASE_CONFIG = {
+    "backend_target_url": "http://backend.test",
+    "rate_limit": "100/minute",
+    "api_discovery": {"openapi_spec_url": "", "on_shadow_api_discovered": "log"},
+    "behavioral_analysis": {"enforce_header_consistency": True, "max_path_entropy": 3.5},
+    "adaptive_security_model": {"path": "model.onnx", "high_risk_threshold": 0.8},
+    "log_shipping": {"enabled": False, "endpoint": "", "auth_token": ""},
+    "waf_rules": [{"name": "admin", "path_pattern": "/admin/*", "methods": ["GET"], "action": "block"}],
+}
+
+
+@pytest.fixture
+def config_file(tmp_path):
+    path = tmp_path / "config.yaml"
+    path.write_text(yaml.safe_dump(BASE_CONFIG))
+    return path
+
+
+@pytest.fixture
+def settings(config_file):
+    return Settings(JWT_SECRET_KEY="test-secret", API_CLIENTS_JSON="[]", AEGIS_CONFIG_PATH=str(config_file))
+
+
+def _write(path, **changes):
+    path.write_text(yaml.safe_dump({**BASE_CONFIG, **changes}))
+
+
+def test_snapshot_and_its_sections_are_immutable(settings):
+    snapshot = settings.snapshot
+    rule = snapshot.waf_rules[0]
+    assert rule.methods == ("GET",)
+    with pytest.raises(ValidationError):
+        snapshot.rate_limit = "1/second"
+    with pytest.raises(ValidationError):
+        rule.action = "log"
+    with pytest.raises(ValidationError):
+        snapshot.rate_limiting.exempt_path_prefixes = ()
+    with pytest.raises(AttributeError):
+        rule.methods.append("POST")
+    assert WAFRule(name="r", path_pattern="/x", methods=["GET", "POST"], action="log").methods == ("GET", "POST")
+
+
+def test_reload_swaps_snapshot_and_runs_listeners(settings, config_file):
+    seen = []
+    settings.add_reload_listener(lambda s: seen.append(s.snapshot.rate_limit))
+    assert settings.snapshot.version == 1
+    _write(config_file, rate_limit="5/second")
+    assert settings.reload().version == 2
+    assert settings.snapshot.rate_limit == "5/second"
+    assert seen == ["5/second"]
+
+
+def test_invalid_file_keeps_the_current_snapshot(settings, config_file):
+    current = settings.snapshot
+    config_file.write_text("waf_rules: [unterminated")
+    with pytest.raises(yaml.YAMLError):
+        settings.reload()
+    _write(config_file, waf_rules=[{"name": "no-action", "path_pattern": "/x"}])
+    with pytest.raises(ValidationError):
+        settings.reload()
+    assert settings.snapshot is current
+
+
+def test_failed_listener_rolls_earlier_listeners_back_to_the_previous_snapshot(settings, config_file):
+    derived = {}
+    calls = []
+
+    def compile_quota(s):
+        calls.append(("quota", s.snapshot.version))
+        derived["quota"] = s.snapshot.rate_limit
+
+    def compile_rules(s):
+        calls.append(("rules", s.snapshot.version))
+        if any(rule.action not in ("block", "log") for rule in s.waf_rules):
+            raise ValueError("unknown rule action")
+        derived["rules"] = [rule.name for rule in s.waf_rules]
+
+    def never_reached(s):
+        calls.append(("later", s.snapshot.version))
+
+    for listener in (compile_quota, compile_rules, never_reached):
+        settings.add_reload_listener(listener)
+        listener(settings)
+    calls.clear()
+    previous = settings.snapshot
+
+    _write(config_file, rate_limit="1/second", waf_rules=[{"name": "bad", "path_pattern": "/x", "action": "explode"}])
+    with pytest.raises(ValueError, match="unknown rule action"):
+        settings.reload()
+
+    assert settings.snapshot is previous
+    # Both listeners that saw the rejected snapshot ran again on the previous one; the later one never ran.
+    assert calls == [("quota", 2), ("rules", 2), ("quota", 1), ("rules", 1)]
+    assert derived == {"quota": "100/minute", "rules": ["admin"]}
+
+    # The next good reload applies normally.
+    _write(config_file, rate_limit="10/second")
+    assert settings.reload().rate_limit == "10/second"
+    assert derived["quota"] == "10/second"
@@ -0,0 +1,104 @@
+# tests/test_endpoint_router.py
+"""
+Mapping concrete request paths to OpenAPI path templates, and what happens to
+paths the spec does not know.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from aegis_toolkit import cartographer
+from aegis_toolkit.config import ApiDiscoveryConfig
+from aegis_toolkit.endpoint_router import EndpointRouter
+from aegis_toolkit.heavy_hitters import SpaceSaving
+
+OPERATIONS = [
+    ("GET", "/users"),
+    ("POST", "/users"),
+    ("GET", "/users/{user_id}"),
+    ("GET", "/users/me"),
+    ("DELETE", "/users/{user_id}"),
+    ("GET", "/users/{user_id}/orders/{order_id}"),
+    ("GET", "/users/me/orders/latest"),
+    ("GET", "/reports/{name}.json"),
+    ("GET", "/reports/{name}"),
+    ("GET", "/files/{file_id}/v{version}"),
+    ("GET", "/"),
+]
+
+
+@pytest.fixture
+def router():
+    return EndpointRouter(OPERATIONS)
+
+
+def _template(router, method, path):
+    match = router.match(method, path)
+    return match.template if match else None
+
+
+def test_counts_operations_once(router):
+    router.add("get", "/users")
+    assert len(router) == len(OPERATIONS)
+
+
+def test_literal_segment_wins_over_parameter(router):
+    assert _template(router, "GET", "/users/me") == "/users/me"
+    assert _template(router, "GET", "/users/42") == "/users/{user_id}"
+    # No DELETE /users/me: falls back to the templated route.
+    match = router.match("DELETE", "/users/me")
+    assert match.template == "/users/{user_id}" and match.params == {"user_id": "me"}
+
+
+def test_backtracks_when_the_literal_branch_dead_ends(router):
+    assert _template(router, "GET", "/users/me/orders/latest") == "/users/me/orders/latest"
+    match = router.match("GET", "/users/me/orders/7")
+    assert match.template == "/users/{user_id}/orders/{order_id}"
+    assert match.params == {"user_id": "me", "order_id": "7"}
+
+
+def test_partial_templates_win_over_whole_segment_parameters(router):
+    match = router.match("GET", "/reports/q3.json")
+    assert match.template == "/reports/{name}.json" and match.params == {"name": "q3"}
+    assert router.match("GET", "/reports/q3.csv").params == {"name": "q3.csv"}
+    match = router.match("GET", "/files/abc/v2")
+    assert match.template == "/files/{file_id}/v{version}" and match.params == {"file_id": "abc", "version": "2"}
+
+
+def test_trailing_slashes_and_empty_segments_do_not_match(router):
+    assert _template(router, "GET", "/") == "/"
+    assert _template(router, "GET", "/users") == "/users"
+    assert router.match("GET", "/users/") is None  # not /users, and not /users/{user_id} with an empty id
+    assert router.match("GET", "/users/42/") is None
+    assert router.match("GET", "/users//orders/1") is None
+
+
+def test_method_is_case_insensitive_and_must_exist(router):
+    assert router.match("get", "/users/42").signature == "GET /users/{user_id}"
+    assert router.match("PUT", "/users/42") is None
+
+
+def test_unknown_paths_are_reported_as_shadow_apis(monkeypatch):
+    monkeypatch.setattr(cartographer, "SHADOW_ENDPOINTS", SpaceSaving(100))
+    monkeypatch.setattr(cartographer, "SPEC_VALIDATORS", cartographer.SpecValidatorRegistry())
+    cartographer.load_api_spec({"paths": {"/users/{user_id}": {"get": {}}, "/users": {"post": {}}}})
+    settings = SimpleNamespace(api_discovery=ApiDiscoveryConfig(openapi_spec_url="", on_shadow_api_discovered="block"))
+
+    for method, path in (("GET", "/users/1"), ("POST", "/users")):
+        endpoint = cartographer.match_endpoint(method, path)
+        assert endpoint is not None
+        cartographer.check_for_shadow_api(method, path, endpoint, settings)
+
+    for path in ("/internal/debug/1", "/internal/debug/2", "/users/"):
+        with pytest.raises(HTTPException) as blocked:
+            cartographer.check_for_shadow_api("GET", path, cartographer.match_endpoint("GET", path), settings)
+        assert blocked.value.status_code == 501
+    assert cartographer.SHADOW_ENDPOINTS.top(5) == [("GET /internal/debug/{int}", 2, 0), ("GET /users/", 1, 0)]
+
+    settings = SimpleNamespace(api_discovery=ApiDiscoveryConfig(openapi_spec_url="", on_shadow_api_discovered="log"))
+    cartographer.check_for_shadow_api("DELETE", "/users/1", cartographer.match_endpoint("DELETE", "/users/1"), settings)
+    assert "DELETE /users/{int}" in cartographer.SHADOW_ENDPOINTS
@@ -0,0 +1,126 @@
+# tests/test_graphql_analysis.py
+"""
+GraphQL depth and cost analysis: the tokenizer and parser, fragment handling,
+variable-driven page sizes and the APQ-keyed analysis cache.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import hashlib
+
+import pytest
+
+from aegis_toolkit.graphql_analysis import (
+    MAX_MULTIPLIER,
+    GraphQLAnalysis,
+    GraphQLAnalysisCache,
+    GraphQLSyntaxError,
+    PersistedQueryNotFound,
+    _tokenize,
+    analyze_document,
+    extract_graphql_operations,
+)
+
+PAGED_QUERY = "query Users($n: Int = 5, $tag: String) { users(first: $n, tag: $tag) { id name } }"
+
+
+def _sha256(text: str) -> str:
+    return hashlib.sha256(text.encode()).hexdigest()
+
+
+def test_tokenizer_skips_ignored_tokens_and_keeps_strings_whole():
+    tokens = _tokenize('query Q($id: ID!) { # comment, with { braces }\n  user(id: "a } b", n: -1.5e3) { ...F } }')
+    assert ("name", "query") == tokens[0]
+    assert ("string", '"a } b"') in tokens
+    assert ("number", "-1.5e3") in tokens
+    assert ("spread", "...") in tokens
+    assert not any("comment" in value for _, value in tokens)
+    assert tokens[-1] == ("eof", "")
+
+
+def test_tokenizer_handles_block_strings_and_bom():
+    tokens = _tokenize('\ufeff{ f(text: """multi\n"line" \\""" end""") }')
+    assert ("block_string", '"""multi\n"line" \\""" end"""') in tokens
+
+
+def test_tokenizer_rejects_unknown_characters():
+    with pytest.raises(GraphQLSyntaxError):
+        _tokenize("{ user % }")
+
+
+def test_depth_field_count_and_cost():
+    assert analyze_document("{ users(first: 10) { id name } }") == GraphQLAnalysis(depth=2, field_count=3, cost=21)
+    # The worst operation of the document counts.
+    assert analyze_document("query A { a } query B { b { c { d } } }") == GraphQLAnalysis(depth=3, field_count=3, cost=3)
+
+
+@pytest.mark.parametrize("query", [
+    "{ user { ...A } } fragment A on User { ...B } fragment B on User { ...A }",
+    "{ user { ...Self } } fragment Self on User { id ...Self }",
+])
+def test_fragment_cycles_are_rejected(query):
+    with pytest.raises(GraphQLSyntaxError, match="cycle"):
+        analyze_document(query)
+
+
+def test_unknown_fragment_is_rejected():
+    with pytest.raises(GraphQLSyntaxError, match="Unknown fragment"):
+        analyze_document("{ user { ...Missing } }")
+
+
+def test_shared_fragments_are_expanded_at_every_spread():
+    query = "{ a { ...F } b { ...F } } fragment F on T { x y }"
+    assert analyze_document(query) == GraphQLAnalysis(depth=2, field_count=6, cost=6)
+
+
+def test_variables_drive_list_sizes():
+    assert analyze_document(PAGED_QUERY).cost == 1 + 5 * 2  # the default
+    assert analyze_document(PAGED_QUERY, {"n": 100}).cost == 1 + 100 * 2
+    assert analyze_document(PAGED_QUERY, {"n": "100"}).cost == 1 + 2  # not a number: counted once
+    assert analyze_document(PAGED_QUERY, {"n": 10 ** 30}).cost == 1 + MAX_MULTIPLIER * 2
+    with pytest.raises(GraphQLSyntaxError):
+        analyze_document("{ users(first: 1e400) { id } }")
+
+
+def test_cache_hits_are_keyed_by_query_hash_and_page_size_variables():
+    cache = GraphQLAnalysisCache()
+    first = cache.analyze(PAGED_QUERY, {"n": 10, "tag": "a"})
+    # Variables that do not size a list do not split the cache.
+    assert cache.analyze(PAGED_QUERY, {"n": 10, "tag": "b"}) == first
+    assert (cache.hits, cache.misses) == (1, 1)
+
+    assert cache.analyze(PAGED_QUERY, {"n": 20}).cost == 1 + 20 * 2
+    assert (cache.hits, cache.misses) == (1, 2)
+
+    # A hash-only APQ request resolves to the document registered by the full query.
+    assert cache.analyze(None, {"n": 10}, persisted_hash=_sha256(PAGED_QUERY).upper()) == first
+    assert (cache.hits, cache.misses) == (2, 2)
+
+
+def test_unknown_persisted_query_hash_fails_closed():
+    cache = GraphQLAnalysisCache()
+    with pytest.raises(PersistedQueryNotFound):
+        cache.analyze(None, {}, persisted_hash=_sha256("{ never { sent } }"))
+    assert cache.analyze(None, {}) is None
+
+    with pytest.raises(GraphQLSyntaxError, match="does not match"):
+        cache.analyze("{ a }", {}, persisted_hash=_sha256("{ b }"))
+
+
+def test_evicted_documents_must_be_sent_again():
+    cache = GraphQLAnalysisCache(maxsize=2)
+    queries = ["{ a }", "{ b }", "{ c }"]
+    for query in queries:
+        cache.analyze(query)
+    with pytest.raises(PersistedQueryNotFound):
+        cache.analyze(None, persisted_hash=_sha256(queries[0]))
+    assert cache.analyze(None, persisted_hash=_sha256(queries[2])).depth == 1
+
+
+def test_extract_operations_from_single_and_batched_bodies():
+    apq = {"extensions": {"persistedQuery": {"version": 1, "sha256Hash": "abc"}}}
+    assert extract_graphql_operations({"query": "{ a }", "variables": {"n": 1}}) == [("{ a }", {"n": 1}, None)]
+    assert extract_graphql_operations([{"query": "{ a }"}, apq, {"query": 5}, "junk"]) == [
+        ("{ a }", {}, None),
+        (None, {}, "abc"),
+    ]
@@ -0,0 +1,93 @@
+# tests/test_heavy_hitters.py
+"""
+SpaceSaving top-k guarantees, checked against exact counts.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import random
+from collections import Counter
+
+import pytest
+
+from aegis_toolkit.heavy_hitters import SpaceSaving
+
+
+def _zipf_stream(length: int, universe: int, seed: int):
+    rng = random.Random(seed)
+    weights = [1 / rank for rank in range(1, universe + 1)]
+    return rng.choices([f"client-{i}" for i in range(universe)], weights=weights, k=length)
+
+
+def _reference_counts(stream, capacity: int):
+    """Textbook Space-Saving with a linear scan for the minimum."""
+    counts, errors = {}, {}
+    for key in stream:
+        if key in counts:
+            counts[key] += 1
+        elif len(counts) < capacity:
+            counts[key], errors[key] = 1, 0
+        else:
+            floor = min(counts.values())
+            evicted = next(k for k, c in counts.items() if c == floor)
+            del counts[evicted], errors[evicted]
+            counts[key], errors[key] = floor + 1, floor
+    return counts
+
+
+@pytest.mark.parametrize("capacity, seed", [(10, 1), (50, 2), (200, 3)])
+def test_frequent_keys_are_kept_and_counts_are_bounded(capacity, seed):
+    stream = _zipf_stream(20_000, universe=2000, seed=seed)
+    exact = Counter(stream)
+    summary = SpaceSaving(capacity)
+    for key in stream:
+        summary.add(key)
+
+    assert summary.total == len(stream)
+    assert len(summary) == capacity
+    threshold = len(stream) / capacity
+    heavy = [key for key, count in exact.items() if count > threshold]
+    assert heavy
+    assert all(key in summary for key in heavy)
+
+    for key, count, error in summary.top(capacity):
+        assert exact[key] <= count <= exact[key] + error
+        assert error <= threshold
+
+
+def test_top_is_ranked_by_count():
+    summary = SpaceSaving(5)
+    for key, times in {"a": 7, "b": 3, "c": 5}.items():
+        for _ in range(times):
+            summary.add(key)
+    assert summary.top(2) == [("a", 7, 0), ("c", 5, 0)]
+
+
+def test_add_reports_new_keys_and_inherited_counts():
+    summary = SpaceSaving(2)
+    assert summary.add("a") == (1, True)
+    assert summary.add("a") == (2, False)
+    assert summary.add("b") == (1, True)
+    # Full: "c" replaces the lowest key ("b") and inherits its count as the error bound.
+    assert summary.add("c") == (2, True)
+    assert "b" not in summary
+    assert summary.top(2) == [("a", 2, 0), ("c", 2, 1)]
+
+
+def test_counts_match_a_linear_scan_implementation():
+    stream = _zipf_stream(5000, universe=300, seed=9)
+    summary = SpaceSaving(25)
+    for key in stream:
+        summary.add(key)
+    reference = _reference_counts(stream, 25)
+    # Ties may evict different keys, but the multiset of counts is the same.
+    assert sorted(count for _, count, _ in summary.top(25)) == sorted(reference.values())
+
+
+def test_clear_resets_everything():
+    summary = SpaceSaving(3)
+    for key in "abcabcd":
+        summary.add(key)
+    summary.clear()
+    assert len(summary) == 0 and summary.total == 0
+    assert summary.add("z") == (1, True)
@@ -0,0 +1,91 @@
+# tests/test_hyperloglog.py
+"""
+Distinct-path sketches used by the path enumeration detector.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import math
+import random
+
+import pytest
+
+from aegis_toolkit.anomaly_detector import PATH_SKETCH_PRECISION, PATH_SLOT_SECONDS, WINDOW_SECONDS, normalize_path
+from aegis_toolkit.hyperloglog import WindowedHyperLogLog, _position, estimate
+
+SLOTS = WINDOW_SECONDS // PATH_SLOT_SECONDS
+# Three standard errors of a HyperLogLog with 2**PATH_SKETCH_PRECISION registers (~9% each).
+ERROR_BOUND = 3 * 1.04 / math.sqrt(1 << PATH_SKETCH_PRECISION)
+
+
+def _sketch() -> WindowedHyperLogLog:
+    return WindowedHyperLogLog(SLOTS, PATH_SLOT_SECONDS, PATH_SKETCH_PRECISION)
+
+
+def _requests(endpoints: int, ids_per_endpoint: int):
+    """Raw request paths: each endpoint is hit with several IDs and spellings that collapse to one path."""
+    paths = []
+    for e in range(endpoints):
+        for i in range(ids_per_endpoint):
+            paths.append(f"/api/Resource{e}/{1000 + i}")
+            paths.append(f"//api/resource{e}/{i + 7}/")
+    return paths
+
+
+@pytest.mark.parametrize("distinct", [5, 20, 100, 1000, 5000])
+def test_distinct_collapsed_paths_within_error_bound(distinct):
+    paths = _requests(distinct, ids_per_endpoint=3)
+    collapsed = {normalize_path(p) for p in paths}
+    assert len(collapsed) == distinct
+
+    sketch = _sketch()
+    random.Random(distinct).shuffle(paths)
+    for second, path in enumerate(paths):
+        result = sketch.add(normalize_path(path), second % WINDOW_SECONDS)
+    assert abs(result - len(collapsed)) <= ERROR_BOUND * len(collapsed)
+
+
+def test_small_counts_are_close_to_exact():
+    sketch = _sketch()
+    for i in range(10):
+        result = sketch.add(f"/endpoint{i}", 0)
+    assert abs(result - 10) <= 1  # Linear counting; off only by register collisions
+    assert sketch.add("/endpoint0", 1) == result  # A repeat changes nothing
+
+
+def test_window_merge_is_order_independent():
+    items = [(f"/path{i}", random.Random(i).randrange(WINDOW_SECONDS)) for i in range(400)]
+    expected = None
+    for seed in range(5):
+        order = items[:]
+        random.Random(seed).shuffle(order)
+        sketch = _sketch()
+        # Arrival order within the window must not matter, only which slot each item lands in.
+        for item, second in sorted(order, key=lambda entry: entry[1] // PATH_SLOT_SECONDS):
+            sketch.add(item, second)
+        final = sketch.add(items[0][0], WINDOW_SECONDS - 1)
+        if expected is None:
+            expected = final
+        assert final == expected
+
+
+def test_window_estimate_equals_a_single_sketch_of_the_union():
+    m = 1 << PATH_SKETCH_PRECISION
+    items = [f"/path{i}" for i in range(300)]
+    sketch = _sketch()
+    for i, item in enumerate(items):
+        result = sketch.add(item, i % WINDOW_SECONDS)
+
+    union = bytearray(m)
+    for item in items:
+        register, rank = _position(item, PATH_SKETCH_PRECISION)
+        union[register] = max(union[register], rank)
+    assert result == estimate(union, m)
+
+
+def test_items_leave_the_window_with_their_slot():
+    sketch = _sketch()
+    for i in range(50):
+        sketch.add(f"/old{i}", 0)
+    later = WINDOW_SECONDS + PATH_SLOT_SECONDS  # The first slot has rotated out
+    assert round(sketch.add("/new", later)) == 1
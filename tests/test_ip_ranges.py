@@ -0,0 +1,84 @@
+# tests/test_ip_ranges.py
+"""
+IPRangeSet membership, checked at range edges and against ipaddress itself.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import ipaddress
+import random
+
+import pytest
+
+from aegis_toolkit.ip_ranges import IPRangeSet, parse_address
+
+
+def _set(*entries: str) -> IPRangeSet:
+    ranges, invalid = IPRangeSet.from_strings(entries)
+    assert invalid == []
+    return ranges
+
+
+@pytest.mark.parametrize("address, expected", [
+    ("10.0.0.255", False),
+    ("10.0.1.0", True),  # network address
+    ("10.0.1.255", True),  # broadcast address
+    ("10.0.2.0", False),
+    ("192.0.2.7", True),  # single address
+    ("192.0.2.6", False),
+    ("192.0.2.8", False),
+    ("0.0.0.0", False),
+    ("255.255.255.255", False),
+])
+def test_ipv4_range_edges(address, expected):
+    ranges = _set("10.0.1.0/24", "192.0.2.7")
+    assert (address in ranges) is expected
+
+
+@pytest.mark.parametrize("address, expected", [
+    ("2001:db8::", True),
+    ("2001:db8:0:ffff:ffff:ffff:ffff:ffff", True),
+    ("2001:db8:1::", False),
+    ("2001:db7:ffff:ffff:ffff:ffff:ffff:ffff", False),
+    ("::1", True),
+    ("::2", False),
+    ("10.0.1.1", False),  # families are separate
+])
+def test_ipv6_range_edges(address, expected):
+    ranges = _set("2001:db8::/48", "::1")
+    assert (address in ranges) is expected
+
+
+def test_ipv4_mapped_ipv6_clients_match_ipv4_ranges():
+    ranges = _set("203.0.113.0/24")
+    assert "::ffff:203.0.113.9" in ranges
+    assert parse_address("::ffff:203.0.113.9") == ipaddress.ip_address("203.0.113.9")
+    assert "::ffff:203.0.114.9" not in ranges
+
+
+def test_overlapping_and_adjacent_ranges_merge():
+    ranges = _set("10.0.0.0/24", "10.0.0.128/25", "10.0.1.0/24", "10.0.0.5", "10.0.3.0/24", "2001:db8::/33", "2001:db8:8000::/33")
+    # 10.0.0.0-10.0.1.255 and 10.0.3.0/24 stay apart; the two IPv6 halves become one /32.
+    assert len(ranges) == 3
+    assert "10.0.1.255" in ranges and "10.0.2.0" not in ranges and "10.0.3.0" in ranges
+    assert "2001:db8:ffff::1" in ranges
+
+
+def test_unparseable_entries_and_addresses():
+    ranges, invalid = IPRangeSet.from_strings(["10.0.0.0/8", "not-an-ip", "300.1.1.1", " 192.0.2.1 "])
+    assert invalid == ["not-an-ip", "300.1.1.1"]
+    assert "192.0.2.1" in ranges
+    assert "garbage" not in ranges
+    assert "" not in ranges
+    # Host bits set are accepted as the enclosing network.
+    assert "10.9.9.9" in IPRangeSet.from_strings(["10.1.2.3/8"])[0]
+
+
+def test_matches_ipaddress_membership():
+    rng = random.Random(11)
+    networks = [ipaddress.ip_network(f"{rng.randrange(1, 224)}.{rng.randrange(256)}.0.0/{rng.randrange(12, 25)}", strict=False)
+                for _ in range(200)]
+    ranges = IPRangeSet(networks)
+    for _ in range(5000):
+        address = ipaddress.IPv4Address(rng.getrandbits(32))
+        assert ranges.contains(address) == any(address in network for network in networks)
@@ -0,0 +1,88 @@
+# tests/test_pii_patterns.py
+"""
+Pattern-tier PII recognizers: checksums and validity rules, and the cheap
+candidate test that lets redaction skip text outright.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import pytest
+
+from aegis_toolkit.pii_patterns import find_pattern_entities, has_candidates, split_entities
+
+
+def _found(text: str, entity: str):
+    return [text[start:end] for start, end, found in find_pattern_entities(text, [entity]) if found == entity]
+
+
+@pytest.mark.parametrize("card", ["4111 1111 1111 1111", "4111-1111-1111-1111", "5500000000000004", "4012888888881881"])
+def test_luhn_valid_cards_are_found(card):
+    assert _found(f"paid with {card} yesterday", "CREDIT_CARD") == [card]
+
+
+@pytest.mark.parametrize("card", ["4111 1111 1111 1112", "5500000000000005", "4012888888881882"])
+def test_luhn_invalid_cards_are_ignored(card):
+    assert _found(f"order ref {card}", "CREDIT_CARD") == []
+
+
+@pytest.mark.parametrize("ssn", ["234-56-7891", "234 56 7891", "234567891", "901-23-4567"])
+def test_valid_ssns_are_found(ssn):
+    assert _found(f"SSN: {ssn}.", "US_SSN") == [ssn]
+
+
+@pytest.mark.parametrize("ssn", [
+    "000-12-3456",  # area 000
+    "666-12-3456",  # area 666
+    "234-00-5678",  # group 00
+    "234-56-0000",  # serial 0000
+    "111-11-1111",  # one repeated digit
+    "123-45-6789",  # advertising / sample numbers
+    "078-05-1120",
+    "234-56 7891",  # mixed delimiters
+])
+def test_excluded_ssns_are_ignored(ssn):
+    assert _found(f"SSN: {ssn}.", "US_SSN") == []
+
+
+@pytest.mark.parametrize("iban", ["GB82 WEST 1234 5698 7654 32", "GB82WEST12345698765432", "DE89370400440532013000"])
+def test_iban_mod97_valid(iban):
+    assert _found(f"transfer to {iban} today", "IBAN_CODE") == [iban]
+
+
+@pytest.mark.parametrize("iban", ["GB82 WEST 1234 5698 7654 33", "DE89370400440532013001", "GB00WEST12345698765432"])
+def test_iban_mod97_invalid(iban):
+    assert _found(f"transfer to {iban} today", "IBAN_CODE") == []
+
+
+def test_ip_addresses_must_parse():
+    assert _found("from 192.168.1.20 and 2001:db8::1 via 999.1.1.1", "IP_ADDRESS") == ["192.168.1.20", "2001:db8::1"]
+
+
+def test_several_entities_in_one_pass():
+    text = "Call +1 415-555-0100 or mail jane.doe@example.com, card 4111111111111111"
+    spans = sorted(find_pattern_entities(text, ["PHONE_NUMBER", "EMAIL_ADDRESS", "CREDIT_CARD"]))
+    assert [(text[start:end], entity) for start, end, entity in spans] == [
+        ("+1 415-555-0100", "PHONE_NUMBER"),
+        ("jane.doe@example.com", "EMAIL_ADDRESS"),
+        ("4111111111111111", "CREDIT_CARD"),
+    ]
+
+
+@pytest.mark.parametrize("text, entities, expected", [
+    ("no numbers here at all", ("US_SSN", "CREDIT_CARD", "PHONE_NUMBER"), False),
+    ("", ("US_SSN",), False),
+    ("order 42", ("US_SSN",), True),
+    ("no mail here", ("EMAIL_ADDRESS",), False),
+    ("a@b", ("EMAIL_ADDRESS",), True),
+    ("only lowercase words", ("PERSON", "LOCATION"), False),
+    ("met with Alice", ("PERSON",), True),
+    ("no digits, no at-sign", ("US_SSN", "EMAIL_ADDRESS"), False),
+    ("anything at all", ("CUSTOM_ENTITY",), True),  # no cheap test: always scanned
+])
+def test_has_candidates(text, entities, expected):
+    assert has_candidates(text, entities) is expected
+
+
+def test_split_entities():
+    assert split_entities(["US_SSN", "PERSON", "EMAIL_ADDRESS", "LOCATION"]) == (
+        ["US_SSN", "EMAIL_ADDRESS"], ["PERSON", "LOCATION"])
@@ -0,0 +1,104 @@
+# tests/test_profiler.py
+"""
+The client profiling script, run by fakeredis's embedded Lua interpreter.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import asyncio
+import random
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+fakeredis = pytest.importorskip("fakeredis")
+pytest.importorskip("lupa")
+
+from aegis_toolkit import cache, profiler  # noqa: E402
+from aegis_toolkit.profiler import PATH_HISTORY_SIZE, PROFILE_TTL_SECONDS, _shannon_entropy, profile_and_analyze  # noqa: E402
+
+
+def _settings(max_path_entropy: float = 100.0, enforce_header_consistency: bool = True):
+    return SimpleNamespace(behavioral_analysis=SimpleNamespace(
+        enforce=True, enforce_header_consistency=enforce_header_consistency, max_path_entropy=max_path_entropy,
+    ))
+
+
+def _ctx(path: str, user_agent: str = "app/1.0"):
+    return SimpleNamespace(path=path, headers={"user-agent": user_agent, "accept-language": "en"})
+
+
+@pytest.fixture
+def redis_client():
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    cache.redis_client = client
+    yield client
+    cache.redis_client = None
+
+
+def test_incremental_entropy_matches_full_recompute(redis_client):
+    async def scenario():
+        script = profiler._get_script(redis_client)
+        keys = ["profile:c", "profile:paths:c"]
+        rng = random.Random(7)
+        segments = ["users", "orders", "items", "cart", "search", "a", "b", "c", "d", "e"]
+        assert (await script(keys=keys, args=["fp", "users", PATH_HISTORY_SIZE, PROFILE_TTL_SECONDS, 1]))[0] == 0
+
+        history = []
+        # Long enough for many evictions, with skewed and uniform stretches.
+        for step in range(300):
+            pool = segments[:2] if step % 100 < 30 else segments
+            segment = rng.choice(pool)
+            history.append(segment)
+            status, entropy = await script(keys=keys, args=["fp", segment, PATH_HISTORY_SIZE, PROFILE_TTL_SECONDS, 1])
+            window = history[-PATH_HISTORY_SIZE:]
+            assert int(status) == 2
+            assert float(entropy) == pytest.approx(_shannon_entropy(window), abs=1e-9)
+            assert await redis_client.lrange(keys[1], 0, -1) == window[::-1]
+            assert int(await redis_client.hget(keys[0], "n")) == len(window)
+
+        counts = {k[2:]: int(v) for k, v in (await redis_client.hgetall(keys[0])).items() if k.startswith("f:")}
+        assert counts == {s: window.count(s) for s in set(window)}
+        assert await redis_client.hget(keys[0], "fingerprint") == "fp"
+
+    asyncio.run(scenario())
+
+
+def test_fingerprint_is_kept_and_enforced(redis_client):
+    async def scenario():
+        await profile_and_analyze("c1", _ctx("/users/1"), _settings())
+        await profile_and_analyze("c1", _ctx("/users/2"), _settings())
+        with pytest.raises(HTTPException) as changed:
+            await profile_and_analyze("c1", _ctx("/users/3", user_agent="curl/8"), _settings())
+        assert changed.value.status_code == 403
+        # Not enforced: the request passes and the stored fingerprint stays the original one.
+        await profile_and_analyze("c1", _ctx("/users/3", user_agent="curl/8"), _settings(enforce_header_consistency=False))
+        assert await redis_client.hget("profile:c1", "fingerprint") == "app/1.0en"
+        assert 0 < await redis_client.ttl("profile:c1") <= PROFILE_TTL_SECONDS
+
+    asyncio.run(scenario())
+
+
+def test_high_entropy_browsing_is_blocked(redis_client):
+    async def scenario():
+        settings = _settings(max_path_entropy=2.0)
+        await profile_and_analyze("c2", _ctx("/start"), settings)
+        for i in range(3):
+            await profile_and_analyze("c2", _ctx(f"/p{i}"), settings)  # log2(3) < 2
+        with pytest.raises(HTTPException) as blocked:
+            for i in range(3, 10):
+                await profile_and_analyze("c2", _ctx(f"/p{i}"), settings)
+        assert "entropy" in blocked.value.detail
+
+    asyncio.run(scenario())
+
+
+def test_profiling_is_skipped_unless_enforced(redis_client):
+    async def scenario():
+        settings = _settings()
+        settings.behavioral_analysis.enforce = False
+        await profile_and_analyze("c3", _ctx("/x"), settings)
+        assert not await redis_client.exists("profile:c3")
+
+    asyncio.run(scenario())
@@ -0,0 +1,171 @@
+# tests/test_rate_limiter.py
+"""
+Rate limiting: the GCRA script under fakeredis's Lua interpreter, the in-process
+token bucket and the fall back from one to the other.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from aegis_toolkit import cache, rate_limiter
+from aegis_toolkit.config import RateLimitingConfig
+from aegis_toolkit.rate_limiter import Quota, RateLimiter, TokenBucket, parse_rate
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class FailingRedis:
+    """Every script call raises, like a Redis that stopped answering."""
+
+    def __init__(self):
+        self.calls = 0
+
+    def register_script(self, script):
+        async def run(keys, args):
+            self.calls += 1
+            raise ConnectionError("connection refused")
+        return run
+
+
+def _limiter(**config) -> RateLimiter:
+    settings = SimpleNamespace(
+        rate_limiting=RateLimitingConfig(**config),
+        snapshot=SimpleNamespace(rate_limit="5/second"),
+        jwt_secret_key="test-secret",
+    )
+    return RateLimiter(settings)
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, "monotonic", fake)
+    return fake
+
+
+@pytest.fixture
+def redis_client():
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    cache.redis_client = client
+    yield client
+    cache.redis_client = None
+
+
+@pytest.mark.parametrize("rate, quota", [
+    ("100/minute", Quota(100, 60)),
+    ("10 per second", Quota(10, 1)),
+    ("1000/1 hour", Quota(1000, 3600)),
+    ("5 / 2 days", Quota(5, 172_800)),
+    ("3/Minutes", Quota(3, 60)),
+])
+def test_parse_rate(rate, quota):
+    assert parse_rate(rate) == quota
+
+
+@pytest.mark.parametrize("rate", ["", "100", "ten/minute", "100/fortnight", "/minute", None])
+def test_parse_rate_rejects_malformed(rate):
+    with pytest.raises(ValueError):
+        parse_rate(rate)
+
+
+def test_token_bucket_burst_then_reject(clock):
+    bucket, quota = TokenBucket(), Quota(5, 10)
+    decisions = [bucket.take("k", quota) for _ in range(6)]
+    assert [d.allowed for d in decisions] == [True] * 5 + [False]
+    assert [d.remaining for d in decisions[:5]] == [4, 3, 2, 1, 0]
+    # One token comes back every 2s.
+    assert decisions[-1].retry_after_seconds == pytest.approx(2.0)
+    assert decisions[-1].headers()["Retry-After"] == "2"
+    assert "Retry-After" not in decisions[0].headers()
+    # Other keys have their own bucket.
+    assert bucket.take("other", quota).allowed
+
+
+def test_token_bucket_refills_over_time(clock):
+    bucket, quota = TokenBucket(), Quota(5, 10)
+    for _ in range(5):
+        bucket.take("k", quota)
+    clock.now += 1.0
+    assert not bucket.take("k", quota).allowed
+    clock.now += 1.0
+    assert bucket.take("k", quota).allowed
+    clock.now += 3600
+    refilled = [bucket.take("k", quota).allowed for _ in range(6)]
+    assert refilled == [True] * 5 + [False]  # Never above the burst size
+
+
+def test_gcra_burst_then_reject(redis_client):
+    async def scenario():
+        limiter, quota = _limiter(), Quota(5, 60)
+        decisions = [await limiter.check("ip:1", quota) for _ in range(6)]
+        assert [d.allowed for d in decisions] == [True] * 5 + [False]
+        assert [d.remaining for d in decisions[:5]] == [4, 3, 2, 1, 0]
+        # Next slot opens one emission interval (60s / 5) after the burst.
+        assert decisions[-1].retry_after_seconds == pytest.approx(12, abs=0.1)
+        assert decisions[-1].reset_seconds == pytest.approx(60, abs=0.1)
+        assert decisions[-1].headers()["Retry-After"] == "12"
+        assert (await limiter.check("ip:2", quota)).allowed
+        assert limiter.redis_failures == 0
+        assert await redis_client.pttl(f"aegis:ratelimit:{quota.policy}:ip:1") > 59_000
+
+    asyncio.run(scenario())
+
+
+def test_gcra_refills_over_time(redis_client):
+    async def scenario():
+        limiter, quota = _limiter(), Quota(10, 1)
+        for _ in range(10):
+            assert (await limiter.check("ip:1", quota)).allowed
+        rejected = await limiter.check("ip:1", quota)
+        assert not rejected.allowed
+        await asyncio.sleep(rejected.retry_after_seconds + 0.05)
+        assert (await limiter.check("ip:1", quota)).allowed
+        assert not (await limiter.check("ip:1", quota)).allowed
+
+    asyncio.run(scenario())
+
+
+def test_redis_errors_fall_back_to_local_buckets_for_the_backoff_window(clock):
+    failing = FailingRedis()
+    cache.redis_client = failing
+
+    async def scenario():
+        limiter, quota = _limiter(degraded_backoff_seconds=5.0), Quota(3, 60)
+        decisions = [await limiter.check("ip:1", quota) for _ in range(4)]
+        # Only the first call tried Redis; the rest went straight to the local bucket.
+        assert failing.calls == 1
+        assert limiter.redis_failures == 1
+        assert [d.allowed for d in decisions] == [True] * 3 + [False]
+
+        clock.now += 4.9
+        await limiter.check("ip:1", quota)
+        assert failing.calls == 1
+
+        clock.now += 0.2
+        await limiter.check("ip:1", quota)
+        assert failing.calls == 2
+        assert limiter.degraded_until == pytest.approx(clock.now + 5.0)
+
+    try:
+        asyncio.run(scenario())
+    finally:
+        cache.redis_client = None
+
+
+def test_quota_precedence():
+    limiter = _limiter(roles={"partner": "50/minute"}, clients={"vip": "1000/minute"})
+    assert limiter.quota_for("vip", "partner") == Quota(1000, 60)
+    assert limiter.quota_for("acme", "partner") == Quota(50, 60)
+    assert limiter.quota_for("acme", "default") == Quota(5, 1)
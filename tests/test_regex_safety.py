@@ -0,0 +1,78 @@
+# tests/test_regex_safety.py
+"""
+Static ReDoS checks applied to WAF patterns when the signature engine loads.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import pytest
+
+from aegis_toolkit.regex_safety import analyze_pattern
+from aegis_toolkit.signatures import SignatureEngine
+from aegis_toolkit.waf_rules import ALL_PATTERNS, SIGNATURE_CATEGORIES
+
+
+def _severities(pattern: str):
+    return {finding.severity for finding in analyze_pattern(pattern)}
+
+
+@pytest.mark.parametrize("pattern", [
+    r"(a+)+",
+    r"(a*)*b",
+    r"^(\w+\s?)+$",
+    r"([a-z]+)*$",
+    r"(x+x+)+y",
+    r"(.*,)*x",
+    r"^(([a-z])+.)+[A-Z]([a-z])+$",
+])
+def test_nested_quantifiers_are_rejected(pattern):
+    assert "error" in _severities(pattern)
+
+
+@pytest.mark.parametrize("pattern", [
+    r"(a|aa)*b",
+    r"(a|a)+",
+    r"(x|y|xy)+z",
+    r"(?:\d|\d\d)+-",
+])
+def test_overlapping_alternatives_under_a_repeat_are_rejected(pattern):
+    assert "error" in _severities(pattern)
+
+
+@pytest.mark.parametrize("pattern", [
+    r"^[a-z0-9]+$",
+    r"(?:[a-z]+,)*",  # the separator cannot start another word
+    r"\d{3}-\d{4}",
+    r"(\d+\.){3}\d+",  # bounded repeat around a delimited group
+    r"(ab|cd)+",
+    r"(cat|dog)+s",
+    r"(a|ab)*c",  # shares a prefix, but only one alternative fits at each position
+    r"(\w|\d)+$",  # compiled to a single character class
+    r"^(?:\w+\.)*\w+@\w+$",
+    r"union\s+select",
+])
+def test_safe_patterns_are_accepted(pattern):
+    assert _severities(pattern) == set()
+
+
+def test_leading_wildcard_is_only_a_warning():
+    assert _severities(r".*foo") == {"warning"}
+    assert _severities(r"^.*foo") == set()
+
+
+def test_invalid_pattern_is_an_error():
+    findings = analyze_pattern("(unclosed")
+    assert [f.severity for f in findings] == ["error"]
+    assert "invalid pattern" in findings[0].message
+
+
+def test_shipped_signatures_have_no_errors():
+    assert [p for p in ALL_PATTERNS if "error" in _severities(p)] == []
+
+
+def test_engine_rejects_or_warns_on_unsafe_rule_patterns(capsys):
+    with pytest.raises(ValueError, match="backtracking-prone"):
+        SignatureEngine(SIGNATURE_CATEGORIES, {"bad-rule": r"(a+)+$"})
+    SignatureEngine(SIGNATURE_CATEGORIES, {"bad-rule": r"(a+)+$"}, redos_policy="warn")
+    assert "bad-rule" in capsys.readouterr().out
+    SignatureEngine(SIGNATURE_CATEGORIES, {"ok-rule": r"^/api/v\d+/"})
@@ -0,0 +1,136 @@
+# tests/test_revocation.py
+"""
+Token revocation: the Bloom filter, the local store and the shared Redis log
+(under fakeredis) that workers sync from.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import asyncio
+import time
+
+import pytest
+
+from aegis_toolkit import cache, revocation
+from aegis_toolkit.config import TokenRevocationConfig
+from aegis_toolkit.revocation import BloomFilter, is_token_revoked, revoke_token, sync_revocations
+
+
+@pytest.fixture(autouse=True)
+def fresh_state(monkeypatch):
+    monkeypatch.setattr(revocation, "REVOCATION_CONFIG", TokenRevocationConfig(expected_revocations=1000))
+    monkeypatch.setattr(revocation, "REVOCATION_FILTER", None)
+    monkeypatch.setattr(revocation, "REVOCATION_METRICS", dict.fromkeys(revocation.REVOCATION_METRICS, 0))
+    monkeypatch.setattr(revocation, "_LOCAL_REVOKED", {})
+    monkeypatch.setattr(revocation, "_last_synced_ms", 0)
+    monkeypatch.setattr(revocation, "_last_rebuild", 0.0)
+    yield
+    cache.redis_client = None
+
+
+@pytest.fixture
+def redis_client():
+    fakeredis = pytest.importorskip("fakeredis")
+    client = fakeredis.aioredis.FakeRedis(decode_responses=True)
+    cache.redis_client = client
+    return client
+
+
+def _new_worker():
+    """Drops this process's filter, as if the next call ran in a freshly started worker."""
+    revocation.REVOCATION_FILTER = None
+    revocation._last_synced_ms = 0
+    revocation._last_rebuild = 0.0
+
+
+def test_bloom_filter_has_no_false_negatives():
+    bloom = BloomFilter(capacity=5000, error_rate=0.01)
+    ids = [f"jti-{i}" for i in range(5000)]
+    for jti in ids:
+        bloom.add(jti)
+    assert all(jti in bloom for jti in ids)
+    false_positives = sum(f"other-{i}" in bloom for i in range(10_000))
+    assert false_positives < 10_000 * 0.01 * 2
+
+
+def test_revoked_token_is_always_reported_revoked_locally():
+    async def scenario():
+        ids = [f"jti-{i}" for i in range(2000)]  # Twice the filter's sizing
+        for jti in ids:
+            assert await revoke_token(jti, time.time() + 60)
+        assert all([await is_token_revoked({"jti": jti}) for jti in ids])
+        assert not await is_token_revoked({"jti": "never-revoked"})
+        assert not await is_token_revoked({"sub": "no-jti"})
+        metrics = revocation.REVOCATION_METRICS
+        assert metrics["confirmed"] == len(ids)
+
+    asyncio.run(scenario())
+
+
+def test_expired_tokens_are_not_revoked():
+    async def scenario():
+        assert not await revoke_token("stale", time.time() - 1)
+        assert not await is_token_revoked({"jti": "stale"})
+
+    asyncio.run(scenario())
+
+
+def test_synced_ids_match_the_revoked_ids(redis_client):
+    async def scenario():
+        ids = ["a1b2", "ünïcode-jti", "550e8400-e29b-41d4-a716-446655440000"]
+        for jti in ids:
+            await revoke_token(jti, time.time() + 60)
+        _new_worker()
+        # The client decodes replies to str; they must hash the same as the originals.
+        assert await sync_revocations() == len(ids)
+        assert all(jti in revocation.REVOCATION_FILTER for jti in ids)
+        assert all([await is_token_revoked({"jti": jti}) for jti in ids])
+
+    asyncio.run(scenario())
+
+
+def test_incremental_sync_reads_only_entries_after_the_cursor(redis_client):
+    async def scenario():
+        now_ms = int(time.time() * 1000)
+        await redis_client.zadd(revocation._REVOCATION_LOG_KEY, {"old": now_ms - 60_000, "recent": now_ms - 1000})
+        revocation._last_rebuild = time.time()  # Not due for a full rebuild
+        revocation._last_synced_ms = now_ms - 2000
+        assert await sync_revocations() == 1
+        assert "recent" in revocation.REVOCATION_FILTER
+        assert "old" not in revocation.REVOCATION_FILTER
+        assert revocation._last_synced_ms >= now_ms
+
+        # The next sync re-reads only the clock-skew overlap behind the new cursor.
+        await redis_client.zadd(revocation._REVOCATION_LOG_KEY, {"later": int(time.time() * 1000)})
+        assert await sync_revocations() == 2  # "recent" and "later"
+        assert "later" in revocation.REVOCATION_FILTER
+
+    asyncio.run(scenario())
+
+
+def test_rebuild_prunes_entries_older_than_the_longest_token_lifetime(redis_client):
+    async def scenario():
+        lifetime = revocation.REVOCATION_CONFIG.max_token_lifetime_seconds
+        now_ms = int(time.time() * 1000)
+        await redis_client.zadd(revocation._REVOCATION_LOG_KEY, {
+            "expired": now_ms - (lifetime + 60) * 1000,
+            "live": now_ms - 60_000,
+        })
+        assert await sync_revocations() == 1
+        assert await redis_client.zrange(revocation._REVOCATION_LOG_KEY, 0, -1) == ["live"]
+        assert "expired" not in revocation.REVOCATION_FILTER
+        assert "live" in revocation.REVOCATION_FILTER
+
+    asyncio.run(scenario())
+
+
+def test_rebuild_prunes_expired_local_entries():
+    async def scenario():
+        await revoke_token("short", time.time() + 60)
+        await revoke_token("long", time.time() + 3600)
+        revocation._LOCAL_REVOKED["short"] = time.time() - 1  # Its token has since expired
+        assert await sync_revocations() == 1
+        assert set(revocation._LOCAL_REVOKED) == {"long"}
+        assert "short" not in revocation.REVOCATION_FILTER
+
+    asyncio.run(scenario())
@@ -0,0 +1,84 @@
+# tests/test_rule_index.py
+"""
+RuleIndex must pick exactly the rules the original fnmatch loop picked, in
+config order.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+from fnmatch import fnmatch
+
+import pytest
+
+from aegis_toolkit.config import WAFRule
+from aegis_toolkit.rule_index import RuleIndex
+
+RULES = [
+    WAFRule(name="admin-anywhere", path_pattern="*/admin/*", action="block"),
+    WAFRule(name="users-any-version", path_pattern="/api/*/users", methods=["POST"], action="block"),
+    WAFRule(name="user-detail", path_pattern="/api/v1/users/*", methods=["GET", "DELETE"], action="block"),
+    WAFRule(name="user-numeric", path_pattern="/api/v1/users/[0-9]*", action="log"),
+    WAFRule(name="users-exact", path_pattern="/api/v1/users", action="log"),
+    WAFRule(name="users-exact-get", path_pattern="/api/v1/users", methods=["GET"], action="block"),
+    WAFRule(name="version-char", path_pattern="/api/v?/orders", methods=["PUT"], action="block"),
+    WAFRule(name="scripts", path_pattern="/static/*.js", methods=["GET"], action="log"),
+    WAFRule(name="mid-path", path_pattern="/files/*/download", action="block"),
+    WAFRule(name="catch-all", path_pattern="*", methods=["DELETE"], action="log"),
+    WAFRule(name="admin-anywhere-again", path_pattern="*/admin/*", methods=["*"], action="log"),
+]
+
+PATHS = [
+    "/", "/admin", "/admin/", "/admin/users", "/internal/admin/keys", "/api/v1/admin/x/y",
+    "/api/v1/users", "/api/v2/users", "/api/v1/users/", "/api/v1/users/42", "/api/v1/users/42/admin/x",
+    "/api/v1/users/me", "/api/v1/orders", "/api/v10/orders", "/static/app.js", "/static/js/app.js",
+    "/static/app.css", "/files/a/download", "/files/a/b/download", "/files/download", "/unknown",
+]
+METHODS = ["GET", "POST", "PUT", "DELETE", "PATCH"]
+
+
+def _legacy_lookup(rules, path: str, method: str):
+    """The pre-index implementation: fnmatch against every rule on every request."""
+    return [r for r in rules if fnmatch(path, r.path_pattern) and ("*" in r.methods or method in r.methods)]
+
+
+@pytest.mark.parametrize("method", METHODS)
+@pytest.mark.parametrize("path", PATHS)
+def test_matches_legacy_fnmatch_loop(path, method):
+    index = RuleIndex(RULES)
+    assert index.match(path, method) == _legacy_lookup(RULES, path, method)
+
+
+def test_matches_keep_config_order():
+    index = RuleIndex(RULES)
+    names = [rule.name for rule in index.match("/api/v1/users/7", "DELETE")]
+    assert names == ["user-detail", "user-numeric", "catch-all"]
+    names = [rule.name for rule in index.match("/api/v1/admin/users", "DELETE")]
+    assert names == ["admin-anywhere", "catch-all", "admin-anywhere-again"]
+
+    reversed_index = RuleIndex(list(reversed(RULES)))
+    names = [rule.name for rule in reversed_index.match("/api/v1/admin/users", "DELETE")]
+    assert names == ["admin-anywhere-again", "catch-all", "admin-anywhere"]
+
+
+def test_glob_prefix_segments_and_wildcard_methods():
+    index = RuleIndex(RULES)
+    assert [r.name for r in index.match("/internal/admin/keys", "PATCH")] == ["admin-anywhere", "admin-anywhere-again"]
+    assert [r.name for r in index.match("/files/x/download", "HEAD")] == ["mid-path"]
+    assert index.match("/files/download", "GET") == []
+    assert [r.name for r in index.match("/api/v1/users", "GET")] == ["users-exact", "users-exact-get"]
+    assert [r.name for r in index.match("/api/v1/users", "PUT")] == ["users-exact"]
+
+
+def test_synthetic_rule_sets_match_legacy():
+    # Mirrors the benchmark's rule set: exact, prefix-globbed and leading-glob patterns across many services.
+    rules = []
+    for i in range(300):
+        service = f"svc{i % 25}"
+        pattern = (f"/api/v1/{service}/resource{i}", f"/api/v1/{service}/resource{i}/*", f"/api/*/{service}/item{i}")[i % 3]
+        rules.append(WAFRule(name=f"r{i}", path_pattern=pattern, methods=[("GET", "POST", "*")[i % 3]], action="block"))
+    rules.append(WAFRule(name="admin", path_pattern="*/admin/*", action="block"))
+    index = RuleIndex(rules)
+    for path in ("/api/v1/svc3/resource28/details", "/api/v2/svc7/x/item32", "/api/v2/svc7/item32",
+                 "/api/v1/svc0/resource0", "/static/app.js", "/api/v1/svc3/admin/x"):
+        for method in ("GET", "POST"):
+            assert index.match(path, method) == _legacy_lookup(rules, path, method), (path, method)
@@ -0,0 +1,140 @@
+# tests/test_spec_validation.py
+"""
+Request-body validators compiled from an OpenAPI document: `$ref` resolution,
+lookup by concrete path, and bodies the spec does not allow.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from aegis_toolkit.spec_validation import SpecValidatorRegistry
+
+SPEC = {
+    "openapi": "3.0.3",
+    "paths": {
+        "/users": {
+            "post": {"operationId": "createUser", "requestBody": {"$ref": "#/components/requestBodies/NewUser"}},
+            "get": {},
+        },
+        "/users/{user_id}": {
+            "patch": {"requestBody": {"content": {"application/merge-patch+json": {"schema": {
+                "type": "object",
+                "properties": {"nickname": {"type": "string", "maxLength": 8}},
+                "additionalProperties": False,
+            }}}}},
+        },
+        "/users/me": {"patch": {}},
+        "/users/{user_id}/orders": {
+            "post": {"requestBody": {"required": True, "content": {"application/json": {"schema": {
+                "allOf": [
+                    {"$ref": "#/components/schemas/OrderBase"},
+                    {"type": "object", "properties": {"quantity": {"type": "integer", "minimum": 1}}, "required": ["quantity"]},
+                ],
+            }}}}},
+        },
+        "/trees": {
+            "post": {"requestBody": {"content": {"application/json": {"schema": {"$ref": "#/components/schemas/Node"}}}}},
+        },
+        "/broken": {
+            "post": {"requestBody": {"content": {"application/json": {"schema": {"$ref": "#/components/schemas/Missing"}}}}},
+        },
+    },
+    "components": {
+        "requestBodies": {
+            "NewUser": {"required": True, "content": {"application/json": {"schema": {"$ref": "#/components/schemas/User"}}}},
+        },
+        "schemas": {
+            "User": {
+                "type": "object",
+                "required": ["email", "age"],
+                "properties": {
+                    "email": {"type": "string", "format": "email"},
+                    "age": {"type": "integer", "minimum": 13},
+                    "address": {"$ref": "#/components/schemas/Address"},
+                    "role": {"type": "string", "enum": ["user", "admin"]},
+                },
+                "additionalProperties": False,
+            },
+            "Address": {"type": "object", "required": ["city"], "properties": {"city": {"type": "string"}}},
+            "OrderBase": {"type": "object", "required": ["sku"], "properties": {"sku": {"type": "string", "pattern": "^[A-Z]{3}-\\d+$"}}},
+            "Node": {"type": "object", "properties": {"value": {"type": "number"}, "children": {"type": "array", "items": {"$ref": "#/components/schemas/Node"}}}},
+        },
+    },
+}
+
+
+@pytest.fixture(scope="module")
+def registry():
+    registry = SpecValidatorRegistry()
+    errors = registry.load(SPEC)
+    assert len(errors) == 1 and errors[0].startswith("POST /broken")
+    return registry
+
+
+def _validate(registry, method, path, body):
+    validator = registry.lookup(method, path)
+    assert validator is not None, (method, path)
+    return validator.validate(json.dumps(body).encode())
+
+
+def test_request_body_and_schema_refs_resolve(registry):
+    validator = registry.lookup("POST", "/users")
+    assert validator.operation == "POST /users" and validator.required
+    user = _validate(registry, "POST", "/users", {"email": "a@example.com", "age": 30, "address": {"city": "Oslo"}})
+    assert user.model_dump(by_alias=True, exclude_none=True) == {
+        "email": "a@example.com", "age": 30, "address": {"city": "Oslo"},
+    }
+
+
+@pytest.mark.parametrize("body", [
+    {"email": "a@example.com"},  # missing required
+    {"email": "not-an-email", "age": 30},
+    {"email": "a@example.com", "age": 12},  # below minimum
+    {"email": "a@example.com", "age": "30"},  # strict: no string-to-int coercion
+    {"email": "a@example.com", "age": 30, "is_admin": True},  # additionalProperties: false
+    {"email": "a@example.com", "age": 30, "role": "root"},  # not in the enum
+    {"email": "a@example.com", "age": 30, "address": {}},  # nested $ref required field
+])
+def test_invalid_bodies_are_rejected(registry, body):
+    with pytest.raises(ValidationError):
+        _validate(registry, "POST", "/users", body)
+
+
+def test_path_templates_are_looked_up_from_concrete_paths(registry):
+    assert registry.lookup("POST", "/users/42/orders").operation == "POST /users/{user_id}/orders"
+    assert registry.lookup("PATCH", "/users/42").operation == "PATCH /users/{user_id}"
+    # /users/me is its own operation (without a body), not the templated one.
+    assert registry.lookup("PATCH", "/users/me") is None
+    assert registry.lookup("GET", "/users") is None
+    assert registry.lookup("POST", "/unknown") is None
+
+
+def test_all_of_merges_referenced_parts(registry):
+    _validate(registry, "POST", "/users/7/orders", {"sku": "ABC-1", "quantity": 2})
+    for body in ({"sku": "ABC-1"}, {"sku": "abc", "quantity": 2}, {"sku": "ABC-1", "quantity": 0}):
+        with pytest.raises(ValidationError):
+            _validate(registry, "POST", "/users/7/orders", body)
+
+
+def test_json_suffix_media_types_are_validated(registry):
+    _validate(registry, "PATCH", "/users/42", {"nickname": "neo"})
+    with pytest.raises(ValidationError):
+        _validate(registry, "PATCH", "/users/42", {"nickname": "far-too-long"})
+
+
+def test_recursive_refs_compile(registry):
+    _validate(registry, "POST", "/trees", {"value": 1.5, "children": [{"value": 2, "children": [{"children": []}]}]})
+    with pytest.raises(ValidationError):
+        _validate(registry, "POST", "/trees", {"value": "x"})
+
+
+def test_reloading_an_unchanged_spec_reuses_compiled_adapters():
+    registry = SpecValidatorRegistry()
+    registry.load(SPEC)
+    before = registry.lookup("POST", "/users").adapter
+    registry.load(json.loads(json.dumps(SPEC)))
+    assert registry.lookup("POST", "/users").adapter is before
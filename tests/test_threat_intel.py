@@ -0,0 +1,165 @@
+# tests/test_threat_intel.py
+"""
+IPReputationService against a stub AbuseIPDB served by httpx.MockTransport.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from fastapi import HTTPException
+
+from aegis_toolkit import threat_intel
+from aegis_toolkit.config import IPReputationConfig
+from aegis_toolkit.threat_intel import IPReputationService, check_ip_reputation
+
+API_URL = "http://abuseipdb.test/api/v2/check"
+
+
+class StubAbuseIPDB:
+    """Answers lookups from a fixed score table; an IP missing from it gets a 500. Optionally holds every answer until released."""
+
+    def __init__(self, scores, hold: bool = False):
+        self.scores = scores
+        self.requests = []
+        self.release = asyncio.Event()
+        if not hold:
+            self.release.set()
+
+    async def __call__(self, request: httpx.Request) -> httpx.Response:
+        self.requests.append(request)
+        await self.release.wait()
+        ip = request.url.params["ipAddress"]
+        if ip not in self.scores:
+            return httpx.Response(500)
+        return httpx.Response(200, json={"data": {"ipAddress": ip, "abuseConfidenceScore": self.scores[ip]}})
+
+
+def _service(stub: StubAbuseIPDB, **config) -> IPReputationService:
+    settings = SimpleNamespace(
+        ip_reputation=IPReputationConfig(api_url=API_URL, **config),
+        abuseipdb_api_key="test-key",
+        abuseipdb_confidence_minimum=90,
+    )
+    service = IPReputationService(settings)
+    service.client = httpx.AsyncClient(transport=httpx.MockTransport(stub))
+    return service
+
+
+def _expires_in(service: IPReputationService, ip: str) -> float:
+    return service.cache._entries[ip][1] - time.monotonic()
+
+
+def test_lookup_uses_configured_api_url():
+    async def scenario():
+        stub = StubAbuseIPDB({"198.51.100.1": 10})
+        service = _service(stub)
+        assert await service.score("198.51.100.1") == 10
+        request = stub.requests[0]
+        assert str(request.url.copy_with(query=None)) == API_URL
+        assert request.headers["Key"] == "test-key"
+        await service.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_concurrent_callers_share_one_lookup():
+    async def scenario():
+        stub = StubAbuseIPDB({"198.51.100.2": 42}, hold=True)
+        service = _service(stub)
+        callers = [asyncio.create_task(service.score("198.51.100.2")) for _ in range(50)]
+        await asyncio.sleep(0.05)
+        stub.release.set()
+        assert await asyncio.gather(*callers) == [42] * 50
+        assert len(stub.requests) == 1
+        assert service.metrics["lookups"] == 1
+        assert service.metrics["coalesced"] == 49
+        assert service.status()["lookups_in_flight"] == 0
+        await service.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_clean_malicious_and_failed_lookups_have_their_own_ttl():
+    async def scenario():
+        stub = StubAbuseIPDB({"198.51.100.3": 5, "198.51.100.4": 99})
+        service = _service(stub, clean_ttl_seconds=100, malicious_ttl_seconds=1000, error_ttl_seconds=10)
+        assert await service.score("198.51.100.3") == 5
+        assert await service.score("198.51.100.4") == 99
+        assert await service.score("198.51.100.5") is None  # stub answers 500
+        assert _expires_in(service, "198.51.100.3") == pytest.approx(100, abs=1)
+        assert _expires_in(service, "198.51.100.4") == pytest.approx(1000, abs=1)
+        assert _expires_in(service, "198.51.100.5") == pytest.approx(10, abs=1)
+        assert service.metrics["lookup_errors"] == 1
+
+        # All three verdicts, including the failure, are served from the cache until they expire.
+        for ip in ("198.51.100.3", "198.51.100.4", "198.51.100.5"):
+            await service.score(ip)
+        assert len(stub.requests) == 3
+        assert service.metrics["cache_hits"] == 3
+        await service.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_expired_verdict_is_looked_up_again():
+    async def scenario():
+        stub = StubAbuseIPDB({"198.51.100.6": 5})
+        service = _service(stub, clean_ttl_seconds=0.05)
+        await service.score("198.51.100.6")
+        await asyncio.sleep(0.1)
+        await service.score("198.51.100.6")
+        assert len(stub.requests) == 2
+        await service.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_background_mode_allows_until_the_verdict_arrives():
+    async def scenario():
+        stub = StubAbuseIPDB({"198.51.100.7": 99}, hold=True)
+        service = _service(stub, background_lookup=True)
+        settings = service.settings
+        request = SimpleNamespace(client=SimpleNamespace(host="198.51.100.7"))
+        threat_intel.REPUTATION_SERVICE = service
+        try:
+            # No verdict yet: allowed without waiting, and later requests do not start another lookup.
+            await check_ip_reputation(request, settings)
+            await check_ip_reputation(request, settings)
+            assert service.metrics["allowed_pending"] == 2
+            assert service.status()["lookups_in_flight"] == 1
+
+            stub.release.set()
+            await asyncio.gather(*service._inflight.values())
+            with pytest.raises(HTTPException) as blocked:
+                await check_ip_reputation(request, settings)
+            assert blocked.value.status_code == 403
+            assert len(stub.requests) == 1
+        finally:
+            threat_intel.REPUTATION_SERVICE = None
+            await service.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_caller_does_not_cancel_the_shared_lookup():
+    async def scenario():
+        stub = StubAbuseIPDB({"198.51.100.8": 7}, hold=True)
+        service = _service(stub)
+        first = asyncio.create_task(service.score("198.51.100.8"))
+        second = asyncio.create_task(service.score("198.51.100.8"))
+        await asyncio.sleep(0.05)
+        first.cancel()  # e.g. that client disconnected
+        await asyncio.sleep(0)
+        stub.release.set()
+        assert await second == 7
+        assert first.cancelled()
+        assert service.cache.get("198.51.100.8") == 7
+        assert len(stub.requests) == 1
+        await service.aclose()
+
+    asyncio.run(scenario())
@@ -0,0 +1,133 @@
+# tests/test_token_cache.py
+"""
+The verified-JWT cache and the get_current_user dependency that uses it.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import asyncio
+import time
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from jose import jwt
+
+from aegis_toolkit import revocation, security, token_cache
+from aegis_toolkit.config import TokenRevocationConfig
+from aegis_toolkit.token_cache import VerifiedTokenCache
+
+SECRET = "test-secret"
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(token_cache.time, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def fresh_state(monkeypatch):
+    cache = VerifiedTokenCache(maxsize=100)
+    monkeypatch.setattr(security, "TOKEN_CACHE", cache)
+    monkeypatch.setattr(revocation, "REVOCATION_CONFIG", TokenRevocationConfig())
+    monkeypatch.setattr(revocation, "REVOCATION_FILTER", None)
+    monkeypatch.setattr(revocation, "_LOCAL_REVOKED", {})
+    return cache
+
+
+def _token(**claims) -> str:
+    return jwt.encode({"user_id": 7, "exp": int(time.time()) + 300, **claims}, SECRET, algorithm="HS256")
+
+
+def test_cached_payload_expires_at_exp(clock):
+    cache = VerifiedTokenCache()
+    cache.put("token", {"user_id": 1, "exp": clock.now + 60})
+    assert cache.get("token") == {"user_id": 1, "exp": clock.now + 60}
+    clock.now += 59
+    assert cache.get("token") is not None
+    clock.now += 1
+    assert cache.get("token") is None
+    assert cache.snapshot()["expired"] == 1
+
+
+def test_already_expired_payloads_are_not_cached(clock):
+    cache = VerifiedTokenCache()
+    cache.put("token", {"exp": clock.now - 1})
+    assert cache.get("token") is None
+    assert cache.snapshot()["size"] == 0
+
+
+def test_expired_entries_are_purged_on_insert(clock):
+    cache = VerifiedTokenCache()
+    for i in range(10):
+        cache.put(f"short-{i}", {"exp": clock.now + 10})
+    cache.put("forever", {"user_id": 1})  # No exp: kept until evicted
+    clock.now += 11
+    cache.put("new", {"exp": clock.now + 10})
+    assert cache.snapshot()["size"] == 2
+    assert cache.snapshot()["expired"] == 10
+    assert cache.get("forever") == {"user_id": 1}
+
+
+def test_lru_eviction_keeps_recently_used(clock):
+    cache = VerifiedTokenCache(maxsize=2)
+    cache.put("a", {"n": 1})
+    cache.put("b", {"n": 2})
+    cache.get("a")
+    cache.put("c", {"n": 3})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"n": 1} and cache.get("c") == {"n": 3}
+    assert cache.snapshot()["evicted"] == 1
+
+
+def test_callers_cannot_mutate_the_cached_payload(clock):
+    cache = VerifiedTokenCache()
+    payload = {"role": "user"}
+    cache.put("token", payload)
+    payload["role"] = "admin"
+    cache.get("token")["role"] = "admin"
+    assert cache.get("token") == {"role": "user"}
+
+
+def test_tampered_token_is_not_served_from_the_cache(fresh_state):
+    get_current_user = security.get_current_user_factory(SimpleNamespace(jwt_secret_key=SECRET))
+    token = _token()
+
+    async def scenario():
+        assert (await get_current_user(token))["user_id"] == 7
+        assert fresh_state.snapshot()["size"] == 1
+        header, body, signature = token.split(".")
+        forged_body = jwt.encode({"user_id": 1, "exp": int(time.time()) + 300}, "other", algorithm="HS256").split(".")[1]
+        for forged in (f"{header}.{forged_body}.{signature}", f"{header}.{body}.{signature[:-2]}AA", token + " "):
+            with pytest.raises(HTTPException) as rejected:
+                await get_current_user(forged)
+            assert rejected.value.status_code == 401
+        assert fresh_state.snapshot()["size"] == 1
+
+    asyncio.run(scenario())
+
+
+def test_revoked_token_is_rejected_even_when_cached(fresh_state):
+    get_current_user = security.get_current_user_factory(SimpleNamespace(jwt_secret_key=SECRET))
+    token = _token(jti="session-1")
+
+    async def scenario():
+        await get_current_user(token)
+        await get_current_user(token)
+        assert fresh_state.hits == 1
+        await revocation.revoke_token("session-1", time.time() + 300)
+        with pytest.raises(HTTPException) as rejected:
+            await get_current_user(token)
+        assert rejected.value.status_code == 401
+
+    asyncio.run(scenario())
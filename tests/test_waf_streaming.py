@@ -0,0 +1,102 @@
+# tests/test_waf_streaming.py
+"""
+Chunked request-body inspection: signatures split across chunk boundaries and
+the spooled body of an upload that turns out to be malicious.
+
+Run from the repository root:
+    python -m pytest tests
+"""
+import asyncio
+import tempfile
+
+import pytest
+from fastapi import HTTPException
+
+from aegis_toolkit import toolkit
+from aegis_toolkit.signatures import SignatureEngine
+from aegis_toolkit.waf import StreamingBodyInspector
+from aegis_toolkit.waf_rules import SIGNATURE_CATEGORIES
+
+ENGINE = SignatureEngine(SIGNATURE_CATEGORIES)
+PAYLOAD = b'{"comment": "great product", "id": "1 UNION SELECT password FROM users"}'
+SIGNATURE_AT = PAYLOAD.index(b"UNION SELECT")
+
+
+def _inspector(overlap: int = 64, max_body_size: int = 1 << 20) -> StreamingBodyInspector:
+    return StreamingBodyInspector(ENGINE, max_body_size, overlap)
+
+
+async def _chunks(*chunks: bytes):
+    for chunk in chunks:
+        await asyncio.sleep(0)
+        yield chunk
+
+
+async def _drain(inspector: StreamingBodyInspector, *chunks: bytes):
+    return [chunk async for chunk in inspector.iter_scanned(_chunks(*chunks))]
+
+
+@pytest.mark.parametrize("split", range(SIGNATURE_AT + 1, SIGNATURE_AT + len(b"UNION SELECT")))
+def test_signature_split_across_chunks_is_caught(split):
+    inspector = _inspector()
+    inspector.feed(PAYLOAD[:split])  # Holds only part of the signature
+    with pytest.raises(HTTPException) as blocked:
+        inspector.feed(PAYLOAD[split:], final=True)
+    assert blocked.value.status_code == 403
+
+
+def test_split_signature_is_missed_without_overlap():
+    split = SIGNATURE_AT + len(b"UNION ")
+    inspector = _inspector(overlap=0)
+    inspector.feed(PAYLOAD[:split])
+    inspector.feed(PAYLOAD[split:], final=True)  # Neither half matches on its own
+
+
+@pytest.mark.parametrize("body", [b"q=%3Cscript%3Ealert(1)", "name=café <script>x</script>".encode()])
+def test_percent_encoding_and_utf8_split_mid_sequence(body):
+    marker = body.index(b"%3C") + 2 if b"%3C" in body else body.index(b"\xc3") + 1
+    with pytest.raises(HTTPException):
+        asyncio.run(_drain(_inspector(), body[:marker], body[marker:]))
+
+
+def test_clean_body_is_forwarded_unchanged():
+    chunks = [b'{"items": [', b'"a", "b"', b"]}"]
+    assert asyncio.run(_drain(_inspector(), *chunks)) == chunks
+
+
+def test_body_size_limit_is_enforced_while_streaming():
+    with pytest.raises(HTTPException) as too_large:
+        asyncio.run(_drain(_inspector(max_body_size=10), b"x" * 8, b"x" * 8))
+    assert too_large.value.status_code == 413
+
+
+def test_spool_is_closed_when_a_late_chunk_violates(monkeypatch):
+    spools = []
+
+    class RecordingSpool(tempfile.SpooledTemporaryFile):
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            spools.append(self)
+
+    monkeypatch.setattr(toolkit.tempfile, "SpooledTemporaryFile", RecordingSpool)
+    clean = b"a" * 4096
+    stream = _inspector().iter_scanned(_chunks(clean, clean, clean, b"<script>alert(1)</script>"))
+    with pytest.raises(HTTPException):
+        asyncio.run(toolkit._spool(stream, max_memory=1024))
+
+    spool, = spools
+    assert spool._rolled  # The clean chunks had already moved it to disk
+    assert spool.closed and spool._file.closed
+
+
+def test_spooled_body_replays_in_full():
+    chunks = [bytes([65 + i]) * 3000 for i in range(5)]
+
+    async def scenario():
+        spool = await toolkit._spool(_inspector().iter_scanned(_chunks(*chunks)), max_memory=1024)
+        try:
+            return b"".join([chunk async for chunk in toolkit._replay(spool)])
+        finally:
+            spool.close()
+
+    assert asyncio.run(scenario()) == b"".join(chunks)